@@ -20,6 +20,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'rest_framework',
     'risk_monitor.apps.RiskMonitorConfig',
 ]
 
@@ -60,6 +61,13 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            # WAL lets page reads run alongside the vitals ingest's write
+            # transactions; IMMEDIATE takes the write lock up front instead
+            # of failing with "database is locked" on lock upgrade.
+            'init_command': 'PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL',
+            'transaction_mode': 'IMMEDIATE',
+        },
     }
 }
 
@@ -116,6 +124,76 @@ DATE_INPUT_FORMATS = ['%d/%m/%Y', '%Y-%m-%d']
 STATIC_URL = 'static/'
 STATICFILES_DIRS = [BASE_DIR / 'static']
 
+# Risk engine
+# Entries in the LRU cache of risk results keyed by a fingerprint of the
+# scoring inputs (0 disables it). Inspect with risk_engine.risk_cache_info().
+RISK_ENGINE_CACHE_SIZE = 4096
+
+# PDF autofill
+# Uploads are parsed off the request thread in at most PDF_AUTOFILL_WORKERS
+# child processes; a parse running past PDF_AUTOFILL_TIMEOUT seconds is killed.
+# PDF_AUTOFILL_MAX_QUEUED bounds jobs waiting for a free worker.
+PDF_AUTOFILL_MAX_BYTES = 10 * 1024 * 1024
+PDF_AUTOFILL_WORKERS = 2
+PDF_AUTOFILL_TIMEOUT = 30
+PDF_AUTOFILL_MAX_QUEUED = 20
+
+# Extraction stops at whichever comes first: every field found, this many
+# pages, or this many characters of page text. Jobs record pages read, for
+# tuning these per deployment.
+PDF_EXTRACT_MAX_PAGES = 200
+PDF_EXTRACT_MAX_CHARS = 2_000_000
+
+# Extraction results are cached by SHA-256 of the file; least recently used
+# entries are evicted past this many bytes (0 disables the cache)
+PDF_EXTRACT_CACHE_MAX_BYTES = 20 * 1024 * 1024
+
+# Uploads above this size are spooled to a temporary file instead of memory
+FILE_UPLOAD_MAX_MEMORY_SIZE = 1024 * 1024
+
+# Vitals history
+# Raw observations are kept this many days; after that only the rollups
+# remain. 1-minute rollups are kept OBSERVATION_MINUTE_ROLLUP_RETENTION_DAYS,
+# 1-hour rollups indefinitely (prune_observations applies this).
+OBSERVATION_RAW_RETENTION_DAYS = 7
+OBSERVATION_MINUTE_ROLLUP_RETENTION_DAYS = 90
+
+# JSON API (/api/)
+# Rows per page by default, and the most a client may ask for with ?page_size=
+API_PAGE_SIZE = 50
+API_MAX_PAGE_SIZE = 500
+# Most patients one bulk-update request may change
+API_BULK_UPDATE_MAX = 1000
+
+# Audit archive
+# Audit rows older than AUDIT_ARCHIVE_AFTER_DAYS are moved by archive_audit_logs
+# into one gzip JSONL segment per month under AUDIT_ARCHIVE_DIR, then deleted
+# from the table AUDIT_ARCHIVE_BATCH_SIZE rows per transaction. History pages
+# and the CSV export read both.
+AUDIT_ARCHIVE_DIR = BASE_DIR / 'audit_archive'
+AUDIT_ARCHIVE_AFTER_DAYS = 365
+AUDIT_ARCHIVE_BATCH_SIZE = 5000
+
+# Vitals ingest endpoint (/vitals/ingest/)
+# Device tokens accepted as "Authorization: Bearer <token>", comma-separated in
+# the environment; with none set every request is refused.
+# Largest NDJSON body accepted, and readings committed per transaction.
+# Throughput target: 5,000 readings/s sustained on a laptop with SQLite in
+# WAL mode; loadtest_vitals_ingest checks it.
+VITALS_INGEST_TOKENS = [token for token in os.environ.get('VITALS_INGEST_TOKENS', '').split(',') if token]
+VITALS_INGEST_MAX_BYTES = 16 * 1024 * 1024
+VITALS_INGEST_BATCH_SIZE = 5000
+VITALS_INGEST_TARGET_PER_SEC = 5000
+
+# Live risk events (/live/risk-events/, served under ASGI)
+# Seconds between heartbeats on an idle stream; events buffered per client
+# before it is told to resync; recent events kept for Last-Event-ID resume;
+# concurrent streams per process.
+LIVE_EVENTS_HEARTBEAT_SECONDS = 15
+LIVE_EVENTS_QUEUE_SIZE = 100
+LIVE_EVENTS_REPLAY_SIZE = 256
+LIVE_EVENTS_MAX_SUBSCRIBERS = 10000
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.0/ref/settings/#default-auto-field
 
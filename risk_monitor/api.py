@@ -0,0 +1,236 @@
+import hashlib
+
+from django.conf import settings
+from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from rest_framework import status, viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+
+from .forms import AuditLogFilterForm, PatientFilterForm
+from .models import Patient, AuditLog
+from .serializers import AuditLogSerializer, PatientSerializer
+from .services.audit_archive import paginate_audit_logs
+from .services.audit_service import bulk_update_patients, create_patient_with_risk, update_patient_risk_and_audit
+from .services.search_service import search_patients
+from .utils.pagination import keyset_paginate
+
+
+def _etag(*parts):
+    return '"%s"' % hashlib.md5(repr(parts).encode()).hexdigest()
+
+
+def conditional_response(request, etag, last_modified, build):
+    """
+    Answers GET/HEAD with 304 Not Modified when If-None-Match (or, without
+    it, If-Modified-Since) matches; otherwise returns build() with ETag and
+    Last-Modified set. Last-Modified has one-second resolution, so polling
+    clients should prefer the ETag.
+    """
+    timestamp = int(last_modified.timestamp()) if last_modified else None
+    not_modified = get_conditional_response(request, etag=etag, last_modified=timestamp)
+    if not_modified is not None:
+        not_modified['ETag'] = etag
+        return not_modified
+    response = build()
+    response['ETag'] = etag
+    if timestamp:
+        response['Last-Modified'] = http_date(timestamp)
+    # Cacheable, but revalidated on every poll
+    response['Cache-Control'] = 'no-cache'
+    return response
+
+
+class KeysetListMixin:
+    """
+    Keyset-paginated list endpoint. Each page is one range seek, narrowed to
+    the ?fields= columns, and carries an ETag over the ids and versions of
+    its rows, so an unchanged page is a 304 before any serialization.
+
+    Views using it set serializer_class and version_field (the datetime that
+    moves whenever a row changes) and define:
+        filtered_queryset(request, fields): the rows to list, filtered and
+            narrowed to the columns fields needs
+        paginate(queryset, page_size): a KeysetPage of queryset, following
+            the request's after/before cursor
+    """
+    version_field = None
+
+    def get_serializer_context(self):
+        return {'request': self.request}
+
+    def page_size(self, request):
+        try:
+            size = int(request.query_params.get('page_size', settings.API_PAGE_SIZE))
+        except ValueError:
+            raise ValidationError({'page_size': ["Must be an integer."]})
+        return max(1, min(size, settings.API_MAX_PAGE_SIZE))
+
+    def fields(self, request):
+        return self.serializer_class.parse_fields(request.query_params.get('fields'))
+
+    def version(self, item):
+        return getattr(item, self.version_field)
+
+    def list(self, request):
+        fields = self.fields(request)
+        page = self.paginate(self.filtered_queryset(request, fields), page_size=self.page_size(request))
+        etag = _etag(fields, page.next_cursor, page.previous_cursor, [(item.pk, self.version(item)) for item in page.items])
+
+        def build():
+            context = {**self.get_serializer_context(), 'fields': fields}
+            return Response({
+                'results': self.serializer_class(page.items, many=True, context=context).data,
+                'next': self._page_link(request, 'after', page.next_cursor),
+                'previous': self._page_link(request, 'before', page.previous_cursor),
+            })
+
+        # Rows can be added to or removed from a page without any row's
+        # version moving past its Last-Modified, so lists only answer
+        # If-None-Match
+        response = conditional_response(request, etag, None, build)
+        last_modified = max((self.version(item) for item in page.items), default=None)
+        if last_modified and response.status_code == 200:
+            response['Last-Modified'] = http_date(int(last_modified.timestamp()))
+        return response
+
+    def _page_link(self, request, key, cursor):
+        if not cursor:
+            return None
+        params = request.query_params.copy()
+        params.pop('after', None)
+        params.pop('before', None)
+        params[key] = cursor
+        return request.build_absolute_uri(f"{request.path}?{params.urlencode()}")
+
+
+class PatientViewSet(KeysetListMixin, viewsets.ViewSet):
+    """
+    Patients, newest first. Filters are those of the registry page (q,
+    risk_level, condition, age_min/age_max, admitted_from/admitted_to).
+    Writes go through the audit service, so they are scored and audited like
+    form edits.
+    """
+    serializer_class = PatientSerializer
+    version_field = 'updated_at'
+
+    def filtered_queryset(self, request, fields):
+        form = PatientFilterForm(request.query_params)
+        if not form.is_valid():
+            raise ValidationError(form.errors)
+        queryset = Patient.objects.filter(**form.filter_kwargs()).only(*PatientSerializer.columns(fields))
+        return search_patients(queryset, form.cleaned_data['q'])
+
+    def paginate(self, queryset, page_size):
+        return keyset_paginate(
+            queryset, 'created_at', page_size,
+            after=self.request.query_params.get('after'), before=self.request.query_params.get('before'),
+        )
+
+    def retrieve(self, request, pk=None):
+        fields = self.fields(request)
+        patient = get_object_or_404(Patient.objects.only(*PatientSerializer.columns(fields)), pk=pk)
+        return conditional_response(
+            request, _etag(fields, patient.pk, patient.updated_at), patient.updated_at,
+            lambda: Response(PatientSerializer(patient, context={**self.get_serializer_context(), 'fields': fields}).data),
+        )
+
+    def create(self, request):
+        serializer = PatientSerializer(data=request.data, context=self.get_serializer_context())
+        serializer.is_valid(raise_exception=True)
+        patient = create_patient_with_risk(serializer.validated_data)
+        return Response(PatientSerializer(patient).data, status=status.HTTP_201_CREATED)
+
+    def update(self, request, pk=None, partial=False):
+        patient = get_object_or_404(Patient, pk=pk)
+        serializer = PatientSerializer(patient, data=request.data, partial=partial, context=self.get_serializer_context())
+        serializer.is_valid(raise_exception=True)
+        update_patient_risk_and_audit(patient.pk, serializer.validated_data)
+        patient.refresh_from_db()
+        return Response(PatientSerializer(patient).data)
+
+    def partial_update(self, request, pk=None):
+        return self.update(request, pk, partial=True)
+
+    def destroy(self, request, pk=None):
+        get_object_or_404(Patient, pk=pk).delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    @action(detail=False, methods=['post'], url_path='bulk-update')
+    def bulk_update(self, request):
+        """
+        Partial changes to many patients, as a list of objects each holding
+        an id and the fields to change. Every item is validated first; if any
+        is invalid nothing is written and the errors come back per item.
+        Otherwise all changes are applied in one transaction and the response
+        holds a result per item: 'updated', 'unchanged' or 'not_found'.
+        """
+        items = request.data
+        if not isinstance(items, list) or not items:
+            raise ValidationError({'non_field_errors': ["Expected a non-empty list of changes."]})
+        if len(items) > settings.API_BULK_UPDATE_MAX:
+            raise ValidationError({'non_field_errors': [f"At most {settings.API_BULK_UPDATE_MAX} changes per request."]})
+
+        updates, errors = {}, []
+        for index, item in enumerate(items):
+            if not isinstance(item, dict):
+                errors.append({'index': index, 'errors': {'non_field_errors': ["Expected an object."]}})
+                continue
+            item = dict(item)
+            patient_id = item.pop('id', None)
+            if not isinstance(patient_id, int) or isinstance(patient_id, bool):
+                errors.append({'index': index, 'errors': {'id': ["A patient id is required."]}})
+                continue
+            if patient_id in updates:
+                errors.append({'index': index, 'id': patient_id, 'errors': {'id': ["Duplicate patient id."]}})
+                continue
+            serializer = PatientSerializer(data=item, partial=True, context=self.get_serializer_context())
+            if serializer.is_valid():
+                updates[patient_id] = serializer.validated_data
+            else:
+                errors.append({'index': index, 'id': patient_id, 'errors': serializer.errors})
+        if errors:
+            return Response({'errors': errors}, status=status.HTTP_400_BAD_REQUEST)
+
+        results = bulk_update_patients(updates)
+        return Response({'results': [{'id': patient_id, **results[patient_id]} for patient_id in updates]})
+
+
+class AuditLogViewSet(KeysetListMixin, viewsets.ViewSet):
+    """
+    Audit rows, newest first, archived rows included. Filters are those of
+    the audit log page (date_from, date_to, patient, risk_before, risk_after).
+    Read-only: rows are written by patient updates.
+    """
+    serializer_class = AuditLogSerializer
+    # Audit rows never change once written
+    version_field = 'timestamp'
+
+    def filtered_queryset(self, request, fields):
+        form = AuditLogFilterForm(request.query_params)
+        if not form.is_valid():
+            raise ValidationError(form.errors)
+        self.filters = form.filter_kwargs()
+        queryset = AuditLog.objects.filter(**self.filters)
+        if fields is None or 'patient_name' in fields:
+            queryset = queryset.select_related('patient')
+        return queryset.only(*AuditLogSerializer.columns(fields))
+
+    def paginate(self, queryset, page_size):
+        return paginate_audit_logs(
+            queryset, self.filters, page_size,
+            after=self.request.query_params.get('after'), before=self.request.query_params.get('before'),
+        )
+
+    def retrieve(self, request, pk=None):
+        fields = self.fields(request)
+        queryset = AuditLog.objects.only(*AuditLogSerializer.columns(fields))
+        if fields is None or 'patient_name' in fields:
+            queryset = queryset.select_related('patient')
+        log = get_object_or_404(queryset, pk=pk)
+        return conditional_response(
+            request, _etag(fields, log.pk), log.timestamp,
+            lambda: Response(AuditLogSerializer(log, context={**self.get_serializer_context(), 'fields': fields}).data),
+        )
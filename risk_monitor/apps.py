@@ -3,3 +3,9 @@ from django.apps import AppConfig
 class RiskMonitorConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'risk_monitor'
+
+    def ready(self):
+        from django.conf import settings
+        from . import signals  # noqa: F401
+        from .services.risk_engine import configure_risk_cache
+        configure_risk_cache(getattr(settings, 'RISK_ENGINE_CACHE_SIZE', 0))
@@ -1,5 +1,6 @@
 from django import forms
 from .models import Patient
+from .utils.conditions import VOCABULARY
 
 class PatientForm(forms.ModelForm):
     pdf_file = forms.FileField(required=False, label="Upload Medical Record (PDF)", help_text="Autofill vitals from PDF")
@@ -25,10 +26,11 @@ class PatientForm(forms.ModelForm):
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        # Pre-fill chronic conditions as comma-separated string if instance exists
+        # Pre-fill chronic conditions as comma-separated string if instance exists.
+        # Set on the form's initial so changed_data compares like with like
         if self.instance and self.instance.pk and self.instance.chronic_conditions:
             if isinstance(self.instance.chronic_conditions, list):
-                self.fields['chronic_conditions'].initial = ", ".join(self.instance.chronic_conditions)
+                self.initial['chronic_conditions'] = ", ".join(self.instance.chronic_conditions)
 
         for field in self.fields:
             if field not in ['wbc_flag', 'creatinine_flag', 'crp_flag']:
@@ -43,3 +45,95 @@ class PatientForm(forms.ModelForm):
             # Split by comma, semicolon, or newline
             return [x.strip() for x in re.split(r'[,\n;]+', data) if x.strip()]
         return []
+
+class AuditLogFilterForm(forms.Form):
+    """
+    Query-string filters shared by the audit log page and CSV export.
+    """
+    RISK_CHOICES = [('', 'Any')] + Patient.RISK_CHOICES
+
+    date_from = forms.DateField(required=False, widget=forms.DateInput(attrs={'type': 'date', 'class': 'form-control form-control-sm'}))
+    date_to = forms.DateField(required=False, widget=forms.DateInput(attrs={'type': 'date', 'class': 'form-control form-control-sm'}))
+    patient = forms.IntegerField(required=False, min_value=1, widget=forms.HiddenInput)
+    risk_before = forms.ChoiceField(choices=RISK_CHOICES, required=False, widget=forms.Select(attrs={'class': 'form-select form-select-sm'}))
+    risk_after = forms.ChoiceField(choices=RISK_CHOICES, required=False, widget=forms.Select(attrs={'class': 'form-select form-select-sm'}))
+
+    def filter_kwargs(self):
+        """
+        ORM filter arguments for the cleaned filters. Date bounds become
+        timestamp ranges in the current timezone so they can use an index.
+        """
+        from datetime import datetime, time, timedelta
+        from django.utils import timezone
+
+        data = self.cleaned_data
+        kwargs = {}
+        if data.get('date_from'):
+            kwargs['timestamp__gte'] = timezone.make_aware(datetime.combine(data['date_from'], time.min))
+        if data.get('date_to'):
+            kwargs['timestamp__lt'] = timezone.make_aware(datetime.combine(data['date_to'] + timedelta(days=1), time.min))
+        if data.get('patient'):
+            kwargs['patient_id'] = data['patient']
+        if data.get('risk_before'):
+            kwargs['risk_before'] = data['risk_before']
+        if data.get('risk_after'):
+            kwargs['risk_after'] = data['risk_after']
+        return kwargs
+
+class PatientFilterForm(forms.Form):
+    """
+    Query-string filters for the patient registry. The search text is applied
+    separately, through the text index (see search_service).
+    """
+    q = forms.CharField(required=False, max_length=200,
+                        widget=forms.TextInput(attrs={'type': 'search', 'placeholder': 'Name, contact, condition or note',
+                                                      'class': 'form-control form-control-sm'}))
+    risk_level = forms.ChoiceField(choices=[('', 'Any risk')] + Patient.RISK_CHOICES, required=False,
+                                   widget=forms.Select(attrs={'class': 'form-select form-select-sm'}))
+    admitted_from = forms.DateField(required=False, widget=forms.DateInput(attrs={'type': 'date', 'class': 'form-control form-control-sm'}))
+    admitted_to = forms.DateField(required=False, widget=forms.DateInput(attrs={'type': 'date', 'class': 'form-control form-control-sm'}))
+    condition = forms.ChoiceField(choices=[('', 'Any condition')] + [(c.code, c.name) for c in VOCABULARY], required=False,
+                                  widget=forms.Select(attrs={'class': 'form-select form-select-sm'}))
+    age_min = forms.IntegerField(required=False, min_value=0, max_value=120,
+                                 widget=forms.NumberInput(attrs={'class': 'form-control form-control-sm'}))
+    age_max = forms.IntegerField(required=False, min_value=0, max_value=120,
+                                 widget=forms.NumberInput(attrs={'class': 'form-control form-control-sm'}))
+
+    def filter_kwargs(self):
+        data = self.cleaned_data
+        kwargs = {}
+        if data.get('risk_level'):
+            kwargs['risk_level'] = data['risk_level']
+        if data.get('condition'):
+            kwargs['conditions'] = data['condition']
+        if data.get('age_min') is not None:
+            kwargs['age__gte'] = data['age_min']
+        if data.get('age_max') is not None:
+            kwargs['age__lte'] = data['age_max']
+        if data.get('admitted_from'):
+            kwargs['admission_date__gte'] = data['admitted_from']
+        if data.get('admitted_to'):
+            kwargs['admission_date__lte'] = data['admitted_to']
+        return kwargs
+
+class VitalsHistoryForm(forms.Form):
+    """
+    Query-string parameters for a patient's vitals history.
+    """
+    FIELD_CHOICES = [(field, field) for field in ('heart_rate', 'systolic_bp', 'spo2', 'temperature', 'respiratory_rate')]
+    RESOLUTION_CHOICES = [('raw', 'raw'), ('1m', '1m'), ('1h', '1h')]
+    RESOLUTION_SECONDS = {'raw': 0, '1m': 60, '1h': 3600}
+
+    field = forms.ChoiceField(choices=FIELD_CHOICES)
+    resolution = forms.ChoiceField(choices=RESOLUTION_CHOICES, required=False)
+    since = forms.DateTimeField(required=False)
+    until = forms.DateTimeField(required=False)
+
+    def history_kwargs(self):
+        data = self.cleaned_data
+        return {
+            'field': data['field'],
+            'resolution': self.RESOLUTION_SECONDS[data.get('resolution') or 'raw'],
+            'since': data.get('since'),
+            'until': data.get('until'),
+        }
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from risk_monitor.services.audit_archive import archive_audit_logs
+
+
+class Command(BaseCommand):
+    help = "Moves audit rows past the archive horizon into compressed per-month segment files"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, help="Archive rows older than this many days "
+                                                     "(default: AUDIT_ARCHIVE_AFTER_DAYS)")
+        parser.add_argument('--batch-size', type=int, help="Rows deleted per transaction "
+                                                           "(default: AUDIT_ARCHIVE_BATCH_SIZE)")
+
+    def handle(self, *args, **options):
+        result = archive_audit_logs(days=options['days'], batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {result['segments']} segment(s) with {result['archived']} row(s); "
+            f"deleted {result['deleted']} row(s) from the audit table"
+        ))
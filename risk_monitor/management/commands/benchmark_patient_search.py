@@ -0,0 +1,82 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from risk_monitor.models import Patient
+from risk_monitor.services.search_service import search_patients
+from risk_monitor.utils.pagination import keyset_paginate
+
+FIRST_NAMES = ["Asha", "Rahul", "Meera", "John", "Fatima", "Wei", "Carlos", "Priya", "Olga", "Kwame"]
+LAST_NAMES = ["Sharma", "Iyer", "Smith", "Khan", "Chen", "Garcia", "Nair", "Petrov", "Mensah", "Das"]
+CONDITIONS = ["Diabetes", "Hypertension", "COPD", "Asthma", "Cardiac Disease", "Chronic Kidney Disease"]
+NOTE_WORDS = ["stable", "dyspnoea", "fever", "review", "oedema", "chest", "pain", "discharged", "follow", "up"]
+
+# (label, search text, extra filters) timed against the first registry page
+QUERIES = [
+    ("name prefix", "meer", {}),
+    ("full name", "rahul iyer", {}),
+    ("condition", "hypertension", {}),
+    ("condition + HIGH", "diab", {'risk_level': 'HIGH'}),
+    ("note word + age 60-80", "oedema", {'age__gte': 60, 'age__lte': 80}),
+    ("rare term", "zzqx", {}),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Seeds a throwaway patient table (1M rows by default), then times indexed "
+        "search with filters and incremental index updates. Changes are rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--patients', type=int, default=1_000_000)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--page-size', type=int, default=25)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            start = time.perf_counter()
+            self._seed(options['patients'], options['seed'])
+            elapsed = time.perf_counter() - start
+            self.stdout.write(f"Seeded and indexed {options['patients']:,} patients in {elapsed:.1f}s "
+                              f"({options['patients'] / elapsed:,.0f}/s)")
+
+            self.stdout.write(f"{'query':<24} {'matches':>10} {'page ms':>9}")
+            for label, text, filters in QUERIES:
+                queryset = search_patients(Patient.objects.filter(**filters), text)
+                timings = []
+                for _ in range(options['repeat']):
+                    start = time.perf_counter()
+                    keyset_paginate(queryset, 'created_at', options['page_size'])
+                    timings.append(time.perf_counter() - start)
+                self.stdout.write(f"{label:<24} {queryset.count():>10,} {statistics.median(timings) * 1000:>9.1f}")
+
+            patient = Patient.objects.order_by('?').first()
+            timings = []
+            for i in range(options['repeat']):
+                patient.notes = f"Benchmark note {i}"
+                start = time.perf_counter()
+                patient.save()
+                timings.append(time.perf_counter() - start)
+            self.stdout.write(f"Patient save with reindex: {statistics.median(timings) * 1000:.2f} ms")
+            transaction.set_rollback(True)
+
+    def _seed(self, patients, seed, chunk_size=10_000):
+        rng = random.Random(seed)
+        for offset in range(0, patients, chunk_size):
+            Patient.objects.bulk_create([
+                Patient(
+                    full_name=f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}", age=rng.randint(18, 95),
+                    gender='Other', contact_details=f"+91 9{rng.randint(0, 999_999_999):09d}",
+                    heart_rate=rng.randint(50, 140), systolic_bp=rng.randint(80, 170), spo2=rng.randint(85, 100),
+                    temperature=round(rng.uniform(36, 40), 1), respiratory_rate=rng.randint(10, 30),
+                    chronic_conditions=rng.sample(CONDITIONS, rng.randint(0, 2)),
+                    notes=" ".join(rng.choices(NOTE_WORDS, k=rng.randint(0, 8))),
+                    risk_score=rng.randint(0, 9), risk_level=rng.choice(['LOW', 'MEDIUM', 'HIGH']),
+                )
+                for _ in range(min(chunk_size, patients - offset))
+            ], batch_size=1000)
@@ -0,0 +1,111 @@
+import random
+import re
+import time
+
+from django.core.management.base import BaseCommand
+
+from risk_monitor.utils import pdf_parser
+from risk_monitor.utils.pdf_parser import extract_vitals_from_text
+
+FILLER_WORDS = (
+    "the patient was reviewed on the ward and remained stable with no acute distress noted during "
+    "this admission period pain controlled tolerating oral intake mobilising with assistance plan "
+    "to continue current management and review bloods tomorrow morning"
+).split()
+
+REPORT_LINES = [
+    "Patient Name: {name}", "Age: {age}", "Gender: {gender}", "HR: {hr}", "BP {sbp}/{dbp}",
+    "SpO2 = {spo2}", "Temperature: {temp}", "RR {rr}", "Admission Date: {date}",
+]
+HISTORY_LINES = [
+    "History of type 2 diabetes", "Known COPD", "high blood pressure", "asthma since childhood",
+    "heart failure with reduced EF", "Elevated WBC", "high CRP", "elevated creatinine",
+]
+
+
+def generate_report(pages, rng):
+    """
+    A synthetic multi-page report: filler prose with the vitals block, history
+    and notes scattered across pages, the way discharge bundles read.
+    """
+    values = {
+        'name': rng.choice(["John Smith", "Ann Lee", "Maria Garcia"]), 'age': rng.randint(18, 95),
+        'gender': rng.choice(["Male", "Female", "F", "M"]), 'hr': rng.randint(45, 150),
+        'sbp': rng.randint(80, 180), 'dbp': rng.randint(50, 110), 'spo2': rng.randint(85, 100),
+        'temp': f"{rng.uniform(35.5, 40.5):.1f}", 'rr': rng.randint(10, 32),
+        'date': f"2026-0{rng.randint(1, 9)}-1{rng.randint(0, 9)}",
+    }
+    lines = [line.format(**values) for line in REPORT_LINES] + rng.sample(HISTORY_LINES, 3)
+    placement = {rng.randrange(pages): [] for _ in lines}
+    for line in lines:
+        placement.setdefault(rng.choice(list(placement)), []).append(line)
+
+    text = []
+    for page in range(pages):
+        prose = " ".join(rng.choice(FILLER_WORDS) for _ in range(400))
+        text.append("\n".join([f"Page {page + 1} of {pages}", prose] + placement.get(page, [])))
+    text.append("Notes: Discharged home with follow-up in two weeks.")
+    return "\n".join(text) + "\n"
+
+
+def per_field_extract(text):
+    """
+    The old extraction strategy over today's patterns: one re.search per field
+    and a substring scan per keyword. Only a timing baseline; the output the
+    extractor must match is the frozen copy in PdfExtractorGoldenTests.
+    """
+    data = {}
+    text_lower = text.lower()
+    for field, (labels, separator, value) in pdf_parser.FIELD_PATTERNS.items():
+        label = '(?:' + '|'.join(pdf_parser._label_regex(label) for label in labels) + ')'
+        match = re.search(label + separator + value, text, re.IGNORECASE)
+        if match:
+            converted = pdf_parser._convert(field, match.group(1).strip())
+            if converted is not None:
+                data[field] = converted
+
+    conditions = [
+        condition for condition, keywords in pdf_parser.CONDITION_KEYWORDS.items()
+        if any(k in text_lower for k in keywords)
+    ]
+    if conditions:
+        data['chronic_conditions'] = ", ".join(conditions)
+    for flag, keywords in pdf_parser.LAB_KEYWORDS.items():
+        if any(k in text_lower for k in keywords):
+            data[flag] = True
+
+    labels, separator, value = pdf_parser.NOTES_PATTERN
+    notes_match = re.search('(?:' + '|'.join(labels) + ')' + separator + value, text, re.IGNORECASE | re.DOTALL)
+    if notes_match:
+        data['notes'] = notes_match.group(1).strip()[:pdf_parser.NOTES_MAX_LENGTH]
+    return data
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmarks the single-pass PDF text extractor against per-field regex searches "
+        "on multi-page reports. Identical output is checked by the test suite."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pages', nargs='+', type=int, default=[1, 10, 100])
+        parser.add_argument('--reports', type=int, default=20, help="Reports generated per page count")
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        self.stdout.write(f"{'pages':>6} {'single-pass ms':>15} {'per-field ms':>13} {'speedup':>8}")
+        for pages in options['pages']:
+            reports = [generate_report(pages, rng) for _ in range(options['reports'])]
+
+            start = time.perf_counter()
+            for text in reports:
+                extract_vitals_from_text(text)
+            fast_ms = (time.perf_counter() - start) * 1000 / len(reports)
+
+            start = time.perf_counter()
+            for text in reports:
+                per_field_extract(text)
+            slow_ms = (time.perf_counter() - start) * 1000 / len(reports)
+
+            self.stdout.write(f"{pages:>6} {fast_ms:>15.2f} {slow_ms:>13.2f} {slow_ms / max(fast_ms, 1e-9):>7.1f}x")
@@ -0,0 +1,78 @@
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from risk_monitor.services.risk_engine import calculate_risk, calculate_risk_batch
+
+CONDITION_POOL = [
+    [], [], [], ["Diabetes"], ["Hypertension"], ["COPD", "Asthma"],
+    ["Type 2 Diabetes", "Cardiac Disease"], ["Asthma"],
+]
+
+
+def generate_columns(rows, seed=42):
+    """
+    Builds a synthetic population that exercises every rule threshold.
+    """
+    rng = np.random.default_rng(seed)
+    return {
+        'age': rng.integers(0, 100, rows),
+        'heart_rate': rng.integers(40, 160, rows),
+        'systolic_bp': rng.integers(70, 180, rows),
+        'spo2': rng.integers(80, 101, rows),
+        'temperature': np.round(rng.uniform(35.0, 41.0, rows), 1),
+        'respiratory_rate': rng.integers(8, 35, rows),
+        'er_visits': rng.integers(0, 6, rows),
+        'wbc_flag': rng.random(rows) < 0.2,
+        'creatinine_flag': rng.random(rows) < 0.1,
+        'crp_flag': rng.random(rows) < 0.15,
+        'chronic_conditions': [CONDITION_POOL[i] for i in rng.integers(0, len(CONDITION_POOL), rows)],
+    }
+
+
+def row_at(columns, index):
+    return {
+        name: values[index].item() if isinstance(values, np.ndarray) else values[index]
+        for name, values in columns.items()
+    }
+
+
+class Command(BaseCommand):
+    help = "Benchmarks calculate_risk_batch against the scalar calculate_risk (patients/sec)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', nargs='+', type=int, default=[10_000, 100_000, 1_000_000])
+        parser.add_argument('--scalar-limit', type=int, default=100_000,
+                            help="Skip the scalar baseline above this many rows")
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{'rows':>10} {'batch pts/s':>14} {'scalar pts/s':>14} {'speedup':>8}")
+
+        for rows in options['sizes']:
+            columns = generate_columns(rows, options['seed'])
+
+            start = time.perf_counter()
+            batch = calculate_risk_batch(columns)
+            batch_rate = rows / max(time.perf_counter() - start, 1e-9)
+
+            scalar_rate = None
+            if rows <= options['scalar_limit']:
+                start = time.perf_counter()
+                scalar = [calculate_risk(row_at(columns, i)) for i in range(rows)]
+                scalar_rate = rows / max(time.perf_counter() - start, 1e-9)
+
+                mismatches = sum(
+                    1 for i, result in enumerate(scalar)
+                    if result['total_score'] != batch['total_score'][i]
+                    or result['risk_level'] != batch['risk_level'][i]
+                )
+                if mismatches:
+                    self.stderr.write(self.style.ERROR(f"{mismatches} rows differ from calculate_risk at {rows} rows"))
+
+            self.stdout.write(
+                f"{rows:>10} {batch_rate:>14,.0f} "
+                f"{(f'{scalar_rate:,.0f}' if scalar_rate else '-'):>14} "
+                f"{(f'{batch_rate / scalar_rate:.1f}x' if scalar_rate else '-'):>8}"
+            )
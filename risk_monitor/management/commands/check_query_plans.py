@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from risk_monitor.utils.query_plans import check_page, plan_pages, seed_plan_dataset
+
+
+class Command(BaseCommand):
+    help = (
+        "Seeds a throwaway dataset, renders each list/history view and fails on "
+        "full table scans, unindexed sorts or N+1 query patterns. Changes are rolled back. "
+        "The same checks run in the test suite (QueryPlanTests)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--patients', type=int, default=5000)
+        parser.add_argument('--audits-per-patient', type=int, default=4)
+        parser.add_argument('--verbose-plans', action='store_true')
+
+    def handle(self, *args, **options):
+        failures = []
+        log = self.stdout.write if options['verbose_plans'] else None
+        with transaction.atomic():
+            patient_id = seed_plan_dataset(options['patients'], options['audits_per_patient'])
+            for name, url in plan_pages(patient_id):
+                statements, page_failures = check_page(name, url, log)
+                self.stdout.write(f"{name}: {len(statements)} queries")
+                failures += page_failures
+            transaction.set_rollback(True)
+
+        if failures:
+            for failure in failures:
+                self.stderr.write(self.style.ERROR(failure))
+            raise CommandError(f"{len(failures)} query plan regression(s)")
+        self.stdout.write(self.style.SUCCESS("All views use indexed access paths with bounded queries"))
@@ -0,0 +1,109 @@
+import json
+import random
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+
+from risk_monitor.models import Patient
+from risk_monitor.services.dashboard_service import adjust_risk_counts, level_transition_deltas
+
+LOADTEST_NAME_PREFIX = "Loadtest Patient"
+# Vitals sent in each reading: (min, max, largest change between readings)
+DRIFT = {
+    'heart_rate': (40, 180, 3),
+    'systolic_bp': (70, 200, 3),
+    'spo2': (80, 100, 1),
+    'respiratory_rate': (8, 40, 1),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Posts generated NDJSON vitals batches to the ingest endpoint for a set of throwaway "
+        "patients and fails if throughput is below VITALS_INGEST_TARGET_PER_SEC"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--patients', type=int, default=1000)
+        parser.add_argument('--readings', type=int, default=100_000, help="Total readings to post")
+        parser.add_argument('--request-size', type=int, default=5000, help="Readings per request")
+        parser.add_argument('--target', type=float, default=None,
+                            help="Readings/sec to reach (default VITALS_INGEST_TARGET_PER_SEC)")
+        parser.add_argument('--token', help="Device token to send (default the first of VITALS_INGEST_TOKENS)")
+        parser.add_argument('--keep', action='store_true', help="Keep the generated patients and readings")
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        target = options['target'] or settings.VITALS_INGEST_TARGET_PER_SEC
+        token = options['token'] or next(iter(settings.VITALS_INGEST_TOKENS), None)
+        if not token:
+            raise CommandError("Pass --token or set VITALS_INGEST_TOKENS")
+        patient_ids = self._seed(options['patients'], rng)
+        # Each patient's vitals drift from their admission values, as a
+        # monitor's successive readings do
+        vitals = {
+            patient['pk']: patient
+            for patient in Patient.objects.filter(pk__in=patient_ids).values('pk', *DRIFT)
+        }
+
+        host = next((h for h in settings.ALLOWED_HOSTS if h not in ('*', '')), 'localhost').lstrip('.')
+        client = Client(HTTP_HOST=host, HTTP_AUTHORIZATION=f"Bearer {token}")
+        url = reverse('risk_monitor:vitals_ingest')
+        start_time = timezone.now()
+        accepted = rejected = 0
+        elapsed = 0.0
+        try:
+            for offset in range(0, options['readings'], options['request_size']):
+                count = min(options['request_size'], options['readings'] - offset)
+                lines = []
+                for i in range(count):
+                    patient = vitals[rng.choice(patient_ids)]
+                    for field, (low, high, step) in DRIFT.items():
+                        patient[field] = min(high, max(low, patient[field] + rng.randint(-step, step)))
+                    lines.append(json.dumps({
+                        'patient_id': patient['pk'],
+                        'observed_at': (start_time + timedelta(seconds=(offset + i) / 100)).isoformat(),
+                        **{field: patient[field] for field in DRIFT},
+                    }))
+                body = "\n".join(lines)
+                started = time.perf_counter()
+                response = client.post(url, body, content_type='application/x-ndjson')
+                elapsed += time.perf_counter() - started
+                if response.status_code != 200:
+                    raise CommandError(f"Ingest returned {response.status_code}: {response.content[:200]!r}")
+                accepted += response.json()['accepted']
+                rejected += response.json()['rejected']
+        finally:
+            if not options['keep']:
+                Patient.objects.filter(pk__in=patient_ids).delete()
+
+        rate = accepted / elapsed if elapsed else 0.0
+        self.stdout.write(
+            f"{accepted} accepted, {rejected} rejected in {elapsed:.2f}s: {rate:,.0f} readings/s "
+            f"(target {target:,.0f})"
+        )
+        if rate < target:
+            raise CommandError(f"Throughput {rate:,.0f}/s is below the {target:,.0f}/s target")
+        self.stdout.write(self.style.SUCCESS("Throughput target met"))
+
+    def _seed(self, count, rng):
+        patients = []
+        for i in range(count):
+            patient = Patient(
+                full_name=f"{LOADTEST_NAME_PREFIX} {i}", age=rng.randint(18, 95), gender='Other',
+                heart_rate=rng.randint(50, 140), systolic_bp=rng.randint(85, 170), spo2=rng.randint(86, 100),
+                temperature=round(rng.uniform(36, 39), 1), respiratory_rate=rng.randint(10, 28),
+            )
+            patient.rescore()
+            patients.append(patient)
+        Patient.objects.bulk_create(patients, batch_size=1000)
+        adjust_risk_counts(level_transition_deltas((None, patient.risk_level) for patient in patients))
+        return list(
+            Patient.objects.filter(full_name__startswith=LOADTEST_NAME_PREFIX).values_list('pk', flat=True)
+        )
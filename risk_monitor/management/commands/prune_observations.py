@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from risk_monitor.services.observation_service import prune_observations
+
+
+class Command(BaseCommand):
+    help = "Deletes raw vitals observations and 1-minute rollups past their retention period"
+
+    def handle(self, *args, **options):
+        deleted = prune_observations()
+        self.stdout.write(self.style.SUCCESS(
+            f"Deleted {deleted['observations']} observation(s) and {deleted['minute_rollups']} 1-minute rollup(s)"
+        ))
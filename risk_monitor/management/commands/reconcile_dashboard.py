@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from risk_monitor.services.dashboard_service import reconcile_risk_counts
+
+
+class Command(BaseCommand):
+    help = "Checks the dashboard risk-level counters against a full recount of patients"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true', help="Overwrite counters that disagree with the recount")
+
+    def handle(self, *args, **options):
+        mismatches = reconcile_risk_counts(fix=options['fix'])
+        if not mismatches:
+            self.stdout.write(self.style.SUCCESS("Dashboard counters match the patient table"))
+            return
+
+        for level, (stored, actual) in sorted(mismatches.items()):
+            self.stdout.write(f"{level}: counter {stored}, actual {actual}")
+        if options['fix']:
+            self.stdout.write(self.style.SUCCESS(f"Fixed {len(mismatches)} counter(s)"))
+        else:
+            raise CommandError(f"{len(mismatches)} counter(s) out of sync; rerun with --fix")
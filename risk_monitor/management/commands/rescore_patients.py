@@ -0,0 +1,192 @@
+import os
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from risk_monitor.models import Patient, AuditLog
+from risk_monitor.services.dashboard_service import adjust_risk_counts, level_transition_deltas
+from risk_monitor.services.live_events import publish_on_commit, risk_transition_event
+from risk_monitor.services.risk_engine import SCORING_FIELDS, calculate_risk_batch
+
+# Keeps `id IN (...)` lists under the SQLite bound-parameter limit
+UPDATE_BATCH_SIZE = 900
+
+# Columns read per patient: the stored result, then the scoring inputs
+READ_FIELDS = ('id', 'risk_score', 'risk_level') + SCORING_FIELDS
+
+
+def score_chunk(columns):
+    """
+    Scores one chunk of columns. Runs in a worker process, so it only takes and
+    returns plain lists.
+    """
+    result = calculate_risk_batch(columns)
+    return result['total_score'].tolist(), result['risk_level'].tolist()
+
+
+class Command(BaseCommand):
+    help = "Recalculates stored risk_score/risk_level for every patient in keyset-ordered chunks"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=5000)
+        parser.add_argument('--workers', type=int, default=None,
+                            help="Scoring processes (default: CPU count, 0 scores in this process)")
+        parser.add_argument('--start-after', type=int, default=None,
+                            help="Only rescore patients with an id greater than this")
+        parser.add_argument('--checkpoint', default=None,
+                            help="File holding the last committed id; resumes from it when present")
+        parser.add_argument('--audit', action='store_true',
+                            help="Write one audit entry per patient whose risk changed")
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, **options):
+        checkpoint = Path(options['checkpoint']) if options['checkpoint'] else None
+        last_id = options['start_after']
+        if last_id is None and checkpoint and checkpoint.exists():
+            last_id = int(checkpoint.read_text().strip() or 0)
+            self.stdout.write(f"Resuming after patient id {last_id}")
+        last_id = last_id or 0
+
+        workers = options['workers'] if options['workers'] is not None else os.cpu_count()
+        pool = ProcessPoolExecutor(max_workers=workers) if workers else None
+
+        total_rows = total_changed = total_skipped = 0
+        started = time.perf_counter()
+        try:
+            for rows, scores, levels in self._score_chunks(last_id, options['chunk_size'], pool, workers):
+                changed = [
+                    (row, scores[i], levels[i])
+                    for i, row in enumerate(rows)
+                    if scores[i] != row[1] or levels[i] != row[2]
+                ]
+
+                written = len(changed)
+                if not options['dry_run']:
+                    with transaction.atomic():
+                        written = self._write_changes(changed, options['audit'])
+                    if checkpoint:
+                        checkpoint.write_text(str(rows[-1][0]))
+
+                total_rows += len(rows)
+                total_changed += written
+                total_skipped += len(changed) - written
+                elapsed = time.perf_counter() - started
+                self.stdout.write(
+                    f"up to id {rows[-1][0]}: {total_rows} rows, {total_changed} changed, "
+                    f"{total_skipped} edited meanwhile, {total_rows / max(elapsed, 1e-9):,.0f} rows/sec"
+                )
+        finally:
+            if pool:
+                pool.shutdown()
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Rescored {total_rows} patients ({total_changed} changed, {total_skipped} edited meanwhile) in {elapsed:.1f}s "
+            f"({total_rows / max(elapsed, 1e-9):,.0f} rows/sec)"
+        ))
+
+    def _read_chunks(self, last_id, chunk_size):
+        while True:
+            rows = list(
+                Patient.objects.filter(id__gt=last_id)
+                .order_by('id')
+                .values_list(*READ_FIELDS)[:chunk_size]
+            )
+            if not rows:
+                return
+            last_id = rows[-1][0]
+            yield rows
+
+    def _score_chunks(self, last_id, chunk_size, pool, workers):
+        """
+        Yields (rows, scores, levels) per chunk, in id order; rows are the
+        READ_FIELDS tuples as read. With a pool, the next chunk is read while
+        earlier ones score.
+        """
+        pending = []
+        for rows in self._read_chunks(last_id, chunk_size):
+            _, _, _, *values = zip(*rows)
+            columns = {field: list(column) for field, column in zip(SCORING_FIELDS, values)}
+
+            if pool is None:
+                yield (rows,) + score_chunk(columns)
+                continue
+
+            pending.append((rows, pool.submit(score_chunk, columns)))
+            # Keep the pool busy without reading the whole table ahead
+            if len(pending) > workers:
+                rows, future = pending.pop(0)
+                yield (rows,) + future.result()
+
+        for rows, future in pending:
+            yield (rows,) + future.result()
+
+    def _write_changes(self, changed, audit):
+        """
+        Writes the new results of (row, score, level) changes and returns how
+        many were written. Chunks are read and scored outside any
+        transaction, so the rows are locked and re-read first: a row whose
+        stored result or scoring inputs moved since was rescored by the edit
+        that moved them, and is skipped rather than overwritten with a score
+        of its old values.
+        """
+        if not changed:
+            return 0
+        read = {row[0]: row for row, _, _ in changed}
+        ids = sorted(read)
+        names = {}
+        for start in range(0, len(ids), UPDATE_BATCH_SIZE):
+            for full_name, *row in (
+                Patient.objects.select_for_update()
+                .filter(id__in=ids[start:start + UPDATE_BATCH_SIZE])
+                .order_by('id')
+                .values_list('full_name', *READ_FIELDS)
+            ):
+                if tuple(row) == read[row[0]]:
+                    names[row[0]] = full_name
+        changed = [(row, score, level) for row, score, level in changed if row[0] in names]
+
+        # Scores take few distinct values, so one UPDATE per (score, level) is far
+        # cheaper than bulk_update's per-row CASE expression on large chunks.
+        ids_by_result = defaultdict(list)
+        for row, score, level in changed:
+            ids_by_result[(score, level)].append(row[0])
+
+        now = timezone.now()
+        for (score, level), ids in ids_by_result.items():
+            for start in range(0, len(ids), UPDATE_BATCH_SIZE):
+                Patient.objects.filter(id__in=ids[start:start + UPDATE_BATCH_SIZE]).update(
+                    risk_score=score, risk_level=level, updated_at=now,
+                )
+        # The queryset UPDATEs skip post_save, so move the dashboard counters
+        # and publish level changes here
+        adjust_risk_counts(level_transition_deltas((row[2], level) for row, _, level in changed))
+        publish_on_commit([
+            risk_transition_event(
+                Patient(pk=row[0], full_name=names[row[0]], risk_score=score, risk_level=level), row[2], level,
+            )
+            for row, score, level in changed if level != row[2]
+        ])
+
+        if audit:
+            AuditLog.objects.bulk_create(
+                [
+                    AuditLog(
+                        patient_id=patient_id,
+                        changes=[["Risk Rescore", f"{old_level} ({old_score})", f"{level} ({score})"]],
+                        risk_before=old_level,
+                        risk_after=level,
+                        score_before=old_score,
+                        score_after=score,
+                        reason=f"Rule set rescore | Risk {old_level} → {level} | Score {old_score} → {score}",
+                    )
+                    for (patient_id, old_score, old_level, *_), score, level in changed
+                ],
+                batch_size=1000,
+            )
+        return len(changed)
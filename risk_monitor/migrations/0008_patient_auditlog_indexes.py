@@ -0,0 +1,42 @@
+# Generated by Django 6.0 on 2026-10-16 20:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('risk_monitor', '0007_auditlog_batch_id'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='patient',
+            name='er_visits',
+            field=models.IntegerField(default=0, help_text='Number of ER visits in last 30 days'),
+        ),
+        migrations.AddIndex(
+            model_name='auditlog',
+            index=models.Index(fields=['-timestamp', '-id'], name='auditlog_timestamp_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='auditlog',
+            index=models.Index(fields=['patient', '-timestamp', '-id'], name='auditlog_patient_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='auditlog',
+            index=models.Index(fields=['batch_id'], name='auditlog_batch_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='patient',
+            index=models.Index(fields=['risk_level', '-created_at', '-id'], name='patient_risk_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='patient',
+            index=models.Index(fields=['-created_at', '-id'], name='patient_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='patient',
+            index=models.Index(fields=['-admission_date'], name='patient_admission_idx'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 6.0 on 2026-10-16 20:40
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def populate_counts(apps, schema_editor):
+    Patient = apps.get_model('risk_monitor', 'Patient')
+    RiskLevelCount = apps.get_model('risk_monitor', 'RiskLevelCount')
+    counts = dict.fromkeys(['LOW', 'MEDIUM', 'HIGH'], 0)
+    counts.update(Patient.objects.values_list('risk_level').annotate(count=Count('id')).order_by())
+    RiskLevelCount.objects.bulk_create([
+        RiskLevelCount(risk_level=level, count=count) for level, count in counts.items()
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('risk_monitor', '0008_patient_auditlog_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RiskLevelCount',
+            fields=[
+                ('risk_level', models.CharField(choices=[('LOW', 'Low'), ('MEDIUM', 'Medium'), ('HIGH', 'High')], max_length=10, primary_key=True, serialize=False)),
+                ('count', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(populate_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 6.0 on 2026-10-16 21:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('risk_monitor', '0010_pdfextractionjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pdfextractionjob',
+            name='pages_read',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='pdfextractionjob',
+            name='pages_total',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 6.0 on 2026-10-16 22:10
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('risk_monitor', '0011_pdfextractionjob_pages'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='patient',
+            name='source_sha256',
+            field=models.CharField(blank=True, db_index=True, editable=False, help_text='SHA-256 of the PDF report this record was imported from', max_length=64),
+        ),
+        migrations.CreateModel(
+            name='PdfReportCache',
+            fields=[
+                ('sha256', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('version', models.CharField(max_length=64)),
+                ('result', models.JSONField(help_text='Extracted form fields')),
+                ('pages_read', models.PositiveIntegerField()),
+                ('pages_total', models.PositiveIntegerField()),
+                ('size_bytes', models.PositiveIntegerField(help_text='Approximate stored size, for eviction')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('last_used_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['last_used_at'], name='pdfcache_last_used_idx')],
+            },
+        ),
+    ]
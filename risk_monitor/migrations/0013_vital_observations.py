@@ -0,0 +1,53 @@
+# Generated by Django 6.0 on 2026-10-16 11:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('risk_monitor', '0012_pdf_report_cache'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='patient',
+            name='last_observed_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.CreateModel(
+            name='VitalObservation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('observed_at', models.DateTimeField()),
+                ('heart_rate', models.SmallIntegerField(blank=True, help_text='BPM', null=True)),
+                ('systolic_bp', models.SmallIntegerField(blank=True, help_text='mmHg', null=True)),
+                ('spo2', models.SmallIntegerField(blank=True, help_text='%', null=True)),
+                ('temperature', models.FloatField(blank=True, help_text='Celsius', null=True)),
+                ('respiratory_rate', models.SmallIntegerField(blank=True, help_text='Breaths/min', null=True)),
+                ('patient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='observations', to='risk_monitor.patient')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['patient', 'observed_at'], name='observation_patient_ts_idx'), models.Index(fields=['observed_at'], name='observation_ts_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='VitalRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('metric', models.PositiveSmallIntegerField(choices=[(1, 'Heart Rate'), (2, 'Systolic BP'), (3, 'SpO2'), (4, 'Temperature'), (5, 'Respiratory Rate')])),
+                ('resolution', models.PositiveIntegerField(choices=[(60, '1 minute'), (3600, '1 hour')], help_text='Bucket width in seconds')),
+                ('bucket_start', models.DateTimeField()),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('total', models.FloatField(default=0)),
+                ('min_value', models.FloatField(blank=True, null=True)),
+                ('max_value', models.FloatField(blank=True, null=True)),
+                ('patient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='vital_rollups', to='risk_monitor.patient')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['resolution', 'bucket_start'], name='vitalrollup_retention_idx')],
+                'constraints': [models.UniqueConstraint(fields=('patient', 'resolution', 'metric', 'bucket_start'), name='vitalrollup_bucket_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,127 @@
+# Generated by Django 6.0 on 2026-10-16 12:10
+
+import uuid
+
+from django.db import migrations, models
+from django.db.models import Max, Q
+
+CHUNK_SIZE = 2000
+
+
+def merge_batches(apps, schema_editor):
+    """
+    Folds the per-field rows of each update into one row with a changes list.
+    The first row of a batch keeps all changes; the others are deleted.
+    """
+    AuditLog = apps.get_model('risk_monitor', 'AuditLog')
+    columns = ('id', 'batch_id', 'field_name', 'old_value', 'new_value')
+
+    # Rows without a batch id are single-field updates already
+    last_id = 0
+    while True:
+        rows = list(
+            AuditLog.objects.filter(batch_id__isnull=True, id__gt=last_id).order_by('id').values_list(*columns)[:CHUNK_SIZE]
+        )
+        if not rows:
+            break
+        AuditLog.objects.bulk_update(
+            [AuditLog(id=log_id, changes=[[field, old, new]]) for log_id, _, field, old, new in rows], ['changes'],
+        )
+        last_id = rows[-1][0]
+
+    queryset = AuditLog.objects.filter(batch_id__isnull=False).order_by('batch_id', 'id')
+    keeper, changes, cursor = None, [], None
+    while True:
+        chunk = queryset
+        if cursor:
+            chunk = chunk.filter(Q(batch_id__gt=cursor[0]) | Q(batch_id=cursor[0], id__gt=cursor[1]))
+        rows = list(chunk.values_list(*columns)[:CHUNK_SIZE])
+        if not rows:
+            break
+        merged, duplicates = [], []
+        for log_id, batch_id, field, old, new in rows:
+            if keeper and keeper[1] == batch_id:
+                changes.append([field, old, new])
+                duplicates.append(log_id)
+                continue
+            if keeper:
+                merged.append(AuditLog(id=keeper[0], changes=changes))
+            keeper, changes = (log_id, batch_id), [[field, old, new]]
+        AuditLog.objects.bulk_update(merged, ['changes'])
+        AuditLog.objects.filter(id__in=duplicates).delete()
+        cursor = rows[-1][1], rows[-1][0]
+    if keeper:
+        AuditLog.objects.filter(id=keeper[0]).update(changes=changes)
+
+
+def split_batches(apps, schema_editor):
+    """
+    Expands each row back into one row per changed field, sharing a batch id.
+    """
+    AuditLog = apps.get_model('risk_monitor', 'AuditLog')
+    # Restored rows keep the time of the update they belong to
+    AuditLog._meta.get_field('timestamp').auto_now_add = False
+
+    max_id = AuditLog.objects.aggregate(max_id=Max('id'))['max_id'] or 0
+    last_id = 0
+    while True:
+        logs = list(AuditLog.objects.filter(id__gt=last_id, id__lte=max_id).order_by('id')[:CHUNK_SIZE])
+        if not logs:
+            break
+        extra = []
+        for log in logs:
+            (log.field_name, log.old_value, log.new_value), *rest = log.changes or [['', None, None]]
+            log.batch_id = uuid.uuid4()
+            extra += [
+                AuditLog(
+                    patient_id=log.patient_id, field_name=field, old_value=old, new_value=new,
+                    risk_before=log.risk_before, risk_after=log.risk_after, score_before=log.score_before,
+                    score_after=log.score_after, reason=log.reason, batch_id=log.batch_id, timestamp=log.timestamp,
+                )
+                for field, old, new in rest
+            ]
+        AuditLog.objects.bulk_update(logs, ['field_name', 'old_value', 'new_value', 'batch_id'])
+        AuditLog.objects.bulk_create(extra)
+        last_id = logs[-1].id
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('risk_monitor', '0013_vital_observations'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='auditlog',
+            name='changes',
+            field=models.JSONField(default=list, help_text='[field, old value, new value] per changed field'),
+        ),
+        migrations.RunPython(merge_batches, split_batches),
+        # Lets the field be restored onto existing rows when unapplying
+        migrations.AlterField(
+            model_name='auditlog',
+            name='field_name',
+            field=models.CharField(default='', max_length=100),
+        ),
+        migrations.RemoveIndex(
+            model_name='auditlog',
+            name='auditlog_batch_idx',
+        ),
+        migrations.RemoveField(
+            model_name='auditlog',
+            name='batch_id',
+        ),
+        migrations.RemoveField(
+            model_name='auditlog',
+            name='field_name',
+        ),
+        migrations.RemoveField(
+            model_name='auditlog',
+            name='new_value',
+        ),
+        migrations.RemoveField(
+            model_name='auditlog',
+            name='old_value',
+        ),
+    ]
@@ -0,0 +1,90 @@
+from django.db import migrations
+
+# SQLite: an external-content FTS5 table over the patient table, kept in step
+# by triggers so bulk_create/bulk_update and raw SQL writes are indexed too.
+# prefix='2 3' adds prefix indexes so short prefix queries don't scan the
+# whole term list.
+SQLITE_TABLE = """
+    CREATE VIRTUAL TABLE IF NOT EXISTS risk_monitor_patient_fts USING fts5(
+        full_name, contact_details, chronic_conditions, notes,
+        content='risk_monitor_patient', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )
+"""
+SQLITE_TRIGGERS = [
+    """
+    CREATE TRIGGER IF NOT EXISTS risk_monitor_patient_fts_ai AFTER INSERT ON risk_monitor_patient BEGIN
+        INSERT INTO risk_monitor_patient_fts(rowid, full_name, contact_details, chronic_conditions, notes)
+        VALUES (new.id, new.full_name, new.contact_details, new.chronic_conditions, new.notes);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS risk_monitor_patient_fts_ad AFTER DELETE ON risk_monitor_patient BEGIN
+        INSERT INTO risk_monitor_patient_fts(
+            risk_monitor_patient_fts, rowid, full_name, contact_details, chronic_conditions, notes
+        ) VALUES ('delete', old.id, old.full_name, old.contact_details, old.chronic_conditions, old.notes);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS risk_monitor_patient_fts_au
+    AFTER UPDATE OF full_name, contact_details, chronic_conditions, notes ON risk_monitor_patient
+    WHEN old.full_name IS NOT new.full_name OR old.contact_details IS NOT new.contact_details
+        OR old.chronic_conditions IS NOT new.chronic_conditions OR old.notes IS NOT new.notes
+    BEGIN
+        INSERT INTO risk_monitor_patient_fts(
+            risk_monitor_patient_fts, rowid, full_name, contact_details, chronic_conditions, notes
+        ) VALUES ('delete', old.id, old.full_name, old.contact_details, old.chronic_conditions, old.notes);
+        INSERT INTO risk_monitor_patient_fts(rowid, full_name, contact_details, chronic_conditions, notes)
+        VALUES (new.id, new.full_name, new.contact_details, new.chronic_conditions, new.notes);
+    END
+    """,
+]
+SQLITE_REBUILD = "INSERT INTO risk_monitor_patient_fts(risk_monitor_patient_fts) VALUES ('rebuild')"
+SQLITE_REMOVE = [
+    "DROP TRIGGER IF EXISTS risk_monitor_patient_fts_au",
+    "DROP TRIGGER IF EXISTS risk_monitor_patient_fts_ad",
+    "DROP TRIGGER IF EXISTS risk_monitor_patient_fts_ai",
+    "DROP TABLE IF EXISTS risk_monitor_patient_fts",
+]
+
+# MySQL: InnoDB can't FULLTEXT-index a JSON column, so the condition names are
+# copied into a stored generated column that the index covers instead. InnoDB
+# skips its stopwords and terms shorter than innodb_ft_min_token_size (3).
+MYSQL_INSTALL = [
+    """
+    ALTER TABLE risk_monitor_patient
+    ADD COLUMN search_conditions TEXT GENERATED ALWAYS AS (chronic_conditions->>'$') STORED
+    """,
+    """
+    CREATE FULLTEXT INDEX patient_search_ft
+    ON risk_monitor_patient (full_name, contact_details, search_conditions, notes)
+    """,
+]
+MYSQL_REMOVE = [
+    "DROP INDEX patient_search_ft ON risk_monitor_patient",
+    "ALTER TABLE risk_monitor_patient DROP COLUMN search_conditions",
+]
+
+INSTALL = {'sqlite': [SQLITE_TABLE] + SQLITE_TRIGGERS + [SQLITE_REBUILD], 'mysql': MYSQL_INSTALL}
+REMOVE = {'sqlite': SQLITE_REMOVE, 'mysql': MYSQL_REMOVE}
+
+
+def install(apps, schema_editor):
+    for statement in INSTALL.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(statement)
+
+
+def remove(apps, schema_editor):
+    for statement in REMOVE.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('risk_monitor', '0014_auditlog_changes'),
+    ]
+
+    operations = [
+        migrations.RunPython(install, remove),
+    ]
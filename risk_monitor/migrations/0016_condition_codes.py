@@ -0,0 +1,139 @@
+# Generated by Django 6.0 on 2026-10-16 22:25
+
+import django.db.models.deletion
+
+from django.db import migrations, models
+
+# The vocabulary as of this migration: (code, name, bit, aliases). Frozen here
+# so later edits to risk_monitor.utils.conditions don't change what it writes;
+# a new code gets its own data migration.
+VOCABULARY = (
+    ('DIABETES', 'Diabetes', 0, ('diabetes',)),
+    ('COPD', 'COPD', 1, ('copd',)),
+    ('CARDIAC', 'Cardiac Disease', 2, ('cardiac',)),
+    ('HYPERTENSION', 'Hypertension', 3, ('hypertension', 'high blood pressure')),
+    ('ASTHMA', 'Asthma', 4, ('asthma',)),
+    ('CKD', 'Chronic Kidney Disease', 5, ('kidney disease', 'ckd', 'renal failure')),
+    ('CANCER', 'Cancer', 6, ('cancer', 'carcinoma')),
+    ('STROKE', 'Stroke', 7, ('stroke',)),
+)
+
+# The search index triggers from 0015
+SEARCH_TRIGGERS = [
+    """
+    CREATE TRIGGER IF NOT EXISTS risk_monitor_patient_fts_ai AFTER INSERT ON risk_monitor_patient BEGIN
+        INSERT INTO risk_monitor_patient_fts(rowid, full_name, contact_details, chronic_conditions, notes)
+        VALUES (new.id, new.full_name, new.contact_details, new.chronic_conditions, new.notes);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS risk_monitor_patient_fts_ad AFTER DELETE ON risk_monitor_patient BEGIN
+        INSERT INTO risk_monitor_patient_fts(
+            risk_monitor_patient_fts, rowid, full_name, contact_details, chronic_conditions, notes
+        ) VALUES ('delete', old.id, old.full_name, old.contact_details, old.chronic_conditions, old.notes);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS risk_monitor_patient_fts_au
+    AFTER UPDATE OF full_name, contact_details, chronic_conditions, notes ON risk_monitor_patient
+    WHEN old.full_name IS NOT new.full_name OR old.contact_details IS NOT new.contact_details
+        OR old.chronic_conditions IS NOT new.chronic_conditions OR old.notes IS NOT new.notes
+    BEGIN
+        INSERT INTO risk_monitor_patient_fts(
+            risk_monitor_patient_fts, rowid, full_name, contact_details, chronic_conditions, notes
+        ) VALUES ('delete', old.id, old.full_name, old.contact_details, old.chronic_conditions, old.notes);
+        INSERT INTO risk_monitor_patient_fts(rowid, full_name, contact_details, chronic_conditions, notes)
+        VALUES (new.id, new.full_name, new.contact_details, new.chronic_conditions, new.notes);
+    END
+    """,
+    "INSERT INTO risk_monitor_patient_fts(risk_monitor_patient_fts) VALUES ('rebuild')",
+]
+
+
+def entry_bits(condition):
+    text = str(condition).lower()
+    bits = 0
+    for code, name, bit, aliases in VOCABULARY:
+        if any(alias in text for alias in aliases):
+            bits |= 1 << bit
+    return bits
+
+
+def backfill_conditions(apps, schema_editor):
+    Condition = apps.get_model('risk_monitor', 'Condition')
+    Patient = apps.get_model('risk_monitor', 'Patient')
+    PatientCondition = apps.get_model('risk_monitor', 'PatientCondition')
+    Condition.objects.bulk_create([Condition(code=code, name=name, bit=bit) for code, name, bit, aliases in VOCABULARY])
+
+    last_id = 0
+    while True:
+        patients = list(Patient.objects.filter(id__gt=last_id).order_by('id').only('id', 'chronic_conditions')[:2000])
+        if not patients:
+            return
+        last_id = patients[-1].id
+        links = []
+        for patient in patients:
+            patient.condition_codes = [entry_bits(condition) for condition in patient.chronic_conditions or ()]
+            bits = 0
+            for entry in patient.condition_codes:
+                bits |= entry
+            links += [
+                PatientCondition(patient_id=patient.id, condition_id=code)
+                for code, name, bit, aliases in VOCABULARY if bits >> bit & 1
+            ]
+        Patient.objects.bulk_update(patients, ['condition_codes'])
+        PatientCondition.objects.bulk_create(links)
+
+
+def restore_search_triggers(apps, schema_editor):
+    # Adding condition_codes rebuilt the patient table on SQLite, which drops
+    # the search index triggers
+    if schema_editor.connection.vendor == 'sqlite':
+        for statement in SEARCH_TRIGGERS:
+            schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('risk_monitor', '0015_patient_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Condition',
+            fields=[
+                ('code', models.CharField(max_length=20, primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=100)),
+                ('bit', models.PositiveSmallIntegerField(help_text='Bit in Patient.condition_codes', unique=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='patient',
+            name='condition_codes',
+            field=models.JSONField(default=list, editable=False),
+        ),
+        migrations.CreateModel(
+            name='PatientCondition',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('condition', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='patient_links', to='risk_monitor.condition')),
+                ('patient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='condition_links', to='risk_monitor.patient')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='patient',
+            name='conditions',
+            field=models.ManyToManyField(editable=False, related_name='patients', through='risk_monitor.PatientCondition', to='risk_monitor.condition'),
+        ),
+        migrations.AddIndex(
+            model_name='patientcondition',
+            index=models.Index(fields=['condition', 'patient'], name='patientcondition_cond_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='patientcondition',
+            constraint=models.UniqueConstraint(fields=('patient', 'condition'), name='patientcondition_uniq'),
+        ),
+        migrations.RunPython(restore_search_triggers, migrations.RunPython.noop),
+        migrations.RunPython(backfill_conditions, migrations.RunPython.noop),
+    ]
@@ -1,8 +1,24 @@
-from django.db import models
+import uuid
+from django.db import models, transaction
 from django.core.validators import MinValueValidator, MaxValueValidator
 
 from django.utils import timezone
 
+from risk_monitor.utils.conditions import encode_conditions
+
+
+class Condition(models.Model):
+    """
+    Canonical chronic condition codes (utils.conditions.VOCABULARY), so
+    patients can be filtered and counted by condition through an index.
+    """
+    code = models.CharField(max_length=20, primary_key=True)
+    name = models.CharField(max_length=100)
+    bit = models.PositiveSmallIntegerField(unique=True, help_text="Bit in Patient.condition_codes")
+
+    def __str__(self):
+        return self.name
+
 class Patient(models.Model):
     RISK_CHOICES = [
         ('LOW', 'Low'),
@@ -25,6 +41,11 @@ class Patient(models.Model):
     
     # Clinical History
     chronic_conditions = models.JSONField(default=list, blank=True, help_text="List of chronic conditions")
+    # Set from chronic_conditions on save: the code bitmask of each entry, in
+    # list order, which the risk engine reads instead of matching text
+    condition_codes = models.JSONField(default=list, editable=False)
+    conditions = models.ManyToManyField(Condition, through='PatientCondition', related_name='patients',
+                                        editable=False)
     er_visits = models.IntegerField(default=0, help_text="Number of ER visits in last 30 days")
     
     # Lab Indicators
@@ -38,13 +59,52 @@ class Patient(models.Model):
     # Risk Assessment (Auto-calculated)
     risk_score = models.IntegerField(default=0, editable=False)
     risk_level = models.CharField(max_length=10, choices=RISK_CHOICES, default='LOW', editable=False)
+
+    # Time of the reading the vitals snapshot above comes from
+    last_observed_at = models.DateTimeField(null=True, blank=True, editable=False)
+
+    # Set by import_pdfs so re-running an import doesn't duplicate patients
+    source_sha256 = models.CharField(max_length=64, blank=True, editable=False, db_index=True,
+                                     help_text="SHA-256 of the PDF report this record was imported from")
     
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
-    def save(self, *args, **kwargs):
-        # Always recalculate risk score and level before saving
-        from risk_monitor.services.risk_engine import calculate_risk
+    class Meta:
+        indexes = [
+            # Dashboard counts/grouping and the risk-filtered, newest-first registry
+            models.Index(fields=['risk_level', '-created_at', '-id'], name='patient_risk_created_idx'),
+            # Newest-first registry pages (keyset on created_at, id)
+            models.Index(fields=['-created_at', '-id'], name='patient_created_idx'),
+            # Dashboard "recent admissions" and admission date filters
+            models.Index(fields=['-admission_date'], name='patient_admission_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Level as stored, so signals can move dashboard counts on change
+        if 'risk_level' in instance.__dict__:
+            instance._stored_risk_level = instance.risk_level
+        return instance
+
+    def save(self, *args, rescore=True, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        # Partial saves may come from a row loaded without chronic_conditions
+        if update_fields is None or 'chronic_conditions' in update_fields:
+            self.condition_codes = encode_conditions(self.chronic_conditions)
+            if update_fields is not None:
+                kwargs['update_fields'] = [*update_fields, 'condition_codes']
+        # Recalculate risk score and level before saving, unless the caller
+        # (e.g. the audit service) has already scored this exact state
+        if rescore:
+            self.rescore()
+        # Keeps the dashboard counter update (post_save) in the same transaction
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+    def rescore(self):
+        from risk_monitor.services.risk_engine import calculate_risk_score
         data = {
             'age': self.age,
             'heart_rate': self.heart_rate,
@@ -53,31 +113,217 @@ class Patient(models.Model):
             'temperature': self.temperature,
             'respiratory_rate': self.respiratory_rate,
             'chronic_conditions': self.chronic_conditions or [],
+            'condition_codes': self.condition_codes,
             'er_visits': self.er_visits,
             'wbc_flag': self.wbc_flag,
             'creatinine_flag': self.creatinine_flag,
             'crp_flag': self.crp_flag,
         }
-        result = calculate_risk(data)
-        self.risk_score = result['total_score']
-        self.risk_level = result['risk_level']
-        super().save(*args, **kwargs)
+        self.risk_score, self.risk_level = calculate_risk_score(data)
 
     def __str__(self):
         return f"{self.full_name} ({self.risk_level})"
 
+class PatientCondition(models.Model):
+    """
+    Links a patient to each condition code their chronic conditions carry.
+    Rewritten whenever chronic_conditions is saved.
+    """
+    patient = models.ForeignKey(Patient, on_delete=models.CASCADE, related_name='condition_links')
+    condition = models.ForeignKey(Condition, on_delete=models.PROTECT, related_name='patient_links')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['patient', 'condition'], name='patientcondition_uniq'),
+        ]
+        indexes = [
+            # Patients with a condition, and counts per condition
+            models.Index(fields=['condition', 'patient'], name='patientcondition_cond_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.condition_id} for patient {self.patient_id}"
+
+
 class AuditLog(models.Model):
+    """
+    One patient update: the risk before and after, the trace, and every
+    field it changed as a compact [field, old value, new value] list.
+    """
     patient = models.ForeignKey(Patient, on_delete=models.CASCADE, related_name='audit_logs')
-    field_name = models.CharField(max_length=100)
-    old_value = models.TextField(null=True, blank=True)
-    new_value = models.TextField(null=True, blank=True)
+    changes = models.JSONField(default=list, help_text="[field, old value, new value] per changed field")
     risk_before = models.CharField(max_length=10)
     risk_after = models.CharField(max_length=10)
     score_before = models.IntegerField(default=0)
     score_after = models.IntegerField(default=0)
     reason = models.TextField(blank=True, help_text="Risk trace reasoning")
-    batch_id = models.UUIDField(null=True, blank=True, help_text="Groups multiple field changes from one update")
     timestamp = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Audit log pages and export (keyset on timestamp, id)
+            models.Index(fields=['-timestamp', '-id'], name='auditlog_timestamp_idx'),
+            # Per-patient history, newest first
+            models.Index(fields=['patient', '-timestamp', '-id'], name='auditlog_patient_ts_idx'),
+        ]
+
+    @property
+    def change_rows(self):
+        """
+        The changes as dicts with field_name, old_value and new_value, for templates.
+        """
+        return [
+            {'field_name': field, 'old_value': old, 'new_value': new}
+            for field, old, new in self.changes
+        ]
+
+    @property
+    def field_names(self):
+        return ", ".join(field for field, _, _ in self.changes)
+
+    def __str__(self):
+        return f"Audit for {self.patient.full_name} - {self.field_names}"
+
+
+class RiskLevelCount(models.Model):
+    """
+    Patients per risk level, maintained incrementally on every patient write
+    so the dashboard reads a handful of rows instead of counting the table.
+    """
+    risk_level = models.CharField(max_length=10, primary_key=True, choices=Patient.RISK_CHOICES)
+    count = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.risk_level}: {self.count}"
+
+
+class PdfExtractionJob(models.Model):
+    """
+    One asynchronous PDF autofill request. The row is the hand-off between the
+    web worker that queued it, the extraction pool and the status poll, which
+    may land on a different web worker.
+    """
+    STATUS_CHOICES = [
+        ('PENDING', 'Pending'),
+        ('RUNNING', 'Running'),
+        ('DONE', 'Done'),
+        ('FAILED', 'Failed'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    file_name = models.CharField(max_length=255)
+    file_size = models.PositiveIntegerField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='PENDING')
+    result = models.JSONField(null=True, blank=True, help_text="Extracted form fields")
+    error = models.TextField(blank=True)
+    pages_read = models.PositiveIntegerField(null=True, blank=True)
+    pages_total = models.PositiveIntegerField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at'], name='pdfjob_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"PDF job {self.id} ({self.status})"
+
+
+class PdfReportCache(models.Model):
+    """
+    Extraction results keyed by the SHA-256 of the PDF bytes, so the same
+    report is parsed once however often it is uploaded or imported. Least
+    recently used entries are evicted past PDF_EXTRACT_CACHE_MAX_BYTES.
+    """
+    sha256 = models.CharField(max_length=64, primary_key=True)
+    # Parser version and limits the result was produced with; a mismatch is a miss
+    version = models.CharField(max_length=64)
+    result = models.JSONField(help_text="Extracted form fields")
+    pages_read = models.PositiveIntegerField()
+    pages_total = models.PositiveIntegerField()
+    size_bytes = models.PositiveIntegerField(help_text="Approximate stored size, for eviction")
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['last_used_at'], name='pdfcache_last_used_idx'),
+        ]
+
+    def __str__(self):
+        return f"PDF cache {self.sha256[:12]}"
+
+
+class VitalObservation(models.Model):
+    """
+    One vitals reading, append-only. Vitals not measured in a reading are
+    null. Raw rows are pruned after OBSERVATION_RAW_RETENTION_DAYS; the
+    rollups keep the history at coarser resolution.
+    """
+    # Order of the metric codes used by VitalRollup
+    VITAL_FIELDS = ('heart_rate', 'systolic_bp', 'spo2', 'temperature', 'respiratory_rate')
+
+    patient = models.ForeignKey(Patient, on_delete=models.CASCADE, related_name='observations')
+    observed_at = models.DateTimeField()
+    heart_rate = models.SmallIntegerField(null=True, blank=True, help_text="BPM")
+    systolic_bp = models.SmallIntegerField(null=True, blank=True, help_text="mmHg")
+    spo2 = models.SmallIntegerField(null=True, blank=True, help_text="%")
+    temperature = models.FloatField(null=True, blank=True, help_text="Celsius")
+    respiratory_rate = models.SmallIntegerField(null=True, blank=True, help_text="Breaths/min")
+
+    class Meta:
+        indexes = [
+            # Per-patient history in time order
+            models.Index(fields=['patient', 'observed_at'], name='observation_patient_ts_idx'),
+            # Retention sweeps
+            models.Index(fields=['observed_at'], name='observation_ts_idx'),
+        ]
+
+    def __str__(self):
+        return f"Vitals for patient {self.patient_id} at {self.observed_at}"
+
+
+class VitalRollup(models.Model):
+    """
+    Count/sum/min/max of one vital for one patient over a 1-minute or 1-hour
+    bucket, updated incrementally as observations are appended.
+    """
+    METRIC_CHOICES = [
+        (1, 'Heart Rate'),
+        (2, 'Systolic BP'),
+        (3, 'SpO2'),
+        (4, 'Temperature'),
+        (5, 'Respiratory Rate'),
+    ]
+    RESOLUTION_CHOICES = [
+        (60, '1 minute'),
+        (3600, '1 hour'),
+    ]
+
+    patient = models.ForeignKey(Patient, on_delete=models.CASCADE, related_name='vital_rollups')
+    metric = models.PositiveSmallIntegerField(choices=METRIC_CHOICES)
+    resolution = models.PositiveIntegerField(choices=RESOLUTION_CHOICES, help_text="Bucket width in seconds")
+    bucket_start = models.DateTimeField()
+    count = models.PositiveIntegerField(default=0)
+    total = models.FloatField(default=0)
+    min_value = models.FloatField(null=True, blank=True)
+    max_value = models.FloatField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['patient', 'resolution', 'metric', 'bucket_start'],
+                                    name='vitalrollup_bucket_uniq'),
+        ]
+        indexes = [
+            # Retention sweeps per resolution
+            models.Index(fields=['resolution', 'bucket_start'], name='vitalrollup_retention_idx'),
+        ]
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else None
+
     def __str__(self):
-        return f"Audit for {self.patient.full_name} - {self.field_name}"
+        return f"{self.get_metric_display()} rollup for patient {self.patient_id} at {self.bucket_start}"
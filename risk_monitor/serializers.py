@@ -0,0 +1,79 @@
+from rest_framework import serializers
+
+from .models import Patient, AuditLog
+from .services.condition_service import patient_codes
+
+
+class SparseFieldsetMixin:
+    """
+    Serializes only the fields named in context['fields'] (from ?fields=),
+    and maps them to the model columns to load with .only().
+    """
+    # Serializer fields whose columns differ from their name
+    field_columns = {}
+    # Columns every query needs, e.g. for the page cursor and ETag
+    required_columns = ('id',)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        fields = self.context.get('fields')
+        if fields:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+    @classmethod
+    def parse_fields(cls, value):
+        """
+        The requested field names, or None for all of them. Raises
+        ValidationError for unknown names.
+        """
+        if not value:
+            return None
+        fields = [name.strip() for name in value.split(',') if name.strip()]
+        unknown = sorted(set(fields) - set(cls.Meta.fields))
+        if unknown:
+            raise serializers.ValidationError({'fields': [f"Unknown field(s): {', '.join(unknown)}"]})
+        return fields
+
+    @classmethod
+    def columns(cls, fields):
+        columns = list(cls.required_columns)
+        for name in fields or cls.Meta.fields:
+            columns += cls.field_columns.get(name, (name,))
+        return list(dict.fromkeys(columns))
+
+
+class PatientSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    chronic_conditions = serializers.ListField(child=serializers.CharField(max_length=200), required=False)
+    conditions = serializers.SerializerMethodField(help_text="Canonical condition codes")
+
+    field_columns = {'conditions': ('condition_codes',)}
+    required_columns = ('id', 'created_at', 'updated_at')
+
+    class Meta:
+        model = Patient
+        fields = [
+            'id', 'full_name', 'age', 'gender', 'contact_details', 'admission_date',
+            'heart_rate', 'systolic_bp', 'spo2', 'temperature', 'respiratory_rate',
+            'chronic_conditions', 'conditions', 'er_visits', 'wbc_flag', 'creatinine_flag', 'crp_flag',
+            'notes', 'risk_score', 'risk_level', 'last_observed_at', 'created_at', 'updated_at',
+        ]
+        read_only_fields = ['risk_score', 'risk_level', 'last_observed_at', 'created_at', 'updated_at']
+
+    def get_conditions(self, patient):
+        return sorted(patient_codes(patient))
+
+
+class AuditLogSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    patient_name = serializers.CharField(source='patient.full_name', read_only=True)
+
+    field_columns = {'patient_name': ('patient', 'patient__full_name')}
+    required_columns = ('id', 'timestamp')
+
+    class Meta:
+        model = AuditLog
+        fields = [
+            'id', 'patient', 'patient_name', 'changes', 'risk_before', 'risk_after',
+            'score_before', 'score_after', 'reason', 'timestamp',
+        ]
+        read_only_fields = fields
@@ -0,0 +1,358 @@
+import gzip
+import json
+import os
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone as dt_timezone
+from functools import lru_cache
+from itertools import chain, islice
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q, QuerySet
+from django.utils import timezone
+
+from risk_monitor.models import AuditLog, Patient
+from risk_monitor.utils.pagination import KeysetPage, decode_cursor, encode_cursor, keyset_paginate
+
+SEGMENT_SUFFIX = '.jsonl.gz'
+INDEX_SUFFIX = '.idx.json'
+ARCHIVE_FIELDS = ('id', 'patient_id', 'changes', 'risk_before', 'risk_after', 'score_before', 'score_after', 'reason')
+
+# (timestamp, id): the order of the audit log, newest first
+Key = Tuple[datetime, int]
+
+
+@dataclass(frozen=True)
+class Segment:
+    """
+    One immutable archive file: a month's audit rows, newest first, and the
+    sidecar index that lets readers skip it without opening it.
+    """
+    path: Path
+    month: str
+    rows: int
+    first: Key
+    last: Key
+    # patient id -> (oldest, newest) timestamp of their rows in the segment
+    patients: Dict[int, Tuple[datetime, datetime]]
+
+    def may_contain(self, filters: Dict[str, Any]) -> bool:
+        start, end = self.first[0], self.last[0]
+        patient_id = filters.get('patient_id')
+        if patient_id is not None:
+            if patient_id not in self.patients:
+                return False
+            start, end = self.patients[patient_id]
+        if 'timestamp__gte' in filters and end < filters['timestamp__gte']:
+            return False
+        if 'timestamp__lt' in filters and start >= filters['timestamp__lt']:
+            return False
+        return True
+
+    def read(self) -> Iterator[Dict[str, Any]]:
+        """
+        The segment's rows, newest first, with timestamps parsed.
+        """
+        with gzip.open(self.path, 'rt', encoding='utf-8') as f:
+            for line in f:
+                row = json.loads(line)
+                row['timestamp'] = datetime.fromisoformat(row['timestamp'])
+                yield row
+
+
+def archive_dir() -> Path:
+    return Path(getattr(settings, 'AUDIT_ARCHIVE_DIR', Path(settings.BASE_DIR) / 'audit_archive'))
+
+
+def _parse_key(key) -> Key:
+    return datetime.fromisoformat(key[0]), key[1]
+
+
+@lru_cache(maxsize=1024)
+def _load_segment(index_path: str, mtime_ns: int) -> Segment:
+    # mtime_ns is only part of the cache key
+    with open(index_path, encoding='utf-8') as f:
+        index = json.load(f)
+    return Segment(
+        path=Path(index_path[:-len(INDEX_SUFFIX)] + SEGMENT_SUFFIX),
+        month=index['month'],
+        rows=index['rows'],
+        first=_parse_key(index['first']),
+        last=_parse_key(index['last']),
+        patients={
+            int(patient_id): (datetime.fromisoformat(start), datetime.fromisoformat(end))
+            for patient_id, (start, end) in index['patients'].items()
+        },
+    )
+
+
+def list_segments() -> List[Segment]:
+    """
+    Every committed segment, newest first. A segment counts once its index
+    exists; the index is written after the data file.
+    """
+    root = archive_dir()
+    if not root.is_dir():
+        return []
+    segments = [
+        _load_segment(str(path), path.stat().st_mtime_ns)
+        for path in root.glob(f'*/*{INDEX_SUFFIX}')
+    ]
+    return sorted(segments, key=lambda segment: segment.last, reverse=True)
+
+
+def _matches(row: Dict[str, Any], filters: Dict[str, Any]) -> bool:
+    # The lookups AuditLogFilterForm produces
+    for lookup, value in filters.items():
+        if lookup == 'timestamp__gte':
+            if row['timestamp'] < value:
+                return False
+        elif lookup == 'timestamp__lt':
+            if row['timestamp'] >= value:
+                return False
+        elif lookup in ('patient_id', 'risk_before', 'risk_after'):
+            if row[lookup] != value:
+                return False
+        else:
+            raise ValueError(f"Unsupported archive filter: {lookup}")
+    return True
+
+
+def _key(row) -> Key:
+    if isinstance(row, dict):
+        return row['timestamp'], row['id']
+    return row.timestamp, row.pk
+
+
+def _archived_rows(filters: Dict[str, Any], below: Optional[Key] = None,
+                   above: Optional[Key] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Archived rows matching filters with keys strictly between above and
+    below. Newest first, or oldest first when only above is given.
+    """
+    segments = [
+        segment for segment in list_segments()
+        if segment.may_contain(filters)
+        and (below is None or segment.first < below)
+        and (above is None or segment.last > above)
+    ]
+    if above is not None and below is None:
+        # Segments are stored newest first; going up means reading a segment
+        # whole and reversing it
+        for segment in reversed(segments):
+            rows = [row for row in segment.read() if _key(row) > above and _matches(row, filters)]
+            yield from reversed(rows)
+        return
+    for segment in segments:
+        for row in segment.read():
+            key = _key(row)
+            if below is not None and key >= below:
+                continue
+            if above is not None and key <= above:
+                return
+            if _matches(row, filters):
+                yield row
+
+
+def _as_logs(rows: Iterable[Dict[str, Any]], chunk_size: int = 500) -> Iterator[AuditLog]:
+    """
+    Archived rows as unsaved AuditLog instances with their patient attached.
+    Rows of patients deleted since archiving are dropped, like the cascade
+    does for live rows.
+    """
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+        patients = Patient.objects.in_bulk({row['patient_id'] for row in chunk})
+        for row in chunk:
+            patient = patients.get(row['patient_id'])
+            if patient is None:
+                continue
+            yield AuditLog(patient=patient, timestamp=row['timestamp'],
+                           **{field: row[field] for field in ARCHIVE_FIELDS if field != 'patient_id'})
+
+
+def _oldest_live_key(queryset: QuerySet) -> Optional[Key]:
+    return queryset.order_by('timestamp', 'id').values_list('timestamp', 'id').first()
+
+
+def iter_archived_logs(filters: Dict[str, Any], below: Optional[Key] = None) -> Iterator[AuditLog]:
+    """
+    Archived audit rows matching filters, newest first, older than below.
+    Pass the oldest live row already read as below, so rows still live
+    because an archive run was interrupted before deleting them are not
+    repeated.
+    """
+    return _as_logs(_archived_rows(filters, below=below))
+
+
+def paginate_audit_logs(queryset: QuerySet, filters: Dict[str, Any], page_size: int,
+                        after: Optional[str] = None, before: Optional[str] = None) -> KeysetPage:
+    """
+    keyset_paginate over the live rows in queryset followed by the archived
+    rows matching filters. Archived rows are all older than live ones, so
+    pages only open archive segments once the live rows run out.
+    """
+    if not any(segment.may_contain(filters) for segment in list_segments()):
+        return keyset_paginate(queryset, 'timestamp', page_size, after=after, before=before)
+
+    oldest_live = _oldest_live_key(queryset)
+    after_key = decode_cursor(after) if after else None
+    before_key = decode_cursor(before) if before and not after_key else None
+
+    if before_key:
+        if oldest_live and before_key >= oldest_live:
+            return keyset_paginate(queryset, 'timestamp', page_size, before=before)
+        live = queryset.filter(
+            Q(timestamp__gt=before_key[0]) | Q(timestamp=before_key[0], pk__gt=before_key[1])
+        ).order_by('timestamp', 'pk')
+        archived = _as_logs(_archived_rows(filters, above=before_key))
+        if oldest_live:
+            archived = (log for log in archived if _key(log) < oldest_live)
+        rows = list(islice(chain(archived, live.iterator()), page_size + 1))
+        items = list(reversed(rows[:page_size]))
+        has_previous, has_next = len(rows) > page_size, True
+    else:
+        page = keyset_paginate(queryset, 'timestamp', page_size, after=after)
+        if page.has_next:
+            return page
+        items = page.items
+        below = oldest_live
+        if after_key and (below is None or after_key < below):
+            below = after_key
+        items += list(islice(iter_archived_logs(filters, below=below), page_size - len(items) + 1))
+        has_previous, has_next = after_key is not None, len(items) > page_size
+        items = items[:page_size]
+
+    if not items:
+        return KeysetPage(items, None, None)
+    return KeysetPage(
+        items,
+        encode_cursor(items[-1].timestamp, items[-1].pk) if has_next else None,
+        encode_cursor(items[0].timestamp, items[0].pk) if has_previous else None,
+    )
+
+
+def _month_bounds(moment: datetime) -> Tuple[datetime, datetime]:
+    start = moment.astimezone(dt_timezone.utc).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    end = (start + timedelta(days=32)).replace(day=1)
+    return start, end
+
+
+def _key_range(first: Key, last: Key) -> Q:
+    return (
+        (Q(timestamp__gt=first[0]) | Q(timestamp=first[0], id__gte=first[1]))
+        & (Q(timestamp__lt=last[0]) | Q(timestamp=last[0], id__lte=last[1]))
+    )
+
+
+def _write_segment(start: datetime, end: datetime, batch_size: int) -> Optional[Segment]:
+    """
+    Writes the rows with start <= timestamp < end to a new segment file,
+    newest first, and commits it by writing its index.
+    """
+    queryset = AuditLog.objects.filter(timestamp__gte=start, timestamp__lt=end).order_by('-timestamp', '-id')
+    month = start.strftime('%Y-%m')
+    directory = archive_dir() / month
+    directory.mkdir(parents=True, exist_ok=True)
+    temp_path = directory / f'.{month}.tmp'
+
+    rows, first, last, patients = 0, None, None, {}
+    with gzip.open(temp_path, 'wt', encoding='utf-8') as f:
+        cursor = None
+        while True:
+            chunk = queryset
+            if cursor:
+                chunk = chunk.filter(Q(timestamp__lt=cursor[0]) | Q(timestamp=cursor[0], id__lt=cursor[1]))
+            batch = list(chunk.values('timestamp', *ARCHIVE_FIELDS)[:batch_size])
+            if not batch:
+                break
+            for row in batch:
+                timestamp = row['timestamp'].isoformat()
+                f.write(json.dumps({**row, 'timestamp': timestamp}, separators=(',', ':')) + '\n')
+                oldest, newest = patients.get(row['patient_id'], (timestamp, timestamp))
+                patients[row['patient_id']] = (timestamp, newest)
+            rows += len(batch)
+            last = last or _key(batch[0])
+            first = cursor = _key(batch[-1])
+
+    if not rows:
+        temp_path.unlink()
+        return None
+
+    name = f'audit-{month}-{first[1]}-{last[1]}'
+    segment_path = directory / f'{name}{SEGMENT_SUFFIX}'
+    index_path = directory / f'{name}{INDEX_SUFFIX}'
+    _fsync_replace(temp_path, segment_path)
+    index = {
+        'month': month,
+        'rows': rows,
+        'first': [first[0].isoformat(), first[1]],
+        'last': [last[0].isoformat(), last[1]],
+        'patients': {str(patient_id): span for patient_id, span in patients.items()},
+    }
+    temp_index = directory / f'.{name}.idx.tmp'
+    with open(temp_index, 'w', encoding='utf-8') as f:
+        json.dump(index, f, separators=(',', ':'))
+    _fsync_replace(temp_index, index_path)
+    return _load_segment(str(index_path), index_path.stat().st_mtime_ns)
+
+
+def _fsync_replace(temp_path: Path, path: Path) -> None:
+    with open(temp_path, 'rb') as f:
+        os.fsync(f.fileno())
+    os.replace(temp_path, path)
+
+
+def _delete_archived(segment: Segment, batch_size: int) -> int:
+    """
+    Deletes a segment's rows from the table, oldest first, one short
+    transaction per batch. Oldest first keeps any rows left by an
+    interruption newer than everything already gone, which the readers rely
+    on to avoid returning a row twice.
+    """
+    queryset = AuditLog.objects.filter(_key_range(segment.first, segment.last)).order_by('timestamp', 'id')
+    deleted = 0
+    while True:
+        ids = list(queryset.values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        with transaction.atomic():
+            deleted += AuditLog.objects.filter(id__in=ids).delete()[0]
+
+
+def archive_audit_logs(now: Optional[datetime] = None, days: Optional[int] = None,
+                       batch_size: Optional[int] = None) -> Dict[str, int]:
+    """
+    Moves audit rows older than AUDIT_ARCHIVE_AFTER_DAYS into one segment
+    per calendar month (UTC), then deletes them from the table in batches
+    of AUDIT_ARCHIVE_BATCH_SIZE. Deletes left over by an interrupted run are
+    finished first. Returns segments written, rows archived and rows deleted.
+    """
+    now = now or timezone.now()
+    days = days if days is not None else getattr(settings, 'AUDIT_ARCHIVE_AFTER_DAYS', 365)
+    batch_size = batch_size or getattr(settings, 'AUDIT_ARCHIVE_BATCH_SIZE', 5000)
+    cutoff = now - timedelta(days=days)
+
+    result = {'segments': 0, 'archived': 0, 'deleted': 0}
+    for segment in list_segments():
+        result['deleted'] += _delete_archived(segment, batch_size)
+
+    while True:
+        oldest = AuditLog.objects.filter(timestamp__lt=cutoff).order_by('timestamp', 'id').values_list(
+            'timestamp', flat=True,
+        ).first()
+        if oldest is None:
+            return result
+        start, end = _month_bounds(oldest)
+        segment = _write_segment(start, min(end, cutoff), batch_size)
+        if segment is None:
+            # Deleted by someone else since the oldest row was read
+            continue
+        result['segments'] += 1
+        result['archived'] += segment.rows
+        result['deleted'] += _delete_archived(segment, batch_size)
@@ -0,0 +1,83 @@
+import csv
+import zlib
+from typing import Any, Dict, Iterator
+
+from django.db.models import Q
+
+from risk_monitor.models import AuditLog
+from risk_monitor.services.audit_archive import iter_archived_logs
+
+EXPORT_HEADER = [
+    'Timestamp', 'Patient', 'Field', 'Old Value', 'New Value', 'Risk Before', 'Risk After',
+    'Score Before', 'Score After', 'Reason', 'Audit ID',
+]
+EXPORT_COLUMNS = (
+    'timestamp', 'patient__full_name', 'changes', 'risk_before', 'risk_after', 'score_before', 'score_after', 'reason',
+)
+
+
+class _Echo:
+    """
+    File-like object whose write() returns the value, so csv.writer can
+    produce one line at a time for a streaming response.
+    """
+    def write(self, value):
+        return value
+
+
+def iter_audit_rows(filters: Dict[str, Any], chunk_size: int = 2000) -> Iterator[tuple]:
+    """
+    Yields export rows newest first, fetched in keyset-ordered chunks of
+    `chunk_size` so memory stays flat however many rows match, then the
+    archived rows, which are all older. Each update becomes one row per
+    changed field; the Audit ID column ties them together.
+    """
+    queryset = AuditLog.objects.filter(**filters).order_by('-timestamp', '-id')
+    cursor = None
+    while True:
+        chunk = queryset
+        if cursor:
+            timestamp, log_id = cursor
+            chunk = chunk.filter(Q(timestamp__lt=timestamp) | Q(timestamp=timestamp, id__lt=log_id))
+        rows = list(chunk.values_list('id', *EXPORT_COLUMNS)[:chunk_size])
+        if not rows:
+            break
+        for log_id, timestamp, patient_name, changes, *risk in rows:
+            for field, old, new in changes:
+                yield (timestamp, patient_name, field, old, new, *risk, log_id)
+        cursor = (rows[-1][1], rows[-1][0])
+
+    for log in iter_archived_logs(filters, below=cursor):
+        for field, old, new in log.changes:
+            yield (log.timestamp, log.patient.full_name, field, old, new, log.risk_before, log.risk_after,
+                   log.score_before, log.score_after, log.reason, log.pk)
+
+
+def stream_audit_csv(filters: Dict[str, Any], compress: bool = False) -> Iterator[bytes]:
+    """
+    Streams the audit export as CSV bytes, optionally gzip-compressed.
+    """
+    writer = csv.writer(_Echo())
+
+    def lines():
+        yield writer.writerow(EXPORT_HEADER).encode('utf-8')
+        for row in iter_audit_rows(filters):
+            yield writer.writerow(row).encode('utf-8')
+
+    if not compress:
+        yield from lines()
+        return
+
+    # wbits=31 writes a gzip header/trailer; flush every ~64KB of output
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    buffer = []
+    size = 0
+    for line in lines():
+        buffer.append(line)
+        size += len(line)
+        if size >= 65536:
+            data = compressor.compress(b''.join(buffer))
+            if data:
+                yield data
+            buffer, size = [], 0
+    yield compressor.compress(b''.join(buffer)) + compressor.flush()
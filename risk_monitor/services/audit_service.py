@@ -1,30 +1,98 @@
+from collections import defaultdict
+
 from risk_monitor.models import Patient, AuditLog
-from risk_monitor.services.risk_engine import calculate_risk
-from django.forms.models import model_to_dict
-import json
+from risk_monitor.services.risk_engine import (
+    SCORING_FIELDS, affects_risk, calculate_risk_mask, calculate_risk_score, describe_delta, reevaluate_risk,
+)
+from risk_monitor.services.condition_service import sync_patient_conditions
+from risk_monitor.services.dashboard_service import adjust_risk_counts, level_transition_deltas
+from risk_monitor.services.live_events import publish_on_commit, risk_transition_event
+from risk_monitor.services.observation_service import VITAL_FIELDS, append_observations, observation_from_patient
+from risk_monitor.utils.conditions import encode_conditions
+from django.db import connection, transaction
+from django.utils import timezone
 
 def update_patient_risk_and_audit(patient_id, new_data):
     """
     Updates patient data, recalculates risk, and logs changes with a detailed risk trace.
+
+    new_data is a patch: only the fields it names are compared. Runs in a
+    single transaction: the row is loaded with just those columns (plus the
+    scoring inputs when a rule reads one of them), only the rules reading a
+    changed field are re-evaluated (edits to e.g. notes skip scoring
+    entirely), only changed columns are written, and the update is audited
+    as one row holding the diff of every changed field.
+
+    Edits that change vitals are also appended to the observation store.
     """
-    try:
-        patient = Patient.objects.get(id=patient_id)
-        # model_to_dict can sometimes return weird formats for JSONFields if not careful
-        old_data = {field.name: getattr(patient, field.name) for field in patient._meta.fields}
-    except Patient.DoesNotExist:
-        return None
+    fields = [field for field in new_data if field in _patient_columns()]
+    columns = [*fields, 'risk_score', 'risk_level']
+    scoring = affects_risk(fields)
+    if scoring:
+        # full_name is read by the transition event
+        columns += [*SCORING_FIELDS, 'full_name']
+    with transaction.atomic():
+        try:
+            patient = Patient.objects.select_for_update().only(*columns).get(id=patient_id)
+        except Patient.DoesNotExist:
+            return None
 
-    # Calculate risks
-    old_risk = calculate_risk(old_data)
-    new_risk = calculate_risk(new_data)
-    
-    # Track changes
+        old_state = {field: getattr(patient, field) for field in SCORING_FIELDS} if scoring else None
+        changed_fields = apply_changes(patient, new_data)
+        if not changed_fields:
+            return patient
+
+        changed_names = [change['field'] for change in changed_fields]
+        scored, old_score, old_level, new_score, new_level, risk_trace = score_changes(
+            patient, old_state, new_data, changed_names,
+        )
+
+        snapshot_fields = []
+        if any(change['field'] in VITAL_FIELDS for change in changed_fields):
+            patient.last_observed_at = timezone.now()
+            snapshot_fields.append('last_observed_at')
+            append_observations([observation_from_patient(patient, patient.last_observed_at)])
+
+        stored_level = patient.risk_level
+
+        # Update patient risk level/score along with the changed columns only
+        patient.risk_score = new_score
+        patient.risk_level = new_level
+        if new_level != stored_level:
+            publish_on_commit([risk_transition_event(patient, stored_level, new_level)])
+        risk_fields = ['risk_score', 'risk_level'] if scored else []
+        patient.save(
+            update_fields=changed_names + snapshot_fields + risk_fields + ['updated_at'],
+            rescore=False,
+        )
+
+        # Log changes: one row for the update, with every field's diff
+        AuditLog.objects.create(
+            patient=patient,
+            changes=audit_changes(changed_fields),
+            risk_before=old_level,
+            risk_after=new_level,
+            score_before=old_score,
+            score_after=new_score,
+            reason=risk_trace
+        )
+
+    return patient
+
+def _patient_columns():
+    return {field.name for field in Patient._meta.concrete_fields}
+
+def apply_changes(patient, new_data):
+    """
+    Sets the values in new_data that differ from the patient's, and returns
+    a {'field', 'old', 'new'} dict per changed field. Lists compare
+    regardless of order.
+    """
     changed_fields = []
-    
     for field, value in new_data.items():
         if hasattr(patient, field):
             old_val = getattr(patient, field)
-            
+
             # Special case for lists/JSON comparison
             if isinstance(value, list) and isinstance(old_val, list):
                 if sorted(value) != sorted(old_val):
@@ -41,81 +109,268 @@ def update_patient_risk_and_audit(patient_id, new_data):
                     'old': old_val,
                     'new': value
                 })
+    return changed_fields
+
+def score_changes(patient, old_state, new_data, changed_names):
+    """
+    Rescores a patient for a change to changed_names. Returns (scored,
+    old_score, old_level, new_score, new_level, risk_trace); scored is False
+    when no rule reads a changed field and the stored score was kept.
+    """
+    if not affects_risk(changed_names):
+        # Nothing the rules read changed: keep the stored score
+        score, level = patient.risk_score, patient.risk_level
+        return False, score, level, score, level, build_risk_trace(score, level, score, level)
+
+    # Re-run only the rules that read a changed field; the per-rule
+    # delta feeds the trace directly
+    previous = calculate_risk_mask(old_state)
+    (new_score, new_level, _), delta = reevaluate_risk(
+        previous, new_data, changed_names, old_state['chronic_conditions'],
+    )
+    old_score, old_level = previous[0], previous[1]
+    return True, old_score, old_level, new_score, new_level, build_risk_trace(
+        old_score, old_level, new_score, new_level, delta,
+    )
+
+def bulk_update_patients(updates):
+    """
+    Applies partial changes to many patients in one transaction, e.g. a
+    ward's nightly lab flags. updates maps patient id to the new values of
+    the fields that may have changed (validated model field values).
+
+    The patients are loaded in one query, each is rescored incrementally
+    like update_patient_risk_and_audit, patients with the same changed
+    columns are written with one bulk_update, and every audit row goes in
+    with one bulk insert.
+
+    Returns a result per patient id: status 'updated' (with the changed
+    fields and new risk), 'unchanged' or 'not_found'.
+    """
+    results = {}
+    now = timezone.now()
+    fields = {field for data in updates.values() for field in data}
+    with transaction.atomic():
+        patients = Patient.objects.select_for_update().filter(pk__in=list(updates)).only(
+            # full_name is read by the transition events
+            *SCORING_FIELDS, *fields, 'full_name', 'risk_score', 'risk_level', 'last_observed_at',
+        ).in_bulk()
+
+        writes = defaultdict(list)
+        audit_rows, transitions, events, observations, recoded = [], [], [], [], []
+        for patient_id, new_data in updates.items():
+            patient = patients.get(patient_id)
+            if patient is None:
+                results[patient_id] = {'status': 'not_found'}
+                continue
+
+            old_state = {field: getattr(patient, field) for field in SCORING_FIELDS}
+            stored_level = patient.risk_level
+            changed_fields = apply_changes(patient, new_data)
+            if not changed_fields:
+                results[patient_id] = {'status': 'unchanged', 'risk_score': patient.risk_score,
+                                       'risk_level': patient.risk_level}
+                continue
+
+            changed_names = [change['field'] for change in changed_fields]
+            scored, old_score, old_level, new_score, new_level, risk_trace = score_changes(
+                patient, old_state, new_data, changed_names,
+            )
+            columns = changed_names + ['updated_at']
+            if scored:
+                patient.risk_score, patient.risk_level = new_score, new_level
+                columns += ['risk_score', 'risk_level']
+            if 'chronic_conditions' in changed_names:
+                patient.condition_codes = encode_conditions(patient.chronic_conditions)
+                columns.append('condition_codes')
+                recoded.append(patient)
+            if any(name in VITAL_FIELDS for name in changed_names):
+                patient.last_observed_at = now
+                columns.append('last_observed_at')
+                observations.append(observation_from_patient(patient, now))
+            patient.updated_at = now
+            writes[tuple(sorted(columns))].append(patient)
+
+            transitions.append((stored_level, new_level))
+            if new_level != stored_level:
+                events.append(risk_transition_event(patient, stored_level, new_level))
+            audit_rows.append(AuditLog(
+                patient=patient,
+                changes=audit_changes(changed_fields),
+                risk_before=old_level,
+                risk_after=new_level,
+                score_before=old_score,
+                score_after=new_score,
+                reason=risk_trace
+            ))
+            results[patient_id] = {'status': 'updated', 'changed': changed_names,
+                                   'risk_score': new_score, 'risk_level': new_level}
+
+        for columns, group in writes.items():
+            Patient.objects.bulk_update(group, list(columns), batch_size=500)
+        # bulk_update skips post_save, so move the dashboard counters
+        # and condition links here
+        adjust_risk_counts(level_transition_deltas(transitions))
+        sync_patient_conditions(recoded)
+        append_observations(observations)
+        AuditLog.objects.bulk_create(audit_rows, batch_size=500)
+        publish_on_commit(events)
+    return results
+
+def build_risk_trace(old_score, old_level, new_score, new_level, delta=None):
+    """
+    Human-readable summary of a risk change, with the reasons from the
+    RuleDelta of reevaluate_risk.
+    """
+    added_reasons, removed_reasons = describe_delta(delta) if delta else ([], [])
 
-    # Risk Trace Logic
-    added_reasons = set(new_risk['reasons']) - set(old_risk['reasons'])
-    removed_reasons = set(old_risk['reasons']) - set(new_risk['reasons'])
-    
     trace_parts = []
-    if new_risk['risk_level'] != old_risk['risk_level']:
-        trace_parts.append(f"Risk {old_risk['risk_level']} → {new_risk['risk_level']}")
-    
+    if new_level != old_level:
+        trace_parts.append(f"Risk {old_level} → {new_level}")
+
     # Explicitly show score change if it exists
-    if new_risk['total_score'] != old_risk['total_score']:
-        trace_parts.append(f"Score {old_risk['total_score']} → {new_risk['total_score']}")
+    if new_score != old_score:
+        trace_parts.append(f"Score {old_score} → {new_score}")
 
     if added_reasons:
         trace_parts.append(f"Added: {', '.join(added_reasons)}")
     if removed_reasons:
         trace_parts.append(f"Removed: {', '.join(removed_reasons)}")
-        
-    risk_trace = " | ".join(trace_parts) if trace_parts else "No significant risk factor changes"
-
-    # Update patient risk level/score
-    patient.risk_score = new_risk['total_score']
-    patient.risk_level = new_risk['risk_level']
-    patient.save()
 
-    # Log changes
-    import uuid
-    batch_id = uuid.uuid4()
+    return " | ".join(trace_parts) if trace_parts else "No significant risk factor changes"
 
-    def format_val(v):
-        if isinstance(v, list):
-            return ", ".join(v) if v else "None"
-        return str(v)
+def apply_vitals_readings(latest):
+    """
+    Moves each patient's vitals snapshot to their latest monitor reading and
+    rescores them, in bulk. latest maps patient id to a VitalObservation
+    already stored by record_observations; readings older than the snapshot
+    are skipped.
 
-    for change in changed_fields:
-        AuditLog.objects.create(
-            patient=patient,
-            field_name=change['field'].replace('_', ' ').title(),
-            old_value=format_val(change['old']),
-            new_value=format_val(change['new']),
-            risk_before=old_risk['risk_level'],
-            risk_after=new_risk['risk_level'],
-            score_before=old_risk['total_score'],
-            score_after=new_risk['total_score'],
-            reason=risk_trace,
-            batch_id=batch_id
+    Each patient is scored once. The readings themselves live in the
+    observation store, so audit rows are only written when the risk score or
+    level changes. Must run inside the caller's transaction.
+    """
+    now = timezone.now()
+    updated, audit_rows, transitions, events = [], [], [], []
+    patient_ids = sorted(latest)
+    for start in range(0, len(patient_ids), 500):
+        patients = Patient.objects.select_for_update().filter(pk__in=patient_ids[start:start + 500]).only(
+            *SCORING_FIELDS, 'risk_score', 'risk_level', 'last_observed_at',
         )
+        for patient in patients:
+            observation = latest[patient.pk]
+            if patient.last_observed_at and observation.observed_at < patient.last_observed_at:
+                continue
 
-    return patient
+            old_state = {field: getattr(patient, field) for field in SCORING_FIELDS}
+            changed_fields = []
+            for field in VITAL_FIELDS:
+                value = getattr(observation, field)
+                if value is not None and value != old_state[field]:
+                    setattr(patient, field, value)
+                    changed_fields.append({'field': field, 'old': old_state[field], 'new': value})
+            patient.last_observed_at = observation.observed_at
+            patient.updated_at = now
+            updated.append(patient)
+            if not changed_fields:
+                continue
+
+            old_score, old_level = patient.risk_score, patient.risk_level
+            # The previous state is usually the last batch's result, so the
+            # full evaluation is a cache hit; only the vitals rules re-run
+            (new_score, new_level, _), delta = reevaluate_risk(
+                calculate_risk_mask(old_state),
+                {change['field']: change['new'] for change in changed_fields},
+                [change['field'] for change in changed_fields],
+            )
+            if (new_score, new_level) == (old_score, old_level):
+                continue
+
+            patient.risk_score, patient.risk_level = new_score, new_level
+            transitions.append((old_level, new_level))
+            if new_level != old_level:
+                events.append(risk_transition_event(patient, old_level, new_level))
+            audit_rows.append(AuditLog(
+                patient=patient,
+                changes=audit_changes(changed_fields),
+                risk_before=old_level,
+                risk_after=new_level,
+                score_before=old_score,
+                score_after=new_score,
+                reason=build_risk_trace(old_score, old_level, new_score, new_level, delta)
+            ))
+
+    _write_snapshots(updated, [*VITAL_FIELDS, 'risk_score', 'risk_level', 'last_observed_at', 'updated_at'])
+    # bulk_update skips post_save, so move the dashboard counters here
+    adjust_risk_counts(level_transition_deltas(transitions))
+    AuditLog.objects.bulk_create(audit_rows, batch_size=500)
+    publish_on_commit(events)
+    return len(updated)
+
+def _write_snapshots(patients, fields):
+    """
+    Writes the given columns of many patients as one batched UPDATE.
+    bulk_update builds a CASE expression per column and row, which costs more
+    to compile than the database spends running it at ingest batch sizes.
+    """
+    if not patients:
+        return
+    quote = connection.ops.quote_name
+    columns = [Patient._meta.get_field(name) for name in fields]
+    sql = (
+        f"UPDATE {quote(Patient._meta.db_table)} SET "
+        + ", ".join(f"{quote(column.column)} = %s" for column in columns)
+        + f" WHERE {quote(Patient._meta.pk.column)} = %s"
+    )
+    rows = [
+        [column.get_db_prep_save(getattr(patient, column.attname), connection) for column in columns] + [patient.pk]
+        for patient in patients
+    ]
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, rows)
+
+def audit_changes(changed_fields):
+    """
+    The compact diff stored on AuditLog.changes: [label, old, new] per field.
+    """
+    return [
+        [change['field'].replace('_', ' ').title(), format_audit_value(change['old']), format_audit_value(change['new'])]
+        for change in changed_fields
+    ]
+
+def format_audit_value(v):
+    if isinstance(v, list):
+        return ", ".join(v) if v else "None"
+    return str(v)
 
 def create_patient_with_risk(data):
     """
     Creates a new patient and calculates initial risk.
     """
-    risk_result = calculate_risk(data)
+    score, level = calculate_risk_score(data)
     
     # Remove risk fields from data if they exist to avoid clashes, 
     # though they shouldn't be in form data usually.
     
     patient = Patient(**data)
-    patient.risk_score = risk_result['total_score']
-    patient.risk_level = risk_result['risk_level']
-    patient.save()
-
-    # Log creation
-    AuditLog.objects.create(
-        patient=patient,
-        field_name="Patient Record",
-        old_value="-",
-        new_value="Created",
-        risk_before="-",
-        risk_after=risk_result['risk_level'],
-        score_before=0,
-        score_after=risk_result['total_score'],
-        reason="Initial Patient Registration"
-    )
+    patient.risk_score = score
+    patient.risk_level = level
+    patient.last_observed_at = timezone.now()
+
+    with transaction.atomic():
+        patient.save(rescore=False)
+        append_observations([observation_from_patient(patient, patient.last_observed_at)])
+
+        # Log creation
+        AuditLog.objects.create(
+            patient=patient,
+            changes=[["Patient Record", "-", "Created"]],
+            risk_before="-",
+            risk_after=level,
+            score_before=0,
+            score_after=score,
+            reason="Initial Patient Registration"
+        )
+        publish_on_commit([risk_transition_event(patient, None, level)])
     
     return patient
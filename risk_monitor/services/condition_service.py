@@ -0,0 +1,55 @@
+from collections import defaultdict
+from functools import reduce
+from operator import or_
+from typing import Dict, Iterable, Optional
+
+from django.db.models import Count
+
+from risk_monitor.models import Patient, PatientCondition
+from risk_monitor.utils.conditions import VOCABULARY, codes_for_bits
+
+
+def patient_codes(patient: Patient) -> set:
+    """
+    The distinct condition codes across a patient's chronic conditions.
+    """
+    return set(codes_for_bits(reduce(or_, patient.condition_codes or (), 0)))
+
+
+def sync_patient_conditions(patients: Iterable[Patient]) -> None:
+    """
+    Brings the PatientCondition links of saved patients in line with their
+    condition_codes: one read, then only the links that changed are deleted
+    or inserted. Call inside the transaction that wrote the patients.
+    """
+    wanted = {patient.pk: patient_codes(patient) for patient in patients}
+    if not wanted:
+        return
+    stored = defaultdict(set)
+    for patient_id, code in PatientCondition.objects.filter(patient_id__in=list(wanted)).values_list(
+        'patient_id', 'condition_id',
+    ):
+        stored[patient_id].add(code)
+
+    for patient_id, codes in wanted.items():
+        removed = stored[patient_id] - codes
+        if removed:
+            PatientCondition.objects.filter(patient_id=patient_id, condition_id__in=removed).delete()
+    PatientCondition.objects.bulk_create([
+        PatientCondition(patient_id=patient_id, condition_id=code)
+        for patient_id, codes in wanted.items()
+        for code in sorted(codes - stored[patient_id])
+    ], batch_size=1000)
+
+
+def condition_counts(risk_level: Optional[str] = None) -> Dict[str, int]:
+    """
+    Patients per condition code, optionally within one risk level, in
+    vocabulary order. Counted from the link table's condition index.
+    """
+    links = PatientCondition.objects.all()
+    if risk_level:
+        links = links.filter(patient__risk_level=risk_level)
+    counts = dict.fromkeys((condition.code for condition in VOCABULARY), 0)
+    counts.update(links.values_list('condition_id').annotate(count=Count('id')).order_by())
+    return counts
@@ -0,0 +1,71 @@
+from collections import Counter
+from typing import Dict, Iterable, Mapping
+
+from django.db import transaction
+from django.db.models import Count, F
+
+from risk_monitor.models import Patient, RiskLevelCount
+
+RISK_LEVELS = [level for level, _ in Patient.RISK_CHOICES]
+
+
+def adjust_risk_counts(deltas: Mapping[str, int]) -> None:
+    """
+    Applies per-level count changes, e.g. {'LOW': -1, 'HIGH': 1}. Call inside
+    the transaction that writes the patients so the counters never drift.
+    """
+    for level, delta in deltas.items():
+        if not delta:
+            continue
+        updated = RiskLevelCount.objects.filter(risk_level=level).update(count=F('count') + delta)
+        if not updated:
+            RiskLevelCount.objects.create(risk_level=level, count=delta)
+
+
+def level_transition_deltas(transitions: Iterable[tuple]) -> Counter:
+    """
+    Builds count deltas from (old_level, new_level) pairs; None marks a
+    created or deleted patient.
+    """
+    deltas = Counter()
+    for old_level, new_level in transitions:
+        if old_level == new_level:
+            continue
+        if old_level:
+            deltas[old_level] -= 1
+        if new_level:
+            deltas[new_level] += 1
+    return deltas
+
+
+def dashboard_counts() -> Dict[str, int]:
+    """
+    Current patients per risk level from the counter table.
+    """
+    counts = dict.fromkeys(RISK_LEVELS, 0)
+    counts.update(RiskLevelCount.objects.values_list('risk_level', 'count'))
+    return counts
+
+
+def reconcile_risk_counts(fix: bool = False) -> Dict[str, tuple]:
+    """
+    Compares the counters with a full recount. Returns {level: (stored, actual)}
+    for every mismatch, and overwrites the counters when fix is True.
+    """
+    with transaction.atomic():
+        # Lock the counters so concurrent writers queue behind the recount
+        stored = dict.fromkeys(RISK_LEVELS, 0)
+        stored.update(RiskLevelCount.objects.select_for_update().values_list('risk_level', 'count'))
+
+        actual = dict.fromkeys(RISK_LEVELS, 0)
+        actual.update(Patient.objects.values_list('risk_level').annotate(count=Count('id')).order_by())
+
+        mismatches = {
+            level: (stored.get(level, 0), actual.get(level, 0))
+            for level in set(stored) | set(actual)
+            if stored.get(level, 0) != actual.get(level, 0)
+        }
+        if fix:
+            for level, (_, count) in mismatches.items():
+                RiskLevelCount.objects.update_or_create(risk_level=level, defaults={'count': count})
+    return mismatches
@@ -0,0 +1,257 @@
+import csv
+import io
+import json
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from risk_monitor.forms import PatientForm
+from risk_monitor.models import Patient, AuditLog
+from risk_monitor.services.condition_service import sync_patient_conditions
+from risk_monitor.services.dashboard_service import adjust_risk_counts, level_transition_deltas
+from risk_monitor.services.live_events import publish_on_commit, risk_transition_event
+from risk_monitor.services.observation_service import (
+    append_observations, observation_from_patient, parse_reading, record_observations,
+)
+from risk_monitor.services.risk_engine import calculate_risk_score
+from risk_monitor.utils.conditions import encode_conditions
+
+# Spellings accepted for lab flags, on top of the checkbox widget's "true"/"false"
+FLAG_VALUES = {
+    '1': True, 'yes': True, 'y': True, 'true': True,
+    '0': False, 'no': False, 'n': False, 'false': False, '': False,
+}
+FLAG_FIELDS = ('wbc_flag', 'creatinine_flag', 'crp_flag')
+# Non-form model fields a loader may set on each row, e.g. import_pdfs
+# recording which report a patient came from
+PASSTHROUGH_FIELDS = ('source_sha256',)
+
+ERROR_REPORT_HEADER = ['Line', 'Errors', 'Row']
+
+
+@dataclass
+class IngestResult:
+    accepted: int = 0
+    rejected: int = 0
+    errors: List[Dict[str, Any]] = field(default_factory=list)
+    # Set when a stream ran past max_bytes and was abandoned
+    too_large: bool = False
+
+
+def iter_rows_from_file(stream, file_format: str) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """
+    Streams (line_number, row) pairs from a CSV (header row required) or NDJSON
+    text stream without reading the whole file into memory.
+    """
+    if file_format == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+    elif file_format == 'ndjson':
+        for line_number, line in enumerate(stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError as e:
+                row = {'__error__': f"Invalid JSON: {e}", 'raw': line.rstrip('\r\n')}
+            if not isinstance(row, dict):
+                row = {'__error__': "Each line must be a JSON object", 'raw': line.rstrip('\r\n')}
+            yield line_number, row
+    else:
+        raise ValueError(f"Unsupported format: {file_format!r}")
+
+
+def _form_data(row: Dict[str, Any]) -> Dict[str, Any]:
+    # Map file values onto what PatientForm expects from an HTML post
+    data = {k: v for k, v in row.items() if v is not None}
+    conditions = data.get('chronic_conditions')
+    if isinstance(conditions, list):
+        data['chronic_conditions'] = ", ".join(str(c) for c in conditions)
+    for flag in FLAG_FIELDS:
+        value = data.get(flag)
+        if isinstance(value, str) and value.strip().lower() in FLAG_VALUES:
+            data[flag] = FLAG_VALUES[value.strip().lower()]
+    return data
+
+
+def validate_patient_row(row: Dict[str, Any]) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
+    """
+    Validates one row with PatientForm. Returns (cleaned_data, None) or (None, errors).
+    """
+    if '__error__' in row:
+        return None, {'__all__': [row['__error__']]}
+    form = PatientForm(_form_data(row))
+    if not form.is_valid():
+        return None, {name: list(messages) for name, messages in form.errors.items()}
+    cleaned = form.cleaned_data.copy()
+    cleaned.pop('pdf_file', None)
+    for name in PASSTHROUGH_FIELDS:
+        if row.get(name):
+            cleaned[name] = row[name]
+    return cleaned, None
+
+
+def _insert_batch(batch: List[Dict[str, Any]]) -> None:
+    now = timezone.now()
+    patients = []
+    for data in batch:
+        patient = Patient(**data)
+        patient.condition_codes = encode_conditions(patient.chronic_conditions)
+        patient.risk_score, patient.risk_level = calculate_risk_score(
+            {**data, 'condition_codes': patient.condition_codes},
+        )
+        patient.last_observed_at = now
+        patients.append(patient)
+
+    with transaction.atomic():
+        if connection.features.can_return_rows_from_bulk_insert:
+            Patient.objects.bulk_create(patients)
+            # bulk_create skips post_save, so move the dashboard counters and
+            # condition links here
+            adjust_risk_counts(level_transition_deltas((None, patient.risk_level) for patient in patients))
+            sync_patient_conditions(patients)
+        else:
+            # Backends like MySQL don't return ids from bulk inserts, and the
+            # audit rows need them.
+            for patient in patients:
+                patient.save(force_insert=True, rescore=False)
+
+        AuditLog.objects.bulk_create([
+            AuditLog(
+                patient=patient,
+                changes=[["Patient Record", "-", "Created"]],
+                risk_before="-",
+                risk_after=patient.risk_level,
+                score_before=0,
+                score_after=patient.risk_score,
+                reason="Initial Patient Registration"
+            )
+            for patient in patients
+        ])
+        append_observations([observation_from_patient(patient, now) for patient in patients])
+        publish_on_commit([risk_transition_event(patient, None, patient.risk_level) for patient in patients])
+
+
+def bulk_ingest_patients(rows: Iterable[Tuple[int, Dict[str, Any]]], batch_size: int = 500,
+                         dry_run: bool = False, error_stream: Optional[io.TextIOBase] = None) -> IngestResult:
+    """
+    Validates, scores and inserts patients in batches, with their registration
+    audit entries. Each batch commits in its own transaction; rows failing
+    validation are reported instead of aborting the load.
+
+    Args:
+        rows: Iterable of (line_number, row) pairs, e.g. from iter_rows_from_file
+        batch_size: Patients inserted per transaction
+        dry_run: Validate and count only, without writing
+        error_stream: Text stream receiving the error report as CSV as rows are
+            rejected. Without it, errors are collected in result.errors.
+
+    Returns:
+        IngestResult with accepted/rejected counts.
+    """
+    result = IngestResult()
+    batch: List[Dict[str, Any]] = []
+    error_writer = None
+    if error_stream is not None:
+        error_writer = csv.writer(error_stream)
+        error_writer.writerow(ERROR_REPORT_HEADER)
+
+    for line_number, row in rows:
+        cleaned, errors = validate_patient_row(row)
+        if errors:
+            result.rejected += 1
+            error = {'line': line_number, 'errors': errors, 'row': row}
+            if error_writer:
+                error_writer.writerow(_error_report_row(error))
+            else:
+                result.errors.append(error)
+            continue
+
+        batch.append(cleaned)
+        if len(batch) >= batch_size:
+            if not dry_run:
+                _insert_batch(batch)
+            result.accepted += len(batch)
+            batch = []
+
+    if batch:
+        if not dry_run:
+            _insert_batch(batch)
+        result.accepted += len(batch)
+
+    return result
+
+
+def write_error_report(errors: List[Dict[str, Any]], stream: io.TextIOBase) -> None:
+    """
+    Writes rejected rows as CSV: line number, validation errors and the raw row.
+    """
+    writer = csv.writer(stream)
+    writer.writerow(ERROR_REPORT_HEADER)
+    for error in errors:
+        writer.writerow(_error_report_row(error))
+
+
+def _error_report_row(error: Dict[str, Any]) -> List[Any]:
+    return [
+        error['line'],
+        "; ".join(f"{name}: {' '.join(messages)}" for name, messages in error['errors'].items()),
+        json.dumps(error['row'], default=str),
+    ]
+
+
+def _record_vitals_chunk(chunk: List[Tuple[int, Dict[str, Any]]], result: IngestResult, max_errors: int) -> None:
+    patient_ids = {reading['patient_id'] for _, reading in chunk}
+    known = set(Patient.objects.filter(pk__in=patient_ids).values_list('pk', flat=True))
+    readings = []
+    for line_number, reading in chunk:
+        if reading['patient_id'] in known:
+            readings.append(reading)
+            continue
+        result.rejected += 1
+        if len(result.errors) < max_errors:
+            result.errors.append({'line': line_number, 'errors': {'patient_id': ["Unknown patient."]}})
+    result.accepted += record_observations(readings)
+
+
+def ingest_vitals_ndjson(lines: Iterable, batch_size: int = 5000, max_errors: int = 100,
+                         max_bytes: Optional[int] = None) -> IngestResult:
+    """
+    Records a stream of NDJSON vitals readings (see parse_reading). Readings
+    are committed batch_size at a time: each batch is one transaction in
+    which every patient is rescored once, against their latest reading.
+    Invalid lines and unknown patients are counted as rejected; the first
+    max_errors are reported with their line numbers.
+
+    Once the lines read add up to more than max_bytes (characters for str
+    lines), reading stops with too_large set. Batches already committed stay
+    committed; the batch in progress is dropped.
+    """
+    result = IngestResult()
+    chunk = []
+    size = 0
+    for line_number, line in enumerate(lines, start=1):
+        size += len(line)
+        if max_bytes is not None and size > max_bytes:
+            result.too_large = True
+            chunk = []
+            break
+        if not line.strip():
+            continue
+        reading, errors = parse_reading(line)
+        if errors:
+            result.rejected += 1
+            if len(result.errors) < max_errors:
+                result.errors.append({'line': line_number, 'errors': errors})
+            continue
+        chunk.append((line_number, reading))
+        if len(chunk) >= batch_size:
+            _record_vitals_chunk(chunk, result, max_errors)
+            chunk = []
+    if chunk:
+        _record_vitals_chunk(chunk, result, max_errors)
+    result.errors.sort(key=lambda error: error['line'])
+    return result
@@ -0,0 +1,197 @@
+import asyncio
+import json
+import threading
+from collections import deque
+from itertools import count
+from typing import Any, Dict, Iterable, List, Optional
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+# Sent to a subscriber in place of events it missed, either because it fell
+# too far behind or because it reconnected after the replay buffer moved on.
+# The client reloads its counts from the page when it sees one.
+RESYNC = {'type': 'resync'}
+
+
+class Subscription:
+    """
+    One connected client: a bounded queue filled by the hub on the event
+    loop and drained by the client's stream.
+    """
+
+    def __init__(self, maxsize: int):
+        self.queue = asyncio.Queue(maxsize=maxsize)
+        self.resync_pending = False
+
+    def offer(self, event: Dict[str, Any]) -> None:
+        if self.resync_pending:
+            # The client starts over on resync; later events are moot
+            return
+        if event is RESYNC:
+            self._resync()
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Backpressure: a slow client can't hold events for everyone
+            # else or grow without bound. Drop its backlog and tell it to
+            # resync instead.
+            self._resync()
+
+    def _resync(self) -> None:
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(RESYNC)
+        self.resync_pending = True
+
+    async def next_event(self, timeout: float) -> Optional[Dict[str, Any]]:
+        """
+        The next event, or None after timeout seconds with nothing to send.
+        """
+        try:
+            event = await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        if event is RESYNC:
+            self.resync_pending = False
+        return event
+
+
+class RiskEventHub:
+    """
+    In-process fan-out of risk transitions to live subscribers.
+
+    Subscribers live on one asyncio event loop (the ASGI server's). publish()
+    can be called from any thread, e.g. a sync view's on_commit hook; it
+    hands the event to the loop, which copies it into every subscriber's
+    queue without awaiting, so thousands of idle subscribers cost one queue
+    each. The last few events are kept so a reconnecting client can resume
+    from Last-Event-ID.
+    """
+
+    def __init__(self, queue_size: int = 100, replay_size: int = 256, max_subscribers: int = 10000):
+        self.queue_size = queue_size
+        self.max_subscribers = max_subscribers
+        self._subscribers = set()
+        self._recent = deque(maxlen=replay_size)
+        self._ids = count(1)
+        self._loop = None
+        self._lock = threading.Lock()
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    def subscribe(self, last_event_id: Optional[int] = None) -> Optional[Subscription]:
+        """
+        Registers a subscriber on the running loop; returns None when the hub
+        is full. Events after last_event_id are queued first when still held,
+        otherwise a resync.
+        """
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._loop is not loop:
+                # Subscribers belong to the loop they were created on
+                self._loop = loop
+                self._subscribers = set()
+            if len(self._subscribers) >= self.max_subscribers:
+                return None
+            subscription = Subscription(self.queue_size)
+            self._subscribers.add(subscription)
+
+        if last_event_id is not None:
+            latest = self._recent[-1]['id'] if self._recent else 0
+            if last_event_id > latest or (self._recent and self._recent[0]['id'] > last_event_id + 1):
+                # Events were missed that are no longer held, or the id is
+                # from before a restart
+                subscription.offer(RESYNC)
+            else:
+                for event in self._recent:
+                    if event['id'] > last_event_id:
+                        subscription.offer(event)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def publish(self, events: Iterable[Dict[str, Any]]) -> None:
+        events = list(events)
+        with self._lock:
+            loop = self._loop
+            for event in events:
+                event['id'] = next(self._ids)
+        if not events or loop is None or loop.is_closed():
+            return
+        try:
+            loop.call_soon_threadsafe(self._fan_out, events)
+        except RuntimeError:
+            # Loop closed between the check and the call
+            pass
+
+    def _fan_out(self, events: List[Dict[str, Any]]) -> None:
+        self._recent.extend(events)
+        for subscription in list(self._subscribers):
+            for event in events:
+                subscription.offer(event)
+
+
+hub = RiskEventHub(
+    queue_size=getattr(settings, 'LIVE_EVENTS_QUEUE_SIZE', 100),
+    replay_size=getattr(settings, 'LIVE_EVENTS_REPLAY_SIZE', 256),
+    max_subscribers=getattr(settings, 'LIVE_EVENTS_MAX_SUBSCRIBERS', 10000),
+)
+
+
+def risk_transition_event(patient, risk_before: Optional[str], risk_after: Optional[str]) -> Dict[str, Any]:
+    """
+    A patient's risk level moving from risk_before to risk_after; None marks
+    a created or deleted patient.
+    """
+    return {
+        'type': 'risk',
+        'patient_id': patient.pk,
+        'full_name': patient.full_name,
+        'risk_before': risk_before,
+        'risk_after': risk_after,
+        'risk_score': patient.risk_score,
+        'timestamp': timezone.now().isoformat(),
+    }
+
+
+def publish_on_commit(events: List[Dict[str, Any]]) -> None:
+    """
+    Publishes events once the current transaction commits, so subscribers
+    never see a change that was rolled back.
+    """
+    if events:
+        transaction.on_commit(lambda: hub.publish(events))
+
+
+async def sse_stream(subscription: Subscription, heartbeat: float, retry_ms: int = 5000):
+    """
+    Yields a subscription's events as SSE messages, with a comment line as
+    heartbeat whenever heartbeat seconds pass without one. The heartbeat
+    keeps proxies from closing idle connections and surfaces dead clients.
+    """
+    try:
+        yield f"retry: {retry_ms}\n\n"
+        while True:
+            event = await subscription.next_event(heartbeat)
+            yield format_sse(event) if event is not None else ": heartbeat\n\n"
+    finally:
+        hub.unsubscribe(subscription)
+
+
+def format_sse(event: Dict[str, Any]) -> str:
+    """
+    Encodes an event as a Server-Sent Events message.
+    """
+    lines = []
+    if 'id' in event:
+        lines.append(f"id: {event['id']}")
+    lines.append(f"event: {event['type']}")
+    lines.append(f"data: {json.dumps(event, separators=(',', ':'))}")
+    return "\n".join(lines) + "\n\n"
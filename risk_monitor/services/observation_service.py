@@ -0,0 +1,292 @@
+import json
+import math
+from datetime import datetime, timedelta, timezone as dt_timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from risk_monitor.models import Patient, VitalObservation, VitalRollup
+
+VITAL_FIELDS = VitalObservation.VITAL_FIELDS
+METRIC_CODES = {field: code for code, field in enumerate(VITAL_FIELDS, start=1)}
+ROLLUP_RESOLUTIONS = [seconds for seconds, _ in VitalRollup.RESOLUTION_CHOICES]
+
+# Accepted (min, max) per vital on incoming readings; wide enough for any
+# real measurement, narrow enough to catch unit and sensor errors
+VITAL_RANGES = {
+    'heart_rate': (0, 350),
+    'systolic_bp': (0, 350),
+    'spo2': (0, 100),
+    'temperature': (20.0, 46.0),
+    'respiratory_rate': (0, 150),
+}
+
+# Primary keys per DELETE while pruning, to keep each transaction short
+PRUNE_CHUNK_SIZE = 5000
+# Cap on points returned by vitals_history
+HISTORY_MAX_POINTS = 5000
+
+
+def observation_from_patient(patient: Patient, observed_at) -> VitalObservation:
+    """
+    The patient's current vitals snapshot as an observation.
+    """
+    return VitalObservation(
+        patient_id=patient.pk, observed_at=observed_at,
+        **{field: getattr(patient, field) for field in VITAL_FIELDS},
+    )
+
+
+def append_observations(observations: List[VitalObservation]) -> None:
+    """
+    Stores observations and folds them into the 1-minute and 1-hour rollups,
+    in the caller's transaction. Does not touch the Patient snapshot; see
+    record_observations for that.
+    """
+    if not observations:
+        return
+    with transaction.atomic():
+        _insert_observations(observations)
+        _apply_rollups(observations)
+
+
+def _insert_observations(observations):
+    """
+    Inserts observations as one batched statement. Like bulk_create on
+    backends without RETURNING, the instances don't get primary keys; nothing
+    reads them back. Avoids compiling an ORM insert for every value at ingest
+    rates.
+    """
+    quote = connection.ops.quote_name
+    columns = ['patient_id', 'observed_at', *VITAL_FIELDS]
+    sql = (
+        f"INSERT INTO {quote(VitalObservation._meta.db_table)} ({', '.join(quote(c) for c in columns)}) "
+        f"VALUES ({', '.join(['%s'] * len(columns))})"
+    )
+    adapt = connection.ops.adapt_datetimefield_value
+    rows = [
+        (observation.patient_id, adapt(observation.observed_at),
+         *(getattr(observation, field) for field in VITAL_FIELDS))
+        for observation in observations
+    ]
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, rows)
+
+
+def _bucket_start(epoch: float, resolution: int) -> datetime:
+    return datetime.fromtimestamp(epoch - epoch % resolution, tz=dt_timezone.utc)
+
+
+def _apply_rollups(observations):
+    # (patient_id, resolution, metric, bucket start as epoch) -> [count, total, min, max]
+    deltas = {}
+    for observation in observations:
+        epoch = int(observation.observed_at.timestamp())
+        for field, code in METRIC_CODES.items():
+            value = getattr(observation, field)
+            if value is None:
+                continue
+            for resolution in ROLLUP_RESOLUTIONS:
+                key = (observation.patient_id, resolution, code, epoch - epoch % resolution)
+                delta = deltas.get(key)
+                if delta is None:
+                    deltas[key] = [1, value, value, value]
+                else:
+                    delta[0] += 1
+                    delta[1] += value
+                    delta[2] = min(delta[2], value)
+                    delta[3] = max(delta[3], value)
+    if not deltas:
+        return
+    _upsert_rollups(deltas)
+
+
+def _upsert_rollups(deltas):
+    """
+    Merges bucket deltas into VitalRollup with one INSERT ... ON CONFLICT
+    statement per row, executed as a batch. The database does the increment,
+    so concurrent writers to the same bucket can't lose updates, and nothing
+    has to be read back first.
+    """
+    quote = connection.ops.quote_name
+    table = quote(VitalRollup._meta.db_table)
+    count, total, min_value, max_value = (quote(name) for name in ('count', 'total', 'min_value', 'max_value'))
+    insert = (
+        f"INSERT INTO {table} (patient_id, resolution, metric, bucket_start, {count}, {total}, {min_value}, {max_value}) "
+        f"VALUES (%s, %s, %s, %s, %s, %s, %s, %s) "
+    )
+    if connection.vendor == 'mysql':
+        sql = insert + (
+            f"ON DUPLICATE KEY UPDATE {count} = {count} + VALUES({count}), {total} = {total} + VALUES({total}), "
+            f"{min_value} = LEAST({min_value}, VALUES({min_value})), "
+            f"{max_value} = GREATEST({max_value}, VALUES({max_value}))"
+        )
+    else:
+        least, greatest = ('MIN', 'MAX') if connection.vendor == 'sqlite' else ('LEAST', 'GREATEST')
+        sql = insert + (
+            f"ON CONFLICT (patient_id, resolution, metric, bucket_start) DO UPDATE SET "
+            f"{count} = {table}.{count} + excluded.{count}, {total} = {table}.{total} + excluded.{total}, "
+            f"{min_value} = {least}({table}.{min_value}, excluded.{min_value}), "
+            f"{max_value} = {greatest}({table}.{max_value}, excluded.{max_value})"
+        )
+    adapt = connection.ops.adapt_datetimefield_value
+    buckets = {
+        epoch: adapt(datetime.fromtimestamp(epoch, tz=dt_timezone.utc)) for epoch in {key[3] for key in deltas}
+    }
+    rows = [
+        (patient_id, resolution, metric, buckets[epoch], *delta)
+        for (patient_id, resolution, metric, epoch), delta in deltas.items()
+    ]
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, rows)
+
+
+def parse_reading(line) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, List[str]]]]:
+    """
+    Parses and validates one NDJSON reading, e.g.
+    {"patient_id": 7, "observed_at": "2026-01-02T03:04:05Z", "heart_rate": 88}.
+    Returns (reading, None) or (None, errors). observed_at is optional and
+    defaults to the time of ingest; at least one vital is required.
+    """
+    try:
+        obj = json.loads(line)
+    except ValueError as e:
+        return None, {'__all__': [f"Invalid JSON: {e}"]}
+    if not isinstance(obj, dict):
+        return None, {'__all__': ["Expected a JSON object."]}
+
+    errors = {}
+    reading = {}
+    patient_id = obj.get('patient_id')
+    if isinstance(patient_id, int) and not isinstance(patient_id, bool) and patient_id > 0:
+        reading['patient_id'] = patient_id
+    else:
+        errors['patient_id'] = ["A positive integer patient_id is required."]
+
+    observed_at = obj.get('observed_at')
+    if observed_at is not None:
+        try:
+            parsed = parse_datetime(observed_at) if isinstance(observed_at, str) else None
+        except ValueError:
+            # Well formed but not a real date/time, e.g. February 30
+            parsed = None
+        if parsed is None:
+            errors['observed_at'] = ["Enter an ISO 8601 date/time."]
+        else:
+            reading['observed_at'] = parsed if timezone.is_aware(parsed) else timezone.make_aware(parsed)
+
+    for field, (low, high) in VITAL_RANGES.items():
+        value = obj.get(field)
+        if value is None:
+            continue
+        # json.loads accepts NaN and Infinity
+        numeric = isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
+        if field != 'temperature' and numeric and value != int(value):
+            numeric = False
+        if not numeric:
+            errors[field] = ["Enter a number." if field == 'temperature' else "Enter a whole number."]
+        elif not low <= value <= high:
+            errors[field] = [f"Must be between {low} and {high}."]
+        else:
+            reading[field] = float(value) if field == 'temperature' else int(value)
+
+    if not errors and not any(field in reading for field in VITAL_FIELDS):
+        errors['__all__'] = ["At least one vital is required."]
+    if errors:
+        return None, errors
+    return reading, None
+
+
+def record_observations(readings: Iterable[Dict[str, Any]]) -> int:
+    """
+    Appends monitor readings to the observation store and moves each
+    patient's vitals snapshot (and risk) to their latest reading.
+
+    Args:
+        readings: Dicts with patient_id, observed_at (aware datetime, default
+            now) and any of the vital fields.
+
+    Returns:
+        Number of observations stored.
+    """
+    from risk_monitor.services.audit_service import apply_vitals_readings
+
+    now = timezone.now()
+    observations = [
+        VitalObservation(
+            patient_id=reading['patient_id'],
+            observed_at=reading.get('observed_at') or now,
+            **{field: reading.get(field) for field in VITAL_FIELDS},
+        )
+        for reading in readings
+    ]
+
+    latest = {}
+    for observation in observations:
+        current = latest.get(observation.patient_id)
+        if current is None or observation.observed_at >= current.observed_at:
+            latest[observation.patient_id] = observation
+
+    with transaction.atomic():
+        append_observations(observations)
+        apply_vitals_readings(latest)
+    return len(observations)
+
+
+def vitals_history(patient_id: int, field: str, resolution: int = 0,
+                   since: Optional[datetime] = None, until: Optional[datetime] = None) -> List[Dict[str, Any]]:
+    """
+    One vital's history for a patient, oldest first. resolution 0 reads raw
+    observations; 60 or 3600 read the rollups with min/max/mean per bucket.
+    """
+    if resolution == 0:
+        queryset = VitalObservation.objects.filter(patient_id=patient_id, **{f'{field}__isnull': False})
+        if since:
+            queryset = queryset.filter(observed_at__gte=since)
+        if until:
+            queryset = queryset.filter(observed_at__lt=until)
+        return [
+            {'t': observed_at.isoformat(), 'value': value}
+            for observed_at, value in queryset.order_by('observed_at').values_list('observed_at', field)[:HISTORY_MAX_POINTS]
+        ]
+
+    queryset = VitalRollup.objects.filter(patient_id=patient_id, resolution=resolution, metric=METRIC_CODES[field])
+    if since:
+        queryset = queryset.filter(bucket_start__gte=_bucket_start(since.timestamp(), resolution))
+    if until:
+        queryset = queryset.filter(bucket_start__lt=until)
+    return [
+        {
+            't': rollup.bucket_start.isoformat(), 'count': rollup.count, 'min': rollup.min_value,
+            'max': rollup.max_value, 'mean': round(rollup.mean, 2) if rollup.count else None,
+        }
+        for rollup in queryset.order_by('bucket_start')[:HISTORY_MAX_POINTS]
+    ]
+
+
+def _delete_in_chunks(queryset) -> int:
+    deleted = 0
+    while True:
+        ids = list(queryset.values_list('pk', flat=True)[:PRUNE_CHUNK_SIZE])
+        if not ids:
+            return deleted
+        deleted += queryset.model.objects.filter(pk__in=ids).delete()[0]
+
+
+def prune_observations(now: Optional[datetime] = None) -> Dict[str, int]:
+    """
+    Applies the retention policy: raw observations older than
+    OBSERVATION_RAW_RETENTION_DAYS and 1-minute rollups older than
+    OBSERVATION_MINUTE_ROLLUP_RETENTION_DAYS are deleted, leaving the coarser
+    rollups that already summarise them. Returns rows deleted per kind.
+    """
+    now = now or timezone.now()
+    raw_cutoff = now - timedelta(days=getattr(settings, 'OBSERVATION_RAW_RETENTION_DAYS', 7))
+    minute_cutoff = now - timedelta(days=getattr(settings, 'OBSERVATION_MINUTE_ROLLUP_RETENTION_DAYS', 90))
+    return {
+        'observations': _delete_in_chunks(VitalObservation.objects.filter(observed_at__lt=raw_cutoff)),
+        'minute_rollups': _delete_in_chunks(VitalRollup.objects.filter(resolution=60, bucket_start__lt=minute_cutoff)),
+    }
@@ -0,0 +1,144 @@
+import hashlib
+import json
+from dataclasses import asdict
+from typing import Any, Dict, Iterable, Optional
+
+from django.conf import settings
+from django.db.models import Sum
+from django.utils import timezone
+
+from risk_monitor.models import PdfReportCache
+from risk_monitor.utils.pdf_parser import PARSER_VERSION, extract_report
+
+HASH_CHUNK_SIZE = 1024 * 1024
+# Row overhead on top of the JSON result when sizing entries
+ENTRY_OVERHEAD_BYTES = 200
+
+
+def file_sha256(pdf_file) -> str:
+    """
+    SHA-256 of a path or binary file object, read in chunks. File objects are
+    rewound afterwards.
+    """
+    digest = hashlib.sha256()
+    if isinstance(pdf_file, (str, bytes)) or hasattr(pdf_file, '__fspath__'):
+        with open(pdf_file, 'rb') as stream:
+            for chunk in iter(lambda: stream.read(HASH_CHUNK_SIZE), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    pdf_file.seek(0)
+    if hasattr(pdf_file, 'chunks'):
+        chunks = pdf_file.chunks()
+    else:
+        chunks = iter(lambda: pdf_file.read(HASH_CHUNK_SIZE), b'')
+    for chunk in chunks:
+        digest.update(chunk)
+    pdf_file.seek(0)
+    return digest.hexdigest()
+
+
+def extraction_limits() -> Dict[str, int]:
+    """
+    Page and text caps for extract_report from settings.
+    """
+    return {
+        'max_pages': getattr(settings, 'PDF_EXTRACT_MAX_PAGES', 200),
+        'max_chars': getattr(settings, 'PDF_EXTRACT_MAX_CHARS', 2_000_000),
+    }
+
+
+def cache_version(limits: Dict[str, int]) -> str:
+    # The same file can extract differently under other page/text caps
+    return f"{PARSER_VERSION}:{limits.get('max_pages')}:{limits.get('max_chars')}"
+
+
+def _enabled() -> bool:
+    return getattr(settings, 'PDF_EXTRACT_CACHE_MAX_BYTES', 0) > 0
+
+
+def get_cached_extractions(hashes: Iterable[str], limits: Dict[str, int]) -> Dict[str, Dict[str, Any]]:
+    """
+    Returns {sha256: extraction} for the hashes with a current cache entry,
+    where extraction has the keys data, pages_read and pages_total.
+    """
+    hashes = list(hashes)
+    if not _enabled() or not hashes:
+        return {}
+    version = cache_version(limits)
+    found = {}
+    for start in range(0, len(hashes), 500):
+        for entry in PdfReportCache.objects.filter(sha256__in=hashes[start:start + 500], version=version):
+            if not entry.result:
+                # A failed extraction stored before those were skipped
+                continue
+            found[entry.sha256] = {
+                'data': entry.result, 'pages_read': entry.pages_read, 'pages_total': entry.pages_total,
+            }
+    if found:
+        PdfReportCache.objects.filter(sha256__in=list(found)).update(last_used_at=timezone.now())
+    return found
+
+
+def get_cached_extraction(sha256: str, limits: Dict[str, int]) -> Optional[Dict[str, Any]]:
+    return get_cached_extractions([sha256], limits).get(sha256)
+
+
+def store_extraction(sha256: str, limits: Dict[str, int], extraction: Dict[str, Any], evict: bool = True) -> None:
+    """
+    Caches an extraction (dict with data, pages_read, pages_total). Pass
+    evict=False when storing many and call evict_cache() once at the end.
+
+    Failed or empty extractions are not cached: the failure may be transient,
+    or a later extractor fix may read the file, so it is parsed again next time.
+    """
+    if not _enabled() or extraction.get('error') or not extraction.get('data'):
+        return
+    PdfReportCache.objects.update_or_create(sha256=sha256, defaults={
+        'version': cache_version(limits),
+        'result': extraction['data'],
+        'pages_read': extraction['pages_read'],
+        'pages_total': extraction['pages_total'],
+        'size_bytes': len(json.dumps(extraction['data'])) + ENTRY_OVERHEAD_BYTES,
+        'last_used_at': timezone.now(),
+    })
+    if evict:
+        evict_cache()
+
+
+def evict_cache(max_bytes: Optional[int] = None) -> int:
+    """
+    Deletes least recently used entries until the cache fits in max_bytes
+    (default PDF_EXTRACT_CACHE_MAX_BYTES). Returns the number evicted.
+    """
+    if max_bytes is None:
+        max_bytes = getattr(settings, 'PDF_EXTRACT_CACHE_MAX_BYTES', 0)
+    excess = (PdfReportCache.objects.aggregate(total=Sum('size_bytes'))['total'] or 0) - max_bytes
+    if excess <= 0:
+        return 0
+
+    doomed = []
+    for sha256, size in PdfReportCache.objects.order_by('last_used_at').values_list('sha256', 'size_bytes').iterator():
+        doomed.append(sha256)
+        excess -= size
+        if excess <= 0:
+            break
+    for start in range(0, len(doomed), 500):
+        PdfReportCache.objects.filter(sha256__in=doomed[start:start + 500]).delete()
+    return len(doomed)
+
+
+def extract_pdf_cached(pdf_file) -> Dict[str, Any]:
+    """
+    extract_report with the settings' limits, served from the cache when the
+    same bytes were parsed before. Returns a dict with data, pages_read and
+    pages_total.
+    """
+    limits = extraction_limits()
+    sha256 = file_sha256(pdf_file)
+    cached = get_cached_extraction(sha256, limits)
+    if cached:
+        return cached
+    extraction = asdict(extract_report(pdf_file, **limits))
+    store_extraction(sha256, limits, extraction)
+    return extraction
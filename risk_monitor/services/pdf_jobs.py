@@ -0,0 +1,220 @@
+import hashlib
+import multiprocessing
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from typing import Any, Dict
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from risk_monitor.models import PdfExtractionJob
+from risk_monitor.services.pdf_cache import extraction_limits, get_cached_extraction, store_extraction
+from risk_monitor.utils.pdf_parser import extract_vitals_to_pipe
+
+# Finished jobs are kept this long for a slow poller, then pruned
+JOB_RETENTION = timedelta(hours=1)
+
+# Bytes inspected for the %PDF header; some producers prepend junk
+PDF_HEADER_WINDOW = 1024
+
+
+class PdfJobRejected(Exception):
+    """Raised when an upload is refused before it is queued."""
+
+
+class PdfTooLarge(PdfJobRejected):
+    pass
+
+
+class PdfQueueFull(PdfJobRejected):
+    pass
+
+
+_executor = None
+_executor_lock = threading.Lock()
+_in_flight = 0
+
+
+def _settings():
+    return (
+        getattr(settings, 'PDF_AUTOFILL_MAX_BYTES', 10 * 1024 * 1024),
+        getattr(settings, 'PDF_AUTOFILL_WORKERS', 2),
+        getattr(settings, 'PDF_AUTOFILL_TIMEOUT', 30),
+        getattr(settings, 'PDF_AUTOFILL_MAX_QUEUED', 20),
+    )
+
+
+def _process_context():
+    # forkserver children start from a clean single-threaded server with
+    # PyPDF2 preloaded; fork from a threaded web worker is unsafe.
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context('forkserver')
+        context.set_forkserver_preload(['risk_monitor.utils.pdf_parser'])
+        return context
+    return multiprocessing.get_context('spawn')
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _, workers, _, _ = _settings()
+            # Each thread supervises one extraction process, so this bounds
+            # the number of concurrent parses.
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='pdf-autofill')
+        return _executor
+
+
+def _reserve_slot() -> bool:
+    global _in_flight
+    _, workers, _, max_queued = _settings()
+    with _executor_lock:
+        if _in_flight >= workers + max_queued:
+            return False
+        _in_flight += 1
+        return True
+
+
+def _release_slot():
+    global _in_flight
+    with _executor_lock:
+        _in_flight -= 1
+
+
+def extract_with_timeout(path: str, timeout: float):
+    """
+    Runs extract_report on path in a child process and kills it if it takes
+    longer than timeout seconds. Returns ('ok', extraction as a dict) or
+    ('error', message).
+    """
+    context = _process_context()
+    receiver, sender = context.Pipe(duplex=False)
+    process = context.Process(target=extract_vitals_to_pipe, args=(path, sender, extraction_limits()), daemon=True)
+    process.start()
+    sender.close()
+    try:
+        if not receiver.poll(timeout):
+            return 'error', f"Extraction timed out after {timeout}s"
+        return receiver.recv()
+    except EOFError:
+        return 'error', "Extraction process exited unexpectedly"
+    finally:
+        if process.is_alive():
+            process.kill()
+        process.join()
+        receiver.close()
+
+
+def _run_job(job_id, path, sha256):
+    _, _, timeout, _ = _settings()
+    try:
+        PdfExtractionJob.objects.filter(pk=job_id).update(status='RUNNING', started_at=timezone.now())
+        outcome, payload = extract_with_timeout(path, timeout)
+        if outcome == 'ok':
+            store_extraction(sha256, extraction_limits(), payload)
+            PdfExtractionJob.objects.filter(pk=job_id).update(
+                status='DONE', result=payload['data'], finished_at=timezone.now(),
+                pages_read=payload['pages_read'], pages_total=payload['pages_total'],
+            )
+        else:
+            PdfExtractionJob.objects.filter(pk=job_id).update(
+                status='FAILED', error=payload, finished_at=timezone.now(),
+            )
+    except Exception as e:
+        PdfExtractionJob.objects.filter(pk=job_id).update(
+            status='FAILED', error=str(e), finished_at=timezone.now(),
+        )
+    finally:
+        os.unlink(path)
+        _release_slot()
+        connection.close()
+
+
+def _spool_upload(upload):
+    """
+    Copies the upload to its own file, since the request's copy is deleted
+    when the response is sent. Returns (path, sha256 of the bytes).
+    """
+    fd, path = tempfile.mkstemp(prefix='autofill-', suffix='.pdf')
+    digest = hashlib.sha256()
+    with os.fdopen(fd, 'wb') as spool:
+        for chunk in upload.chunks():
+            digest.update(chunk)
+            spool.write(chunk)
+    return path, digest.hexdigest()
+
+
+def submit_pdf_job(upload) -> PdfExtractionJob:
+    """
+    Queues an uploaded PDF for background extraction and returns its job
+    straight away. Poll pdf_job_status for the result.
+
+    Raises:
+        PdfTooLarge: upload exceeds PDF_AUTOFILL_MAX_BYTES
+        PdfQueueFull: all workers busy and the wait queue is full
+        PdfJobRejected: upload doesn't look like a PDF
+    """
+    max_bytes, _, _, _ = _settings()
+    if upload.size > max_bytes:
+        raise PdfTooLarge(f"PDF is larger than the {max_bytes // (1024 * 1024)} MB autofill limit.")
+
+    upload.seek(0)
+    header = upload.read(PDF_HEADER_WINDOW)
+    upload.seek(0)
+    if b'%PDF' not in header:
+        raise PdfJobRejected("Uploaded file is not a PDF.")
+
+    if not _reserve_slot():
+        raise PdfQueueFull("Autofill is busy, please try again shortly.")
+    try:
+        path, sha256 = _spool_upload(upload)
+        PdfExtractionJob.objects.filter(created_at__lt=timezone.now() - JOB_RETENTION).delete()
+        cached = get_cached_extraction(sha256, extraction_limits())
+        if cached:
+            # Seen this exact file before: the job is done without a parse
+            os.unlink(path)
+            _release_slot()
+            now = timezone.now()
+            return PdfExtractionJob.objects.create(
+                file_name=upload.name[:255], file_size=upload.size, status='DONE', result=cached['data'],
+                pages_read=cached['pages_read'], pages_total=cached['pages_total'],
+                started_at=now, finished_at=now,
+            )
+        job = PdfExtractionJob.objects.create(file_name=upload.name[:255], file_size=upload.size)
+    except Exception:
+        _release_slot()
+        raise
+
+    transaction.on_commit(lambda: _get_executor().submit(_run_job, job.pk, path, sha256))
+    return job
+
+
+def _is_stale(job: PdfExtractionJob) -> bool:
+    # A job whose web process died never finishes; give up once it has waited
+    # longer than a full queue could take.
+    _, workers, timeout, max_queued = _settings()
+    longest_wait = timeout * (max_queued // max(workers, 1) + 2)
+    return (timezone.now() - job.created_at).total_seconds() > longest_wait
+
+
+def pdf_job_status(job: PdfExtractionJob) -> Dict[str, Any]:
+    """
+    Status payload for the autofill poll: status, extracted fields when done
+    and an error message when failed.
+    """
+    if job.status in ('PENDING', 'RUNNING') and _is_stale(job):
+        job.status, job.error, job.finished_at = 'FAILED', "Extraction was interrupted", timezone.now()
+        job.save(update_fields=['status', 'error', 'finished_at'])
+
+    payload = {'job_id': str(job.pk), 'status': job.status}
+    if job.status == 'DONE':
+        payload['data'] = job.result or {}
+        payload['pages_read'] = job.pages_read
+        payload['pages_total'] = job.pages_total
+    elif job.status == 'FAILED':
+        payload['error'] = job.error
+    return payload
@@ -1,119 +1,650 @@
-from typing import Dict, Any, List
+import hashlib
+import math
+import threading
+from bisect import bisect_right
+from collections import OrderedDict
+from typing import Callable, Dict, Any, Iterable, List, Mapping, NamedTuple, Optional, Sequence, Tuple
 
-def calculate_risk(data: Dict[str, Any]) -> Dict[str, Any]:
+import numpy as np
+
+from risk_monitor.utils.conditions import CONDITIONS_BY_CODE, bits_for_codes, encode_conditions
+
+
+class Rule(NamedTuple):
     """
-    Calculates patient risk score based on demographics, vitals, and clinical history.
-    
-    Args:
-        data: Dictionary containing patient data
-        
-    Returns:
-        Dictionary with total_score, risk_level, escalation_flag, and reasons.
+    One scoring rule. `op` is one of:
+        'between'   -> bounds[0] <= value <= bounds[1]
+        'gt' / 'lt' -> value > bounds[0] / value < bounds[0]
+        'flag'      -> value is truthy
+        'condition' -> +points for every chronic condition carrying a SCORING_CONDITIONS code
     """
-    score = 0
-    reasons: List[str] = []
-    escalation_flag = False
-
-    # Extract data with safe defaults
-    age = data.get('age', 0)
-    heart_rate = data.get('heart_rate', 0)
-    systolic_bp = data.get('systolic_bp', 0)
-    spo2 = data.get('spo2', 100)
-    temperature = data.get('temperature', 37.0)
-    respiratory_rate = data.get('respiratory_rate', 0)
-    chronic_conditions = data.get('chronic_conditions', [])
-    er_visits = data.get('er_visits', 0)
-    
-    # Lab indicators - assume passed as boolean flags or count
-    lab_issue_count = sum([
-        1 for k in ['wbc_flag', 'creatinine_flag', 'crp_flag'] 
-        if data.get(k, False)
-    ])
+    field: str
+    op: str
+    bounds: Tuple[float, ...]
+    points: int
+    label: str
+
 
+# Condition codes (utils.conditions) that make a chronic condition entry score
+SCORING_CONDITIONS = ('DIABETES', 'COPD', 'CARDIAC')
+_SCORING_BITS = bits_for_codes(SCORING_CONDITIONS)
+
+# Values assumed when a field is missing from the input
+FIELD_DEFAULTS: Dict[str, Any] = {
+    'age': 0,
+    'heart_rate': 0,
+    'systolic_bp': 0,
+    'spo2': 100,
+    'temperature': 37.0,
+    'respiratory_rate': 0,
+    'chronic_conditions': [],
+    'er_visits': 0,
+    'wbc_flag': False,
+    'creatinine_flag': False,
+    'crp_flag': False,
+    # Precomputed encode_conditions(chronic_conditions); derived when missing
+    'condition_codes': None,
+}
+
+# Every field the rules read, in the order calculate_risk_batch expects columns
+SCORING_FIELDS: Tuple[str, ...] = tuple(FIELD_DEFAULTS)
+
+# Rule order is the order reasons are reported in.
+RULES: Tuple[Rule, ...] = (
     # --- 1. Demographics ---
-    if 60 <= age <= 75:
-        score += 1
-        reasons.append("Age 60-75 (+1)")
-    elif age > 75:
-        score += 2
-        reasons.append("Age >75 (+2)")
+    Rule('age', 'between', (60, 75), 1, "Age 60-75 (+1)"),
+    Rule('age', 'gt', (75,), 2, "Age >75 (+2)"),
 
     # --- 2. Vitals ---
-    # Heart Rate
-    if 100 <= heart_rate <= 120:
-        score += 1
-        reasons.append("HR 100-120 (+1)")
-    elif heart_rate > 120:
-        score += 2
-        reasons.append("HR >120 (+2)")
-
-    # Systolic BP
-    if systolic_bp < 90:
-        score += 2
-        reasons.append("Systolic BP <90 (+2)")
-
-    # SpO2
-    if 90 <= spo2 <= 93:
-        score += 1
-        reasons.append("SpO2 90-93 (+1)")
-    elif spo2 < 90:
-        score += 2
-        reasons.append("SpO2 <90 (+2)")
-
-    # Temperature
-    if 38 <= temperature <= 39:
-        score += 1
-        reasons.append("Temp 38-39 (+1)")
-    elif temperature > 39:
-        score += 2
-        reasons.append("Temp >39 (+2)")
-
-    # Respiratory Rate
-    if respiratory_rate > 24:
-        score += 1
-        reasons.append("Resp Rate >24 (+1)")
+    Rule('heart_rate', 'between', (100, 120), 1, "HR 100-120 (+1)"),
+    Rule('heart_rate', 'gt', (120,), 2, "HR >120 (+2)"),
+    Rule('systolic_bp', 'lt', (90,), 2, "Systolic BP <90 (+2)"),
+    Rule('spo2', 'between', (90, 93), 1, "SpO2 90-93 (+1)"),
+    Rule('spo2', 'lt', (90,), 2, "SpO2 <90 (+2)"),
+    Rule('temperature', 'between', (38, 39), 1, "Temp 38-39 (+1)"),
+    Rule('temperature', 'gt', (39,), 2, "Temp >39 (+2)"),
+    Rule('respiratory_rate', 'gt', (24,), 1, "Resp Rate >24 (+1)"),
 
     # --- 3. Clinical History ---
-    # Specific Chronic Conditions: Diabetes, COPD, Cardiac (+1 each)
-    target_conditions = ["diabetes", "copd", "cardiac"]
-    if chronic_conditions:
-        for condition in chronic_conditions:
-            clean_condition = str(condition).strip().lower()
-            if any(target in clean_condition for target in target_conditions):
-                score += 1
-                reasons.append(f"Chronic Condition: {condition} (+1)")
-
-    # ER Visits (Last 30 days)
-    if 2 <= er_visits <= 3:
-        score += 1
-        reasons.append("ER Visits 2-3 (+1)")
-    elif er_visits > 3:
-        score += 2
-        reasons.append("ER Visits >3 (+2)")
+    Rule('chronic_conditions', 'condition', (), 1, "Chronic Condition: {} (+1)"),
+    Rule('er_visits', 'between', (2, 3), 1, "ER Visits 2-3 (+1)"),
+    Rule('er_visits', 'gt', (3,), 2, "ER Visits >3 (+2)"),
 
     # --- 4. Lab Indicators ---
-    # Elevated WBC, High Creatinine, or High CRP (+1 each)
-    if data.get('wbc_flag', False):
-        score += 1
-        reasons.append("Elevated WBC (+1)")
-    if data.get('creatinine_flag', False):
-        score += 1
-        reasons.append("High Creatinine (+1)")
-    if data.get('crp_flag', False):
-        score += 1
-        reasons.append("High CRP (+1)")
-
-    # --- 5. Risk Classification ---
-    if score >= 6:
-        risk_level = "HIGH"
-    elif score >= 3:
-        risk_level = "MEDIUM"
-    else:
-        risk_level = "LOW"
+    Rule('wbc_flag', 'flag', (), 1, "Elevated WBC (+1)"),
+    Rule('creatinine_flag', 'flag', (), 1, "High Creatinine (+1)"),
+    Rule('crp_flag', 'flag', (), 1, "High CRP (+1)"),
+)
+
+# --- 5. Risk Classification --- (highest threshold first; first match wins)
+LEVEL_THRESHOLDS: Tuple[Tuple[int, str], ...] = ((6, "HIGH"), (3, "MEDIUM"))
+DEFAULT_LEVEL = "LOW"
+
+
+class RuleDelta(NamedTuple):
+    """
+    Which rules changed between two evaluations: rule bits that started or
+    stopped firing, and the chronic conditions that started or stopped
+    scoring (condition bits are positional, so they're compared by value).
+    """
+    added: int
+    removed: int
+    conditions_added: Tuple[Any, ...] = ()
+    conditions_removed: Tuple[Any, ...] = ()
+
+
+NO_CHANGE = RuleDelta(0, 0)
+
+
+def _scoring_positions(chronic_conditions: Sequence[Any], condition_codes: Optional[Sequence[int]] = None) -> List[int]:
+    """
+    Positions of the entries carrying a scoring code. Uses the precomputed
+    per-entry codes when they line up with the list, else encodes it.
+    """
+    if condition_codes is None or len(condition_codes) != len(chronic_conditions):
+        condition_codes = encode_conditions(chronic_conditions)
+    return [position for position, bits in enumerate(condition_codes) if bits & _SCORING_BITS]
+
+
+COMPARISONS = ('between', 'gt', 'lt')
+
+
+def _fires(rule: Rule, value: Any) -> bool:
+    if rule.op == 'between':
+        return rule.bounds[0] <= value <= rule.bounds[1]
+    if rule.op == 'gt':
+        return value > rule.bounds[0]
+    if rule.op == 'lt':
+        return value < rule.bounds[0]
+    return bool(value)
+
+
+def _interval(rule: Rule) -> Tuple[float, float]:
+    """
+    The closed range of values a comparison rule fires on. A strict bound
+    becomes the next float inwards, which is exact for floats and for ints
+    below 2**53.
+    """
+    if rule.op == 'between':
+        return rule.bounds[0], rule.bounds[1]
+    if rule.op == 'gt':
+        return math.nextafter(rule.bounds[0], math.inf), math.inf
+    return -math.inf, math.nextafter(rule.bounds[0], -math.inf)
+
+
+def _interval_table(rules: Sequence[Tuple[int, Rule]]) -> Tuple[Tuple[float, ...], Tuple[int, ...], Tuple[int, ...]]:
+    """
+    Folds the comparison rules on one field, as (bit, rule) pairs, into
+    sorted breakpoints and the points and mask of each interval: values in
+    [breakpoints[i - 1], breakpoints[i]) get entry i.
+    """
+    ranges = [(bit, rule.points) + _interval(rule) for bit, rule in rules]
+    breakpoints = sorted(
+        {low for _, _, low, _ in ranges if low != -math.inf}
+        | {math.nextafter(high, math.inf) for _, _, _, high in ranges if high != math.inf}
+    )
+    # A value from each interval: the one below the first breakpoint, then
+    # each breakpoint itself
+    samples = [-math.inf] + breakpoints
+    points = tuple(sum(p for _, p, low, high in ranges if low <= value <= high) for value in samples)
+    masks = tuple(sum(1 << bit for bit, _, low, high in ranges if low <= value <= high) for value in samples)
+    return tuple(breakpoints), points, masks
+
+
+class CompiledRules:
+    """
+    A rule table compiled once into lookup tables (and NumPy evaluators).
+
+    The comparison rules on a field are folded into sorted breakpoints with
+    the points and reason bits of every interval between them, so a field
+    costs one bisect however many rules read it.
+
+    Reasons are reported as a bitmask: bit i is set when RULES[i] fired. The
+    condition rule fires per entry, so matching chronic condition j sets bit
+    len(rules) + j. Masks are only turned into strings by `reasons`.
+    """
+
+    def __init__(self, rules: Sequence[Rule], level_thresholds=LEVEL_THRESHOLDS,
+                 default_level=DEFAULT_LEVEL, defaults=FIELD_DEFAULTS):
+        self.rules = tuple(rules)
+        unknown = [rule.op for rule in self.rules if rule.op not in COMPARISONS + ('flag', 'condition')]
+        if unknown:
+            raise ValueError(f"Unknown rule op: {unknown[0]!r}")
+        self.level_thresholds = tuple(level_thresholds)
+        self.default_level = default_level
+        self.defaults = dict(defaults)
+        self.condition_bit = len(self.rules)
+        # Identifies the rule set; cached results from another version are stale
+        self.version = hashlib.sha1(repr((
+            self.rules, self.level_thresholds, self.default_level,
+            sorted(self.defaults.items()), [CONDITIONS_BY_CODE[code] for code in SCORING_CONDITIONS],
+        )).encode()).hexdigest()
+        self._labels = [
+            (None if rule.op == 'condition' else 1 << bit, rule.label)
+            for bit, rule in enumerate(self.rules)
+        ]
+        self._inputs = tuple({rule.field: rule.op for rule in self.rules}.items())
+
+        # Rule bits that read each field. The condition rule also owns every
+        # positional bit above condition_bit, hence the open-ended mask.
+        self.field_bits: Dict[str, int] = {}
+        for bit, rule in enumerate(self.rules):
+            bits = ~((1 << self.condition_bit) - 1) if rule.op == 'condition' else 1 << bit
+            self.field_bits[rule.field] = self.field_bits.get(rule.field, 0) | bits
+        self._condition_points = next((rule.points for rule in self.rules if rule.op == 'condition'), 0)
+
+        # (field, default, breakpoints, points per interval, mask per interval)
+        self._comparisons: Tuple[tuple, ...] = tuple(
+            (field, self.defaults.get(field)) + _interval_table(
+                [(bit, rule) for bit, rule in enumerate(self.rules) if rule.field == field and rule.op in COMPARISONS]
+            )
+            for field in self.field_bits
+            if any(rule.field == field and rule.op in COMPARISONS for rule in self.rules)
+        )
+        # (field, default, points, bit)
+        self._flags: Tuple[tuple, ...] = tuple(
+            (rule.field, self.defaults.get(rule.field), rule.points, 1 << bit)
+            for bit, rule in enumerate(self.rules) if rule.op == 'flag'
+        )
+        # (field, default, points)
+        self._conditions: Tuple[tuple, ...] = tuple(
+            (rule.field, self.defaults.get(rule.field), rule.points) for rule in self.rules if rule.op == 'condition'
+        )
+        self._field_evaluators = {field: self._field_evaluator(field) for field in self.field_bits}
+
+    def fingerprint(self, data: Mapping[str, Any], keep_condition_order: bool = False) -> tuple:
+        """
+        Hashable key of everything the rules read from `data`.
+        """
+        key = []
+        for field, op in self._inputs:
+            value = data.get(field, self.defaults.get(field))
+            if op == 'flag':
+                value = bool(value)
+            elif op == 'condition':
+                # The score only depends on how many entries score, the mask
+                # on which ones do
+                positions = _scoring_positions(value or (), data.get('condition_codes'))
+                value = tuple(positions) if keep_condition_order else len(positions)
+            key.append(value)
+        return tuple(key)
+
+    def score(self, data: Mapping[str, Any]) -> Tuple[int, str]:
+        """
+        (score, level) for data, without the reason mask.
+        """
+        get = data.get
+        score = 0
+        for field, default, breakpoints, points, _ in self._comparisons:
+            value = get(field, default)
+            # NaN fires no comparison
+            if value == value:
+                score += points[bisect_right(breakpoints, value)]
+        for field, default, points, _ in self._flags:
+            if get(field, default):
+                score += points
+        for field, default, points in self._conditions:
+            conditions = get(field, default)
+            if conditions:
+                score += points * len(_scoring_positions(conditions, get('condition_codes')))
+        return score, self.level(score)
+
+    def evaluate(self, data: Mapping[str, Any]) -> Tuple[int, str, int]:
+        """
+        (score, level, reason mask) for data.
+        """
+        get = data.get
+        score = mask = 0
+        for field, default, breakpoints, points, masks in self._comparisons:
+            value = get(field, default)
+            if value == value:
+                interval = bisect_right(breakpoints, value)
+                score += points[interval]
+                mask |= masks[interval]
+        for field, default, points, bit in self._flags:
+            if get(field, default):
+                score += points
+                mask |= bit
+        for field, default, points in self._conditions:
+            conditions = get(field, default)
+            if conditions:
+                for position in _scoring_positions(conditions, get('condition_codes')):
+                    score += points
+                    mask |= 1 << (self.condition_bit + position)
+        return score, self.level(score), mask
+
+    def _field_evaluator(self, field: str) -> Callable[..., Tuple[int, int]]:
+        """
+        evaluate(value, condition_codes=None) -> (points, mask bits) of only
+        the rules reading field.
+        """
+        comparisons = tuple(entry[2:] for entry in self._comparisons if entry[0] == field)
+        flags = tuple(entry[2:] for entry in self._flags if entry[0] == field)
+        condition_points = tuple(entry[2] for entry in self._conditions if entry[0] == field)
+        condition_bit = self.condition_bit
+
+        def evaluate(value, condition_codes=None):
+            score = mask = 0
+            if comparisons and value == value:
+                for breakpoints, points, masks in comparisons:
+                    interval = bisect_right(breakpoints, value)
+                    score += points[interval]
+                    mask |= masks[interval]
+            if value:
+                for points, bit in flags:
+                    score += points
+                    mask |= bit
+                for points in condition_points:
+                    for position in _scoring_positions(value, condition_codes):
+                        score += points
+                        mask |= 1 << (condition_bit + position)
+            return score, mask
+        return evaluate
+
+    def level(self, score: int) -> str:
+        for minimum, level in self.level_thresholds:
+            if score >= minimum:
+                return level
+        return self.default_level
+
+    def _points(self, mask: int) -> int:
+        rule_bits = mask & ((1 << self.condition_bit) - 1)
+        points = sum(self.rules[bit].points for bit in range(self.condition_bit) if rule_bits >> bit & 1)
+        return points + self._condition_points * bin(mask >> self.condition_bit).count('1')
+
+    def reevaluate(self, previous: Tuple[int, str, int], data: Mapping[str, Any], changed_fields: Iterable[str],
+                   previous_conditions: Iterable[Any] = ()) -> Tuple[Tuple[int, str, int], RuleDelta]:
+        """
+        Updates a previous (score, level, mask) evaluation for a change to
+        changed_fields, re-running only the rules that read them. data holds
+        the new values; previous_conditions is the chronic_conditions list the
+        previous mask was built from, needed only when it changed.
+        """
+        changed = [field for field in self.field_bits if field in changed_fields]
+        if not changed:
+            return previous, NO_CHANGE
+
+        score, _, old_mask = previous
+        mask = old_mask
+        for field in changed:
+            bits = self.field_bits[field]
+            points, fired = self._field_evaluators[field](
+                data.get(field, self.defaults.get(field)), data.get('condition_codes'),
+            )
+            score += points - self._points(mask & bits)
+            mask = (mask & ~bits) | fired
+
+        rule_bits = (1 << self.condition_bit) - 1
+        delta = RuleDelta(mask & ~old_mask & rule_bits, old_mask & ~mask & rule_bits)
+        if 'chronic_conditions' in changed:
+            old_matches = self._matching_conditions(old_mask, previous_conditions)
+            new_matches = self._matching_conditions(mask, data.get('chronic_conditions') or ())
+            delta = delta._replace(
+                conditions_added=tuple(c for c in dict.fromkeys(new_matches) if c not in old_matches),
+                conditions_removed=tuple(c for c in dict.fromkeys(old_matches) if c not in new_matches),
+            )
+        return (score, self.level(score), mask), delta
+
+    def _matching_conditions(self, mask: int, chronic_conditions: Iterable[Any]) -> List[Any]:
+        conditions_mask = mask >> self.condition_bit
+        return [condition for position, condition in enumerate(chronic_conditions or ()) if conditions_mask >> position & 1]
+
+    def describe_delta(self, delta: RuleDelta) -> Tuple[List[str], List[str]]:
+        condition_label = next((rule.label for rule in self.rules if rule.op == 'condition'), "{}")
+        return (
+            self.reasons(delta.added) + [condition_label.format(c) for c in delta.conditions_added],
+            self.reasons(delta.removed) + [condition_label.format(c) for c in delta.conditions_removed],
+        )
+
+    def reasons(self, mask: int, chronic_conditions: Iterable[Any] = ()) -> List[str]:
+        """
+        Expands a reason bitmask from `evaluate` into display strings.
+        """
+        reasons: List[str] = []
+        if not mask:
+            return reasons
+        for bit_value, label in self._labels:
+            if bit_value is None:
+                conditions_mask = mask >> self.condition_bit
+                for condition in chronic_conditions or ():
+                    if not conditions_mask:
+                        break
+                    if conditions_mask & 1:
+                        reasons.append(label.format(condition))
+                    conditions_mask >>= 1
+            elif mask & bit_value:
+                reasons.append(label)
+        return reasons
+
+    def batch(self, columns: Mapping[str, Any]) -> Dict[str, np.ndarray]:
+        rows = _batch_length(columns)
+        score = np.zeros(rows, dtype=np.int64)
+        values: Dict[str, Any] = {}
+
+        for rule in self.rules:
+            if rule.field not in columns:
+                # A missing column is the default for every row: score it once
+                if rule.op != 'condition' and _fires(rule, self.defaults.get(rule.field)):
+                    score += rule.points
+                continue
+
+            if rule.op == 'condition':
+                score += rule.points * _count_scoring_conditions(
+                    columns[rule.field], columns.get('condition_codes'), rows,
+                )
+                continue
+
+            if rule.field not in values:
+                dtype = bool if rule.op == 'flag' else None
+                values[rule.field] = np.asarray(columns[rule.field], dtype=dtype)
+            column = values[rule.field]
+
+            if rule.op == 'between':
+                fired = (rule.bounds[0] <= column) & (column <= rule.bounds[1])
+            elif rule.op == 'gt':
+                fired = column > rule.bounds[0]
+            elif rule.op == 'lt':
+                fired = column < rule.bounds[0]
+            else:
+                fired = column
+            score += rule.points * fired
+
+        risk_level = np.select(
+            [score >= minimum for minimum, _ in self.level_thresholds],
+            [level for _, level in self.level_thresholds],
+            default=self.default_level,
+        )
+
+        return {
+            "total_score": score,
+            "risk_level": risk_level,
+        }
+
+
+class RiskResultCache:
+    """
+    Bounded, thread-safe LRU of engine results keyed by a fingerprint of the
+    scoring inputs. Entries are tied to the rule set version and dropped as
+    soon as a different rule set is in use.
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self.version = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._entries: "OrderedDict[tuple, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, version: str, key: tuple, compute: Callable[[], Any]) -> Any:
+        with self._lock:
+            if version != self.version:
+                if self._entries:
+                    self.invalidations += 1
+                self._entries.clear()
+                self.version = version
+            try:
+                result = self._entries[key]
+            except KeyError:
+                self.misses += 1
+            else:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return result
+
+        result = compute()
+
+        with self._lock:
+            if version == self.version:
+                self._entries[key] = result
+                if len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+        return result
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def info(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'currsize': len(self._entries),
+                'maxsize': self.maxsize,
+            }
+
+
+_ENGINE = CompiledRules(RULES)
+_CACHE: Optional[RiskResultCache] = None
+
+
+def load_rules(rules: Sequence[Rule], level_thresholds=LEVEL_THRESHOLDS, default_level=DEFAULT_LEVEL) -> None:
+    """
+    Replaces the active rule set. Cached results from the previous rule set
+    are invalidated on the next lookup.
+    """
+    global _ENGINE
+    _ENGINE = CompiledRules(rules, level_thresholds, default_level)
+
+
+def configure_risk_cache(maxsize: Optional[int]) -> None:
+    """
+    Enables a result cache of up to `maxsize` entries, or disables it when
+    maxsize is 0/None.
+    """
+    global _CACHE
+    _CACHE = RiskResultCache(maxsize) if maxsize else None
+
+
+def risk_cache_info() -> Optional[Dict[str, Any]]:
+    """
+    Hit/miss/eviction counters of the result cache, or None when disabled.
+    """
+    return _CACHE.info() if _CACHE else None
+
+
+def risk_fingerprint(data: Mapping[str, Any]) -> tuple:
+    """
+    Canonical key for a set of scoring inputs. chronic_conditions reduce to
+    the number of entries carrying a scoring code, since the score only
+    depends on that.
+    """
+    return _ENGINE.fingerprint(data)
+
+
+def calculate_risk_score(data: Mapping[str, Any]) -> Tuple[int, str]:
+    """
+    Fast path: returns (total_score, risk_level) without building any reasons.
+    """
+    engine, cache = _ENGINE, _CACHE
+    if cache is None:
+        return engine.score(data)
+    return cache.get_or_compute(engine.version, ('score',) + engine.fingerprint(data), lambda: engine.score(data))
+
+
+def calculate_risk_mask(data: Mapping[str, Any]) -> Tuple[int, str, int]:
+    """
+    Returns (total_score, risk_level, reason_mask). Use describe_reasons to
+    turn the mask into strings when they are actually displayed.
+    """
+    engine, cache = _ENGINE, _CACHE
+    if cache is None:
+        return engine.evaluate(data)
+    # Condition bits are positional, so the key keeps the list as given
+    key = ('mask',) + engine.fingerprint(data, keep_condition_order=True)
+    return cache.get_or_compute(engine.version, key, lambda: engine.evaluate(data))
+
+
+def describe_reasons(mask: int, chronic_conditions: Iterable[Any] = ()) -> List[str]:
+    """
+    Expands a reason mask from calculate_risk_mask. chronic_conditions must be
+    the same list the mask was calculated from.
+    """
+    return _ENGINE.reasons(mask, chronic_conditions)
+
+
+def rule_dependencies() -> Dict[str, Tuple[str, ...]]:
+    """
+    The input fields each rule reads, keyed by rule label.
+    """
+    return {rule.label: (rule.field,) for rule in _ENGINE.rules}
+
+
+def affects_risk(changed_fields: Iterable[str]) -> bool:
+    """
+    Whether a change to changed_fields can alter the score at all.
+    """
+    return any(field in _ENGINE.field_bits for field in changed_fields)
+
+
+def reevaluate_risk(previous: Tuple[int, str, int], data: Mapping[str, Any], changed_fields: Iterable[str],
+                    previous_conditions: Iterable[Any] = ()) -> Tuple[Tuple[int, str, int], RuleDelta]:
+    """
+    Incremental calculate_risk_mask: given the previous (score, level, mask)
+    and the fields that changed, re-evaluates only the rules reading those
+    fields. Returns the new evaluation and the per-rule delta; both are
+    unchanged (NO_CHANGE) when no scoring input changed.
+
+    Args:
+        previous: Result of calculate_risk_mask (or reevaluate_risk) on the old data.
+        data: The new values; only changed_fields are read.
+        changed_fields: Names of the fields that changed.
+        previous_conditions: The chronic_conditions previous was calculated
+            from, when chronic_conditions is among the changed fields.
+    """
+    return _ENGINE.reevaluate(previous, data, changed_fields, previous_conditions)
+
+
+def describe_delta(delta: RuleDelta) -> Tuple[List[str], List[str]]:
+    """
+    Returns (added, removed) reason strings for a RuleDelta.
+    """
+    return _ENGINE.describe_delta(delta)
+
+
+def calculate_risk(data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Calculates patient risk score based on demographics, vitals, and clinical history.
+
+    Args:
+        data: Dictionary containing patient data
+
+    Returns:
+        Dictionary with total_score, risk_level, escalation_flag, and reasons.
+    """
+    score, risk_level, mask = calculate_risk_mask(data)
 
     return {
         "total_score": score,
         "risk_level": risk_level,
-        "escalation_flag": escalation_flag,
-        "reasons": reasons
+        "escalation_flag": False,
+        "reasons": _ENGINE.reasons(mask, data.get('chronic_conditions', [])),
     }
+
+
+def calculate_risk_batch(columns: Mapping[str, Any]) -> Dict[str, np.ndarray]:
+    """
+    Vectorized counterpart of calculate_risk for scoring whole populations.
+
+    Args:
+        columns: Mapping of field name to a column of values (NumPy array, list or
+            any sequence), one entry per patient. Missing columns use the same
+            defaults as calculate_risk. chronic_conditions is a sequence of
+            per-patient condition lists; an optional condition_codes column
+            holds their precomputed encode_conditions codes.
+
+    Returns:
+        Dictionary with total_score (int64 array) and risk_level (str array),
+        matching calculate_risk row for row.
+    """
+    return _ENGINE.batch(columns)
+
+
+def _batch_length(columns: Mapping[str, Any]) -> int:
+    lengths = {len(values) for values in columns.values()}
+    if len(lengths) > 1:
+        raise ValueError(f"All columns must have the same length, got {sorted(lengths)}")
+    return lengths.pop() if lengths else 0
+
+
+def _count_scoring_conditions(chronic_conditions, condition_codes, rows: int) -> np.ndarray:
+    if condition_codes is None:
+        condition_codes = [None] * rows
+
+    def count(conditions, codes) -> int:
+        if not conditions:
+            return 0
+        if codes is not None and len(codes) == len(conditions):
+            return sum(1 for bits in codes if bits & _SCORING_BITS)
+        return len(_scoring_positions(conditions))
+
+    return np.fromiter(
+        (count(conditions, codes) for conditions, codes in zip(chronic_conditions, condition_codes)),
+        dtype=np.int64, count=rows,
+    )
@@ -0,0 +1,57 @@
+import re
+from typing import List
+
+from django.db import connection
+from django.db.models import BooleanField, Q, QuerySet
+from django.db.models.expressions import RawSQL
+
+from risk_monitor.models import Patient
+
+PATIENT_TABLE = Patient._meta.db_table
+# The FTS5 table (SQLite) and FULLTEXT index (MySQL) are created by migration
+# 0015. Migrations that make SQLite rebuild the patient table drop its
+# triggers and must create them again, as 0016 does.
+FTS_TABLE = f'{PATIENT_TABLE}_fts'
+SEARCH_FIELDS = ('full_name', 'contact_details', 'chronic_conditions', 'notes')
+
+# Terms beyond this are ignored, so a pasted paragraph can't build a huge query
+MAX_SEARCH_TERMS = 8
+
+
+def search_terms(text: str) -> List[str]:
+    """
+    Words of a free-text query, lowercased. Operators and quotes are dropped,
+    so user input can't produce an invalid match expression.
+    """
+    return re.findall(r'\w+', text.lower())[:MAX_SEARCH_TERMS]
+
+
+def search_patients(queryset: QuerySet, text: str) -> QuerySet:
+    """
+    Narrows queryset to patients matching every word of text as a prefix in
+    the name, contact details, chronic conditions or notes. Uses the text
+    index on SQLite and MySQL, substring matching elsewhere. Combines with
+    any other filters and ordering on queryset.
+    """
+    terms = search_terms(text)
+    if not terms:
+        return queryset
+
+    if connection.vendor == 'sqlite':
+        match = ' '.join(f'"{term}"*' for term in terms)
+        return queryset.filter(pk__in=RawSQL(f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", [match]))
+
+    if connection.vendor == 'mysql':
+        match = ' '.join(f'+{term}*' for term in terms)
+        return queryset.filter(RawSQL(
+            f"MATCH ({PATIENT_TABLE}.full_name, {PATIENT_TABLE}.contact_details, "
+            f"{PATIENT_TABLE}.search_conditions, {PATIENT_TABLE}.notes) AGAINST (%s IN BOOLEAN MODE)",
+            [match], output_field=BooleanField(),
+        ))
+
+    for term in terms:
+        queryset = queryset.filter(
+            Q(full_name__icontains=term) | Q(contact_details__icontains=term)
+            | Q(chronic_conditions__icontains=term) | Q(notes__icontains=term)
+        )
+    return queryset
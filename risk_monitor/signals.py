@@ -0,0 +1,38 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from risk_monitor.models import Patient
+from risk_monitor.services.condition_service import sync_patient_conditions
+from risk_monitor.services.dashboard_service import adjust_risk_counts, level_transition_deltas
+from risk_monitor.services.live_events import publish_on_commit, risk_transition_event
+
+
+@receiver(post_save, sender=Patient)
+def track_risk_level_on_save(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    if raw or (update_fields is not None and 'risk_level' not in update_fields):
+        return
+    if created:
+        old_level = None
+    elif '_stored_risk_level' in instance.__dict__:
+        old_level = instance._stored_risk_level
+    else:
+        # Instance wasn't loaded with its risk level; reconcile_dashboard repairs any drift
+        return
+    adjust_risk_counts(level_transition_deltas([(old_level, instance.risk_level)]))
+    instance._stored_risk_level = instance.risk_level
+
+
+@receiver(post_save, sender=Patient)
+def sync_conditions_on_save(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    if raw or (update_fields is not None and 'chronic_conditions' not in update_fields):
+        return
+    if created and not instance.condition_codes:
+        return
+    sync_patient_conditions([instance])
+
+
+@receiver(post_delete, sender=Patient)
+def track_risk_level_on_delete(sender, instance, **kwargs):
+    old_level = instance.__dict__.get('_stored_risk_level', instance.risk_level)
+    adjust_risk_counts(level_transition_deltas([(old_level, None)]))
+    publish_on_commit([risk_transition_event(instance, old_level, None)])
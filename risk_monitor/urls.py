@@ -1,14 +1,26 @@
-from django.urls import path
-from . import views
+from django.urls import include, path
+from rest_framework.routers import SimpleRouter
+
+from . import api, views
 
 app_name = 'risk_monitor'
 
+router = SimpleRouter()
+router.register('patients', api.PatientViewSet, basename='api-patient')
+router.register('audit-logs', api.AuditLogViewSet, basename='api-auditlog')
+
 urlpatterns = [
     path('', views.dashboard, name='dashboard'),
+    path('live/risk-events/', views.risk_event_stream, name='risk_event_stream'),
     path('patients/', views.patient_list, name='patient_list'),
     path('patients/add/', views.patient_create, name='patient_create'),
+    path('patients/autofill/', views.pdf_autofill_start, name='pdf_autofill_start'),
+    path('patients/autofill/<uuid:job_id>/', views.pdf_autofill_status, name='pdf_autofill_status'),
     path('patients/<int:pk>/edit/', views.patient_update, name='patient_edit'),
+    path('patients/<int:pk>/vitals/', views.patient_vitals, name='patient_vitals'),
     path('patients/<int:pk>/delete/', views.patient_delete, name='patient_delete'),
+    path('vitals/ingest/', views.vitals_ingest, name='vitals_ingest'),
     path('audit-log/', views.audit_log, name='audit_log'),
     path('audit-log/export/', views.export_audit_csv, name='export_audit_csv'),
+    path('api/', include(router.urls)),
 ]
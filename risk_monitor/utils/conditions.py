@@ -0,0 +1,72 @@
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, NamedTuple, Tuple
+
+
+class ConditionCode(NamedTuple):
+    """
+    One canonical chronic condition. Free-text entries carry the code when
+    they contain any of its aliases (lowercase substrings).
+    """
+    code: str
+    name: str
+    bit: int
+    aliases: Tuple[str, ...]
+
+
+# The canonical vocabulary, stored in the Condition table. Bits are
+# permanent: they are persisted in Patient.condition_codes, so retire a code
+# rather than reuse its bit. Adding a code needs a data migration that
+# inserts its Condition row and re-encodes existing patients.
+VOCABULARY: Tuple[ConditionCode, ...] = (
+    ConditionCode('DIABETES', 'Diabetes', 0, ('diabetes',)),
+    ConditionCode('COPD', 'COPD', 1, ('copd',)),
+    ConditionCode('CARDIAC', 'Cardiac Disease', 2, ('cardiac',)),
+    ConditionCode('HYPERTENSION', 'Hypertension', 3, ('hypertension', 'high blood pressure')),
+    ConditionCode('ASTHMA', 'Asthma', 4, ('asthma',)),
+    ConditionCode('CKD', 'Chronic Kidney Disease', 5, ('kidney disease', 'ckd', 'renal failure')),
+    ConditionCode('CANCER', 'Cancer', 6, ('cancer', 'carcinoma')),
+    ConditionCode('STROKE', 'Stroke', 7, ('stroke',)),
+)
+
+CONDITIONS_BY_CODE: Dict[str, ConditionCode] = {condition.code: condition for condition in VOCABULARY}
+
+_ALIAS_BITS = tuple((alias, 1 << condition.bit) for condition in VOCABULARY for alias in condition.aliases)
+
+
+@lru_cache(maxsize=4096)
+def _entry_bits(text: str) -> int:
+    bits = 0
+    for alias, bit in _ALIAS_BITS:
+        if alias in text:
+            bits |= bit
+    return bits
+
+
+def condition_bits(condition: Any) -> int:
+    """
+    Bitmask of the codes one chronic condition entry carries, 0 when it
+    matches none.
+    """
+    return _entry_bits(str(condition).lower())
+
+
+def encode_conditions(chronic_conditions: Iterable[Any]) -> List[int]:
+    """
+    Per-entry code bitmasks for a chronic_conditions list, in list order.
+    This is what Patient.condition_codes stores.
+    """
+    return [condition_bits(condition) for condition in chronic_conditions or ()]
+
+
+def bits_for_codes(codes: Iterable[str]) -> int:
+    bits = 0
+    for code in codes:
+        bits |= 1 << CONDITIONS_BY_CODE[code].bit
+    return bits
+
+
+def codes_for_bits(bits: int) -> List[str]:
+    """
+    The codes set in a bitmask, in vocabulary order.
+    """
+    return [condition.code for condition in VOCABULARY if bits >> condition.bit & 1]
@@ -0,0 +1,79 @@
+import base64
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, List, Optional
+
+from django.db.models import Q, QuerySet
+
+
+@dataclass
+class KeysetPage:
+    items: List[Any]
+    next_cursor: Optional[str]
+    previous_cursor: Optional[str]
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+
+def encode_cursor(value: datetime, pk: int) -> str:
+    return base64.urlsafe_b64encode(f"{value.isoformat()}|{pk}".encode()).decode()
+
+
+def decode_cursor(cursor: str):
+    """
+    Returns (datetime, pk) for a cursor, or None if it is malformed.
+    """
+    try:
+        value, pk = base64.urlsafe_b64decode(cursor.encode()).decode().rsplit('|', 1)
+        return datetime.fromisoformat(value), int(pk)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+def keyset_paginate(queryset: QuerySet, field: str, page_size: int,
+                    after: Optional[str] = None, before: Optional[str] = None) -> KeysetPage:
+    """
+    Newest-first pagination on (field, id). Each page is a range seek on the
+    ordering index, so page N costs the same as page 1, unlike OFFSET.
+
+    Args:
+        queryset: Filtered queryset to paginate
+        field: Datetime field to order by, e.g. 'created_at'
+        page_size: Rows per page
+        after: Cursor of the last row of the previous page (moves forward)
+        before: Cursor of the first row of the next page (moves backward)
+    """
+    after_key = decode_cursor(after) if after else None
+    before_key = decode_cursor(before) if before and not after_key else None
+
+    if before_key:
+        value, pk = before_key
+        rows = list(
+            queryset.filter(Q(**{f'{field}__gt': value}) | Q(**{field: value, 'pk__gt': pk}))
+            .order_by(field, 'pk')[:page_size + 1]
+        )
+        has_more = len(rows) > page_size
+        items = list(reversed(rows[:page_size]))
+        has_previous, has_next = has_more, True
+    else:
+        if after_key:
+            value, pk = after_key
+            queryset = queryset.filter(Q(**{f'{field}__lt': value}) | Q(**{field: value, 'pk__lt': pk}))
+        rows = list(queryset.order_by(f'-{field}', '-pk')[:page_size + 1])
+        items = rows[:page_size]
+        has_previous, has_next = after_key is not None, len(rows) > page_size
+
+    if not items:
+        return KeysetPage(items, None, None)
+
+    return KeysetPage(
+        items,
+        encode_cursor(getattr(items[-1], field), items[-1].pk) if has_next else None,
+        encode_cursor(getattr(items[0], field), items[0].pk) if has_previous else None,
+    )
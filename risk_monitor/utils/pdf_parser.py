@@ -1,104 +1,411 @@
 import PyPDF2
+import hashlib
+import logging
 import re
+from dataclasses import asdict, dataclass
+from datetime import datetime
 from typing import Dict, Any
 
-def extract_vitals_from_pdf(pdf_file) -> Dict[str, Any]:
+logger = logging.getLogger(__name__)
+
+# Defaults for extract_report; deployments override them per call
+MAX_PAGES = 200
+MAX_CHARS = 2_000_000
+
+# --- Field Patterns ---
+# field: (labels, separator, value). Matching is case insensitive and handles
+# "HR: 110" or "HR 110". A label starting with \b must begin a word.
+VITAL_SEPARATOR = r'\s*[:=\s]+\s*'
+FIELD_PATTERNS = {
+    # Vitals
+    'heart_rate': (('heart rate', 'hr', 'pulse'), VITAL_SEPARATOR, r'(\d{2,3})'),
+    'systolic_bp': (('systolic bp', 'bp', 'blood pressure', 'b.p.'), VITAL_SEPARATOR, r'(\d{2,3})(?:/\d{2,3})?'),
+    'spo2': (('spo2', 'oxygen', 'saturation', 'o2 sat'), VITAL_SEPARATOR, r'(\d{2,3})'),
+    'temperature': (('temperature', 'temp', r'\bT'), VITAL_SEPARATOR, r'(\d{2,3}(?:[\.,]\d)?)'),
+    'respiratory_rate': (('respiratory rate', 'resp rate', 'rr'), VITAL_SEPARATOR, r'(\d{1,2})'),
+
+    # Demographics
+    'age': (('age', 'y/o', 'years old'), VITAL_SEPARATOR, r'(\d{1,3})'),
+    'full_name': (('patient name', 'name', 'patient'), r'\s*[:=]\s*', r'([a-zA-Z \t\.]+)'),
+    'gender': (('gender', 'sex'), VITAL_SEPARATOR, r'(male|female|other|m|f)'),
+    'admission_date': (('admission date', 'date', 'admitted'), VITAL_SEPARATOR,
+                       r'(\d{4}-\d{2}-\d{2}|\d{2}/\d{2}/\d{4}|\d{2}\.\d{2}\.\d{4})'),
+}
+INTEGER_FIELDS = ('heart_rate', 'systolic_bp', 'spo2', 'respiratory_rate', 'age')
+DATE_FORMATS = ('%Y-%m-%d', '%d/%m/%Y', '%m/%d/%Y', '%d.%m.%Y')
+
+# Text after "Notes:" or "Observations:" to the end of the document
+NOTES_PATTERN = (('notes', 'observations', 'comments'), r'\s*[:=]\s*', r'(.*)')
+NOTES_MAX_LENGTH = 500
+
+# --- Chronic Conditions and Lab Indicators (keyword search) ---
+CONDITION_KEYWORDS = {
+    'Diabetes': ('diabetes', 'diabetic'),
+    'COPD': ('copd', 'chronic obstructive'),
+    'Hypertension': ('hypertension', 'high blood pressure'),
+    'Asthma': ('asthma',),
+    'Cardiac Disease': ('cardiac', 'heart disease', 'failure'),
+}
+LAB_KEYWORDS = {
+    'wbc_flag': ('elevated wbc', 'high wbc'),
+    'creatinine_flag': ('elevated creatinine', 'high creatinine'),
+    'crp_flag': ('elevated crp', 'high crp'),
+}
+
+
+def _label_regex(label):
+    if label.startswith(r'\b'):
+        return r'\b' + re.escape(label[2:])
+    return re.escape(label)
+
+
+def _trie_regex(terms):
     """
-    Extracts vitals and patient data from a PDF file stream using regex.
+    Builds an alternation of (text, tail, group) terms with common prefixes
+    factored out, so at each position the regex engine branches on one
+    character instead of trying every term in turn. Each term ends in an empty
+    named group, which tells the caller which term matched.
+    """
+    alternatives = []
+    by_first = {}
+    for text, tail, group in terms:
+        if text:
+            by_first.setdefault(text[0], []).append((text[1:], tail, group))
+        else:
+            alternatives.append(f'{tail}(?P<{group}>)')
+    for char, rest in by_first.items():
+        alternatives.append(re.escape(char) + _trie_regex(rest))
+    if len(alternatives) == 1:
+        return alternatives[0]
+    return '(?:' + '|'.join(alternatives) + ')'
+
+
+class ReportExtractor:
+    """
+    Finds every field label, condition keyword and lab marker in one scan of
+    the report text instead of one regex search or substring scan each.
+
+    The scanner is a prefix-factored alternation over all lowercase labels and
+    keywords. After a hit at position p the scan resumes at p + 1, so
+    overlapping terms ("high blood pressure" / "blood pressure") are all seen.
+    Terms owned by different outputs must not be prefixes of each other, so at
+    most one owner can match at any position; that is checked when the
+    extractor is built. A field's value is then read with its own anchored
+    pattern at the first position where it matches, which is exactly what a
+    separate re.search for that field would return.
+    """
+
+    def __init__(self, field_patterns, notes_pattern, condition_keywords, lab_keywords):
+        patterns = dict(field_patterns, notes=notes_pattern)
+        self.fields = list(patterns)
+        self.condition_keywords = condition_keywords
+        self.keyword_owner = {}
+        for owner, keywords in list(condition_keywords.items()) + list(lab_keywords.items()):
+            for keyword in keywords:
+                self.keyword_owner[keyword] = owner
+        self.keywords = list(self.keyword_owner)
+        self.keyword_outputs = set(self.keyword_owner.values())
+        self.lab_fields = list(lab_keywords)
+
+        self.value_patterns = {}
+        # Scanner group name -> ('field', name) or ('keyword', keyword)
+        self.term_owner = {}
+        terms, word_start_terms = [], []
+        for field, (labels, separator, value) in patterns.items():
+            flags = re.IGNORECASE | (re.DOTALL if field == 'notes' else 0)
+            label_pattern = '(?:' + '|'.join(_label_regex(label) for label in labels) + ')'
+            self.value_patterns[field] = re.compile(label_pattern + separator + value, flags)
+            # The scanner only needs the first character the separator requires
+            tail = r'[:=\s]' if separator == VITAL_SEPARATOR else separator
+            for label in labels:
+                group = f't{len(self.term_owner)}'
+                self.term_owner[group] = ('field', field)
+                if label.startswith(r'\b'):
+                    word_start_terms.append(rf'\b{re.escape(label[2:].lower())}{tail}(?P<{group}>)')
+                else:
+                    terms.append((label.lower(), tail, group))
+        for keyword in self.keywords:
+            group = f't{len(self.term_owner)}'
+            self.term_owner[group] = ('keyword', keyword)
+            terms.append((keyword, '', group))
+
+        self._check_prefix_disjoint(
+            [(label.lower().removeprefix(r'\b'), field) for field, (labels, _, _) in patterns.items() for label in labels]
+            + list(self.keyword_owner.items())
+        )
+        pattern = '|'.join([_trie_regex(terms)] + word_start_terms)
+        # Lowercase ASCII text is scanned case-sensitively, which lets the
+        # engine skip non-matching branches on their first character.
+        self.scanner = re.compile(pattern)
+        self.scanner_ignorecase = re.compile(pattern, re.IGNORECASE)
+
+    @staticmethod
+    def _check_prefix_disjoint(terms):
+        for term, owner in terms:
+            for other, other_owner in terms:
+                if owner != other_owner and other.startswith(term):
+                    raise ValueError(f"{term!r} ({owner}) is a prefix of {other!r} ({other_owner})")
+
+    def stream(self) -> 'ReportScan':
+        return ReportScan(self)
+
+    def extract(self, text) -> Dict[str, Any]:
+        scan = self.stream()
+        scan.feed(text)
+        return scan.close()
+
+
+class ReportScan:
+    """
+    Incremental extraction over a report fed a page at a time. Only a window
+    of text is kept: everything before the scan position is dropped once
+    scanned, so memory stays around one page regardless of report length.
+
+    Labels within MATCH_WINDOW characters of the end of the text fed so far
+    are left for the next feed, so a value split across a page break is still
+    read whole. Keyword hits are trusted only when the matched text is ASCII,
+    which keeps their substring-of-lowercase meaning on non-ASCII text.
+    """
+    MATCH_WINDOW = 1024
+
+    def __init__(self, extractor: ReportExtractor):
+        self.extractor = extractor
+        self.buffer = ''
+        self.position = 0
+        self.values = {}
+        self.keywords = set()
+        # Conditions and lab flags with at least one keyword seen
+        self.keyword_outputs = set()
+        # Buffer index where the notes text starts, while it is still growing
+        self.notes_start = None
+        self.notes_done = False
+
+    @property
+    def complete(self) -> bool:
+        """
+        True once nothing later pages hold can change the result: every field
+        and the notes have their final value, and every condition and lab
+        flag has been seen. Keywords count wherever they appear in the report,
+        so until all of them are found the rest must still be read.
+        """
+        return (
+            self.notes_done
+            and all(field in self.values for field in FIELD_PATTERNS)
+            and len(self.keyword_outputs) == len(self.extractor.keyword_outputs)
+        )
+
+    def feed(self, text: str) -> None:
+        self.buffer += text
+        self._scan(final=False)
+        self._trim()
+
+    def close(self) -> Dict[str, Any]:
+        self._scan(final=True)
+        if self.notes_start is not None and not self.notes_done:
+            self._finish_notes()
+        return self._result()
+
+    def _scan(self, final):
+        extractor = self.extractor
+        buffer = self.buffer
+        # Lowercasing ASCII keeps every offset, so hits line up with buffer
+        if buffer.isascii():
+            scanner, haystack = extractor.scanner, buffer.lower()
+        else:
+            scanner, haystack = extractor.scanner_ignorecase, buffer
+        limit = len(buffer) if final else len(buffer) - self.MATCH_WINDOW
+
+        while self.position <= limit:
+            match = scanner.search(haystack, self.position)
+            if not match or match.start() > limit:
+                # Nothing left to read before the window; skip to its edge
+                self.position = max(self.position, limit + 1)
+                break
+            start = match.start()
+            kind, name = extractor.term_owner[match.lastgroup]
+            if kind == 'keyword':
+                if match.group().isascii():
+                    self.keywords.add(name)
+                    self.keyword_outputs.add(extractor.keyword_owner[name])
+            elif name not in self.values and not (name == 'notes' and self.notes_start is not None):
+                value = extractor.value_patterns[name].match(buffer, start)
+                if value and name == 'notes':
+                    self.notes_start = value.start(1)
+                elif value:
+                    if not final and value.end() == len(buffer):
+                        # The value may continue on the next page
+                        break
+                    self.values[name] = value.group(1)
+            self.position = start + 1
+
+        if self.notes_start is not None and not self.notes_done:
+            # Final once a non-space character sits past the length cap
+            if len(buffer[self.notes_start:].strip()) > NOTES_MAX_LENGTH:
+                self._finish_notes()
+
+    def _finish_notes(self):
+        self.values['notes'] = self.buffer[self.notes_start:]
+        self.notes_start = None
+        self.notes_done = True
+
+    def _trim(self):
+        # Keep one character before the scan position for the \b check
+        keep_from = max(self.position - 1, 0)
+        if self.notes_start is not None:
+            keep_from = min(keep_from, self.notes_start)
+        if keep_from:
+            self.buffer = self.buffer[keep_from:]
+            self.position -= keep_from
+            if self.notes_start is not None:
+                self.notes_start -= keep_from
+
+    def _result(self) -> Dict[str, Any]:
+        extractor = self.extractor
+        data = {}
+        for field in FIELD_PATTERNS:
+            if field in self.values:
+                value = _convert(field, self.values[field].strip())
+                if value is not None:
+                    data[field] = value
+
+        conditions = [
+            condition for condition, condition_keywords in extractor.condition_keywords.items()
+            if any(k in self.keywords for k in condition_keywords)
+        ]
+        if conditions:
+            data['chronic_conditions'] = ", ".join(conditions)
+
+        owners = {extractor.keyword_owner[k] for k in self.keywords}
+        for flag in extractor.lab_fields:
+            if flag in owners:
+                data[flag] = True
+
+        if 'notes' in self.values:
+            data['notes'] = self.values['notes'].strip()[:NOTES_MAX_LENGTH]
+        return data
+
+
+def _convert(field, value):
+    """
+    Converts a matched value to its form value, or None if it can't be used.
+    """
+    if field in INTEGER_FIELDS:
+        return int(value)
+    if field == 'temperature':
+        # Handle comma decimal separator
+        return float(value.replace(',', '.'))
+    if field == 'gender':
+        val = value.lower()
+        if val in ['m', 'male']: return 'Male'
+        if val in ['f', 'female']: return 'Female'
+        return 'Other'
+    if field == 'admission_date':
+        # HTML date inputs expect YYYY-MM-DD
+        for fmt in DATE_FORMATS:
+            try:
+                return datetime.strptime(value, fmt).strftime('%Y-%m-%d')
+            except ValueError:
+                pass
+        return None
+    return value
+
+
+EXTRACTOR = ReportExtractor(FIELD_PATTERNS, NOTES_PATTERN, CONDITION_KEYWORDS, LAB_KEYWORDS)
+
+# Bump when extraction changes without the patterns changing (2: early stop
+# waits for conditions and lab flags)
+SCAN_REVISION = 2
+
+# Changes whenever the patterns, keywords or scan do, so cached results are dropped
+PARSER_VERSION = hashlib.sha1(
+    repr((SCAN_REVISION, FIELD_PATTERNS, NOTES_PATTERN, CONDITION_KEYWORDS, LAB_KEYWORDS)).encode()
+).hexdigest()[:12]
+
+
+def extract_vitals_from_text(text: str) -> Dict[str, Any]:
+    """
+    Extracts vitals and patient data from the plain text of a report.
+    """
+    return EXTRACTOR.extract(text)
+
+
+@dataclass
+class PdfExtraction:
+    data: Dict[str, Any]
+    pages_read: int
+    pages_total: int
+    # Every field, condition and lab flag was found before the last page, so
+    # reading stopped there
+    stopped_early: bool = False
+    # The page or character cap was hit before the end of the document
+    truncated: bool = False
+
+
+def extract_report(pdf_file, max_pages: int = MAX_PAGES, max_chars: int = MAX_CHARS,
+                   stop_early: bool = True) -> PdfExtraction:
+    """
+    Streams a PDF page by page through the extractor. Reading stops once the
+    rest of the document can't change the result (see ReportScan.complete),
+    or at max_pages pages / max_chars characters of text.
+
+    Args:
+        pdf_file: Path or binary file object. PyPDF2 reads pages from it on
+            demand, so a file spooled to disk is never loaded whole.
     """
-    text = ""
     try:
         reader = PyPDF2.PdfReader(pdf_file)
+        pages_total = len(reader.pages)
+    except Exception as e:
+        logger.warning("Error reading PDF: %s", e)
+        return PdfExtraction({}, 0, 0)
+
+    scan = EXTRACTOR.stream()
+    result = PdfExtraction({}, 0, pages_total)
+    chars = 0
+    try:
         for page in reader.pages:
-            text += page.extract_text() or ""
-        text += "\n" 
-        print(f"DEBUG PDF RAW TEXT:\n{text}\nEND DEBUG")
+            if result.pages_read >= max_pages or chars >= max_chars:
+                result.truncated = True
+                break
+            text = (page.extract_text() or "")[:max_chars - chars]
+            chars += len(text)
+            scan.feed(text)
+            result.pages_read += 1
+            if stop_early and scan.complete:
+                result.stopped_early = result.pages_read < pages_total
+                break
+        scan.feed("\n")
     except Exception as e:
-        print(f"Error reading PDF: {e}")
-        return {}
-
-    data = {}
-    text_lower = text.lower()
-
-    # --- Regex Patterns ---
-    patterns = {
-        # Vitals: Case insensitive, handles "HR: 110" or "HR 110"
-        'heart_rate': r'(?:heart rate|hr|pulse)\s*[:=\s]+\s*(\d{2,3})',
-        'systolic_bp': r'(?:systolic bp|bp|blood pressure|b\.p\.)\s*[:=\s]+\s*(\d{2,3})(?:/\d{2,3})?', 
-        'spo2': r'(?:spo2|oxygen|saturation|o2 sat)\s*[:=\s]+\s*(\d{2,3})',
-        'temperature': r'(?:temperature|temp|\bT)\s*[:=\s]+\s*(\d{2,3}(?:[\.,]\d)?)',
-        'respiratory_rate': r'(?:respiratory rate|resp rate|rr)\s*[:=\s]+\s*(\d{1,2})',
-        
-        # Demographics
-        'age': r'(?:age|y/o|years old)\s*[:=\s]+\s*(\d{1,3})',
-        'full_name': r'(?:patient name|name|patient)\s*[:=]\s*([a-zA-Z \t\.]+)',
-        'gender': r'(?:gender|sex)\s*[:=\s]+\s*(male|female|other|m|f)',
-        'admission_date': r'(?:admission date|date|admitted)\s*[:=\s]+\s*(\d{4}-\d{2}-\d{2}|\d{2}/\d{2}/\d{4}|\d{2}\.\d{2}\.\d{4})'
-    }
-
-    for field, pattern in patterns.items():
-        match = re.search(pattern, text, re.IGNORECASE)
-        if match:
-            value = match.group(1).strip()
-            # Type Conversions
-            if field in ['heart_rate', 'systolic_bp', 'spo2', 'respiratory_rate', 'age']:
-                try: data[field] = int(value)
-                except: pass
-            elif field == 'temperature':
-                try: 
-                    # Handle comma decimal separator
-                    value = value.replace(',', '.')
-                    data[field] = float(value)
-                except: pass
-            elif field == 'gender':
-                val = value.lower()
-                if val in ['m', 'male']: data[field] = 'Male'
-                elif val in ['f', 'female']: data[field] = 'Female'
-                else: data[field] = 'Other'
-            elif field == 'admission_date':
-                from datetime import datetime
-                # Try parsing YYYY-MM-DD, DD/MM/YYYY, MM/DD/YYYY, DD.MM.YYYY
-                formats = ('%Y-%m-%d', '%d/%m/%Y', '%m/%d/%Y', '%d.%m.%Y')
-                for fmt in formats:
-                    try:
-                        dt = datetime.strptime(value, fmt)
-                        # Create standard date string for Django form (YYYY-MM-DD usually, 
-                        # but depends on widget usually expects standard format)
-                        # Actually standard HTML date input expects YYYY-MM-DD
-                        data[field] = dt.strftime('%Y-%m-%d')
-                        break
-                    except ValueError:
-                        pass
-            else:
-                data[field] = value
-
-    # --- Chronic Conditions (Keyword Search) ---
-    conditions = []
-    condition_keywords = {
-        'Diabetes': ['diabetes', 'diabetic'],
-        'COPD': ['copd', 'chronic obstructive'],
-        'Hypertension': ['hypertension', 'high blood pressure'],
-        'Asthma': ['asthma'],
-        'Cardiac Disease': ['cardiac', 'heart disease', 'failure']
-    }
-    
-    for condition, keywords in condition_keywords.items():
-        if any(k in text_lower for k in keywords):
-            conditions.append(condition)
-            
-    if conditions:
-        data['chronic_conditions'] = ", ".join(conditions)
-
-    # --- Lab Indicators ---
-    if "elevated wbc" in text_lower or "high wbc" in text_lower: data['wbc_flag'] = True
-    if "elevated creatinine" in text_lower or "high creatinine" in text_lower: data['creatinine_flag'] = True
-    if "elevated crp" in text_lower or "high crp" in text_lower: data['crp_flag'] = True
-
-    # --- Notes / Observations ---
-    # Capture text after "Notes:" or "Observations:" until end or new section
-    notes_match = re.search(r'(?:notes|observations|comments)\s*[:=]\s*(.*)', text, re.IGNORECASE | re.DOTALL)
-    if notes_match:
-        # Take up to 500 chars, stripping whitespace
-        data['notes'] = notes_match.group(1).strip()[:500]
-
-    return data
+        logger.warning("Error reading PDF page %d: %s", result.pages_read + 1, e)
+        return PdfExtraction({}, result.pages_read, pages_total)
+
+    result.data = scan.close()
+    logger.info(
+        "PDF extraction: %d fields from %d of %d pages%s%s",
+        len(result.data), result.pages_read, pages_total,
+        " (everything found)" if result.stopped_early else "",
+        " (page/size cap reached)" if result.truncated else "",
+    )
+    return result
+
+
+def extract_vitals_from_pdf(pdf_file, **limits) -> Dict[str, Any]:
+    """
+    Extracts vitals and patient data from a PDF file stream using regex.
+    Takes the same limits as extract_report.
+    """
+    return extract_report(pdf_file, **limits).data
+
+
+def extract_vitals_to_pipe(path, conn, limits=None):
+    """
+    Child-process entry point for asynchronous autofill. Parses the PDF at path
+    and sends ('ok', extraction as a dict) or ('error', message) back over
+    conn. Lives here so the child only imports PyPDF2, not Django.
+    """
+    try:
+        conn.send(('ok', asdict(extract_report(path, **(limits or {})))))
+    except Exception as e:
+        conn.send(('error', str(e)))
+    finally:
+        conn.close()
@@ -0,0 +1,148 @@
+import random
+import re
+from collections import Counter
+
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve
+
+from risk_monitor.models import Patient, PatientCondition, AuditLog, RiskLevelCount
+from risk_monitor.services.condition_service import sync_patient_conditions
+from risk_monitor.utils.conditions import encode_conditions
+
+# Repeating the same statement this many times in one request is treated as N+1
+N_PLUS_ONE_THRESHOLD = 3
+
+CONDITIONS = ["Diabetes", "COPD", "Hypertension", "Asthma", "Cardiac Disease"]
+
+# Tables with a fixed handful of rows, where a full scan is the cheapest plan
+SMALL_TABLES = {RiskLevelCount._meta.db_table}
+
+
+def explain(sql):
+    """
+    Returns the plan lines for one captured statement on the active backend.
+    """
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute(f"EXPLAIN QUERY PLAN {sql}")
+            return [row[-1] for row in cursor.fetchall()]
+        cursor.execute(f"EXPLAIN {sql}")
+        columns = [col[0].lower() for col in cursor.description]
+        return [" ".join(f"{name}={value}" for name, value in zip(columns, row)) for row in cursor.fetchall()]
+
+
+def full_scans(plan):
+    """
+    Plan lines that read a whole table without an index, or sort without one.
+    """
+    if connection.vendor == 'sqlite':
+        return [
+            line for line in plan
+            if (line.startswith('SCAN ') and ' INDEX ' not in line) or 'TEMP B-TREE' in line
+        ]
+    if connection.vendor == 'mysql':
+        return [line for line in plan if 'type=ALL' in line or 'Using filesort' in line]
+    return [line for line in plan if 'Seq Scan' in line]
+
+
+def statement_shape(sql):
+    # Collapse literals so the same query with different ids compares equal
+    return re.sub(r"'[^']*'|\b\d+(\.\d+)?\b", '?', sql)
+
+
+def plan_pages(patient_id):
+    """
+    (name, url) of every list/history view whose queries are checked.
+    """
+    return [
+        ('dashboard', '/'),
+        ('patient list', '/patients/'),
+        ('patient list by risk', '/patients/?risk_level=HIGH'),
+        ('patient list by risk and condition', '/patients/?risk_level=HIGH&condition=COPD'),
+        ('patient history', f'/patients/{patient_id}/edit/'),
+        ('audit log', '/audit-log/'),
+        ('audit log for patient', f'/audit-log/?patient={patient_id}'),
+        ('audit export for patient', f'/audit-log/export/?patient={patient_id}'),
+        ('api patient list', '/api/patients/?fields=id,full_name,risk_level'),
+        ('api patient list by condition', '/api/patients/?condition=COPD&risk_level=HIGH'),
+        ('api audit log for patient', f'/api/audit-logs/?patient={patient_id}'),
+    ]
+
+
+def seed_plan_dataset(patients, audits_per_patient):
+    """
+    Inserts seed patients with condition links and audit rows, then refreshes
+    the planner statistics. Returns the id of a patient to check pages for.
+    Call inside a transaction that is rolled back.
+    """
+    rng = random.Random(42)
+    created = Patient.objects.bulk_create([
+        Patient(
+            full_name=f"Seed Patient {i}", age=rng.randint(18, 95), gender='Other',
+            heart_rate=rng.randint(50, 140), systolic_bp=rng.randint(80, 170), spo2=rng.randint(85, 100),
+            temperature=round(rng.uniform(36, 40), 1), respiratory_rate=rng.randint(10, 30),
+            risk_score=rng.randint(0, 9), risk_level=rng.choice(['LOW', 'MEDIUM', 'HIGH']),
+            chronic_conditions=conditions, condition_codes=encode_conditions(conditions),
+        )
+        for i, conditions in enumerate(
+            rng.sample(CONDITIONS, rng.randint(0, 2)) for _ in range(patients)
+        )
+    ], batch_size=1000)
+    sync_patient_conditions(created)
+
+    ids = list(Patient.objects.filter(full_name__startswith="Seed Patient").values_list('id', flat=True))
+    AuditLog.objects.bulk_create([
+        AuditLog(
+            patient_id=patient_id, changes=[["Heart Rate", "80", "90"]],
+            risk_before='LOW', risk_after=rng.choice(['LOW', 'MEDIUM', 'HIGH']), reason="Seed",
+        )
+        for patient_id in ids for _ in range(audits_per_patient)
+    ], batch_size=1000)
+
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute("ANALYZE")
+        elif connection.vendor == 'mysql':
+            cursor.execute(
+                f"ANALYZE TABLE {Patient._meta.db_table}, {AuditLog._meta.db_table}, {PatientCondition._meta.db_table}"
+            )
+        else:
+            cursor.execute("ANALYZE")
+    return ids[len(created) // 2]
+
+
+def check_page(name, url, log=None):
+    """
+    Renders one page and returns (statements, failures): the SQL it ran, and
+    a message per full table scan, unindexed sort or N+1 pattern. log, when
+    given, receives each SELECT with its plan.
+    """
+    request = RequestFactory(HTTP_HOST='localhost').get(url)
+    match = resolve(request.path_info)
+
+    with CaptureQueriesContext(connection) as captured:
+        response = match.func(request, *match.args, **match.kwargs)
+        if response.streaming:
+            for _ in response.streaming_content:
+                pass
+
+    failures = []
+    statements = [query['sql'] for query in captured.captured_queries]
+
+    for shape, count in Counter(statement_shape(sql) for sql in statements).items():
+        if count >= N_PLUS_ONE_THRESHOLD:
+            failures.append(f"{name}: N+1 pattern, {count}x {shape[:120]}")
+
+    for sql in statements:
+        if not sql.lstrip().upper().startswith('SELECT'):
+            continue
+        plan = explain(sql)
+        if log:
+            log(f"  {sql[:100]}\n    " + "\n    ".join(plan))
+        for line in full_scans(plan):
+            if any(table in line for table in SMALL_TABLES):
+                continue
+            failures.append(f"{name}: {line} in {sql[:120]}")
+    return statements, failures
@@ -1,26 +1,44 @@
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
 from django.shortcuts import render, redirect, get_object_or_404
-from django.db.models import Count
 from django.utils import timezone
-from django.http import HttpResponse
+from django.http import HttpResponse, HttpResponseBadRequest, JsonResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+import hmac
 import json
-import csv
+import logging
 
-from .models import Patient, AuditLog
-from .forms import PatientForm
+from .models import Patient, AuditLog, PdfExtractionJob
+from .forms import PatientForm, AuditLogFilterForm, PatientFilterForm, VitalsHistoryForm
 from .services.risk_engine import calculate_risk
 from .services.audit_service import update_patient_risk_and_audit, create_patient_with_risk
-from .utils.pdf_parser import extract_vitals_from_pdf
+from .services.audit_archive import paginate_audit_logs
+from .services.audit_export import stream_audit_csv
+from .services.ingest_service import ingest_vitals_ndjson
+from .services.live_events import hub, sse_stream
+from .services.dashboard_service import dashboard_counts
+from .services.observation_service import vitals_history
+from .services.pdf_cache import extract_pdf_cached
+from .services.pdf_jobs import PdfJobRejected, PdfQueueFull, PdfTooLarge, pdf_job_status, submit_pdf_job
+from .services.search_service import search_patients
+from .utils.pagination import keyset_paginate
+
+logger = logging.getLogger(__name__)
 
 def dashboard(request):
     """
     Renders the dashboard with analytics.
     """
-    total_patients = Patient.objects.count()
-    high_risk_count = Patient.objects.filter(risk_level='HIGH').count()
+    # Counts come from the incrementally maintained per-level counters
+    counts = dashboard_counts()
+    total_patients = sum(counts.values())
+    high_risk_count = counts['HIGH']
     recent_admissions = Patient.objects.order_by('-admission_date')[:5]
 
     # Risk Distribution for Pie Chart
-    risk_distribution = list(Patient.objects.values('risk_level').annotate(count=Count('risk_level')))
+    risk_distribution = [{'risk_level': level, 'count': count} for level, count in counts.items() if count]
     
     context = {
         'total_patients': total_patients,
@@ -30,9 +48,63 @@ def dashboard(request):
     }
     return render(request, 'dashboard.html', context)
 
+async def risk_event_stream(request):
+    """
+    Server-Sent Events stream of risk-level transitions, which the dashboard
+    applies to its counts as they happen. Needs the ASGI server (see
+    config/asgi.py): a WSGI worker can't hold thousands of idle streams.
+    """
+    if not isinstance(request, ASGIRequest):
+        return HttpResponse("Live updates need the ASGI server.", status=501)
+
+    last_event_id = request.headers.get('Last-Event-ID', '')
+    subscription = hub.subscribe(int(last_event_id) if last_event_id.isdigit() else None)
+    if subscription is None:
+        return HttpResponse("Too many live subscribers.", status=503)
+
+    response = StreamingHttpResponse(
+        sse_stream(subscription, settings.LIVE_EVENTS_HEARTBEAT_SECONDS), content_type='text/event-stream',
+    )
+    response['Cache-Control'] = 'no-cache'
+    # Stops nginx from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+PATIENTS_PER_PAGE = 25
+AUDIT_LOGS_PER_PAGE = 50
+HISTORY_PER_PAGE = 20
+
+def _page_links(request, page):
+    """
+    Query strings for the previous/next page links, keeping the active filters.
+    """
+    def link(key, cursor):
+        params = request.GET.copy()
+        params.pop('after', None)
+        params.pop('before', None)
+        params[key] = cursor
+        return params.urlencode()
+
+    return {
+        'next_query': link('after', page.next_cursor) if page.has_next else None,
+        'previous_query': link('before', page.previous_cursor) if page.has_previous else None,
+    }
+
 def patient_list(request):
-    patients = Patient.objects.all().order_by('-created_at')
-    return render(request, 'patient_list.html', {'patients': patients})
+    filter_form = PatientFilterForm(request.GET)
+    queryset = Patient.objects.all()
+    if filter_form.is_valid():
+        queryset = search_patients(queryset.filter(**filter_form.filter_kwargs()), filter_form.cleaned_data['q'])
+
+    page = keyset_paginate(
+        queryset, 'created_at', PATIENTS_PER_PAGE,
+        after=request.GET.get('after'), before=request.GET.get('before'),
+    )
+    return render(request, 'patient_list.html', {
+        'patients': page.items,
+        'filter_form': filter_form,
+        **_page_links(request, page),
+    })
 
 from django.contrib import messages
 
@@ -41,26 +113,30 @@ def patient_create(request):
         # Handle Autofill separate from Save
         if 'autofill' in request.POST:
             extracted_data = {}
-            if request.FILES.get('pdf_file'):
+            if request.FILES.get('pdf_file') and request.FILES['pdf_file'].size > settings.PDF_AUTOFILL_MAX_BYTES:
+                messages.error(request, "PDF is too large to autofill.")
+            elif request.FILES.get('pdf_file'):
                 pdf_file = request.FILES['pdf_file']
-                print(f"DEBUG: Processing PDF {pdf_file.name}, size: {pdf_file.size}")
                 try:
                     # Reset file pointer if needed
                     pdf_file.seek(0)
-                    extracted_data = extract_vitals_from_pdf(pdf_file)
-                    print(f"DEBUG: Extracted Data: {extracted_data}")
-                    
+                    extraction = extract_pdf_cached(pdf_file)
+                    extracted_data = extraction['data']
+
                     if extracted_data:
                         count = len(extracted_data)
-                        messages.success(request, f"Successfully extracted {count} fields from PDF.")
+                        messages.success(
+                            request,
+                            f"Successfully extracted {count} fields from PDF "
+                            f"(read {extraction['pages_read']} of {extraction['pages_total']} pages).",
+                        )
                     else:
                         messages.warning(request, "PDF processed but no data could be extracted. Please check the file format.")
-                        
+
                 except Exception as e:
-                    print(f"DEBUG: PDF Error: {e}")
+                    logger.exception("PDF autofill failed for %s", pdf_file.name)
                     messages.error(request, "Error processing PDF file.")
             else:
-                print("DEBUG: No PDF file found in request.FILES")
                 messages.error(request, "Please upload a PDF file to autofill data.")
             
             data = request.POST.copy()
@@ -92,63 +168,118 @@ def patient_create(request):
 
     return render(request, 'patient_form.html', {'form': form})
 
+@require_POST
+def pdf_autofill_start(request):
+    """
+    Queues the uploaded PDF for background extraction and returns the job id
+    at once; the form polls pdf_autofill_status for the fields.
+    """
+    pdf_file = request.FILES.get('pdf_file')
+    if not pdf_file:
+        return JsonResponse({'error': "Please upload a PDF file to autofill data."}, status=400)
+    try:
+        job = submit_pdf_job(pdf_file)
+    except PdfTooLarge as e:
+        return JsonResponse({'error': str(e)}, status=413)
+    except PdfQueueFull as e:
+        return JsonResponse({'error': str(e)}, status=503)
+    except PdfJobRejected as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    return JsonResponse({
+        'job_id': str(job.pk),
+        'status_url': reverse('risk_monitor:pdf_autofill_status', args=[job.pk]),
+    }, status=202)
+
+def pdf_autofill_status(request, job_id):
+    job = get_object_or_404(PdfExtractionJob, pk=job_id)
+    return JsonResponse(pdf_job_status(job))
+
 def patient_update(request, pk):
     patient = get_object_or_404(Patient, pk=pk)
     
     if request.method == 'POST':
         form = PatientForm(request.POST, request.FILES, instance=patient)
         if form.is_valid():
-            new_data = form.cleaned_data.copy()
-            if 'pdf_file' in new_data:
-                del new_data['pdf_file']
-                
-            update_patient_risk_and_audit(patient.id, new_data)
+            # Only the fields the user changed, so the update loads and
+            # writes just those columns
+            new_data = {
+                field: form.cleaned_data[field]
+                for field in form.changed_data if field in form.cleaned_data and field != 'pdf_file'
+            }
+            if new_data:
+                update_patient_risk_and_audit(patient.id, new_data)
             return redirect('risk_monitor:patient_list')
     else:
         form = PatientForm(instance=patient)
     
-    raw_logs = patient.audit_logs.all().order_by('-timestamp')
-    audit_logs = []
-    
-    # Group logs by batch_id
-    from itertools import groupby
-    from operator import attrgetter
-    
-    # Sort by batch_id and timestamp if needed, but they are already ordered by timestamp
-    # We use batch_id for grouping, but the set might have None for old logs
-    for key, group in groupby(raw_logs, key=attrgetter('batch_id')):
-        logs_in_group = list(group)
-        # For entries without batch_id, treat each as its own group
-        if key is None:
-            for log in logs_in_group:
-                audit_logs.append({
-                    'timestamp': log.timestamp,
-                    'reason': log.reason,
-                    'risk_before': log.risk_before,
-                    'risk_after': log.risk_after,
-                    'score_before': log.score_before,
-                    'score_after': log.score_after,
-                    'changes': [log]
-                })
-        else:
-            first_log = logs_in_group[0]
-            audit_logs.append({
-                'timestamp': first_log.timestamp,
-                'batch_id': key,
-                'reason': first_log.reason,
-                'risk_before': first_log.risk_before,
-                'risk_after': first_log.risk_after,
-                'score_before': first_log.score_before,
-                'score_after': first_log.score_after,
-                'changes': logs_in_group
-            })
-            
+    # One row per update, paged on the patient's history index, then archived updates
+    page = paginate_audit_logs(
+        patient.audit_logs.all(), {'patient_id': patient.pk}, HISTORY_PER_PAGE,
+        after=request.GET.get('after'), before=request.GET.get('before'),
+    )
     return render(request, 'patient_form.html', {
         'form': form, 
         'patient': patient, 
-        'audit_logs': audit_logs
+        'audit_logs': page.items,
+        **_page_links(request, page),
     })
 
+def patient_vitals(request, pk):
+    """
+    JSON history of one vital: raw readings, or 1-minute/1-hour rollups.
+    """
+    patient = get_object_or_404(Patient.objects.only('pk'), pk=pk)
+    form = VitalsHistoryForm(request.GET)
+    if not form.is_valid():
+        return JsonResponse({'errors': form.errors}, status=400)
+    params = form.history_kwargs()
+    return JsonResponse({
+        'patient': patient.pk,
+        'field': params['field'],
+        'resolution': form.cleaned_data.get('resolution') or 'raw',
+        'points': vitals_history(patient.pk, **params),
+    })
+
+def _has_device_token(request):
+    scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+    if scheme.lower() != 'bearer' or not token:
+        return False
+    # Every token is compared, in constant time, so timing doesn't leak a match
+    matches = [hmac.compare_digest(token.encode(), known.encode()) for known in settings.VITALS_INGEST_TOKENS]
+    return any(matches)
+
+@csrf_exempt
+@require_POST
+def vitals_ingest(request):
+    """
+    Bulk endpoint for bedside monitors and gateways: an NDJSON body of
+    readings for any number of patients, sent with an
+    "Authorization: Bearer <token>" header holding one of
+    VITALS_INGEST_TOKENS. Responds with accepted/rejected counts once the
+    accepted readings are committed.
+    """
+    if not _has_device_token(request):
+        response = JsonResponse({'error': "A valid device token is required."}, status=401)
+        response['WWW-Authenticate'] = 'Bearer'
+        return response
+
+    max_bytes = settings.VITALS_INGEST_MAX_BYTES
+    too_large = {'error': f"Request body exceeds {max_bytes} bytes."}
+    content_length = int(request.META.get('CONTENT_LENGTH') or 0)
+    if content_length > max_bytes:
+        return JsonResponse(too_large, status=413)
+
+    # The header can be missing or wrong, so the body is also counted as it is
+    # read. Reads are capped so one endless line can't be buffered whole.
+    lines = iter(lambda: request.readline(max_bytes + 1), b'')
+    result = ingest_vitals_ndjson(lines, batch_size=settings.VITALS_INGEST_BATCH_SIZE, max_bytes=max_bytes)
+    counts = {'accepted': result.accepted, 'rejected': result.rejected, 'errors': result.errors}
+    if result.too_large:
+        # Batches committed before the limit was reached are reported
+        return JsonResponse({**too_large, **counts}, status=413)
+    return JsonResponse(counts)
+
 def patient_delete(request, pk):
     patient = get_object_or_404(Patient, pk=pk)
     if request.method == 'POST':
@@ -158,26 +289,33 @@ def patient_delete(request, pk):
     return render(request, 'patient_confirm_delete.html', {'patient': patient})
 
 def audit_log(request):
-    logs = AuditLog.objects.select_related('patient').order_by('-timestamp')
-    return render(request, 'audit_log.html', {'logs': logs})
+    filter_form = AuditLogFilterForm(request.GET)
+    filters = filter_form.filter_kwargs() if filter_form.is_valid() else {}
+
+    page = paginate_audit_logs(
+        AuditLog.objects.select_related('patient').filter(**filters), filters, AUDIT_LOGS_PER_PAGE,
+        after=request.GET.get('after'), before=request.GET.get('before'),
+    )
+    export_params = request.GET.copy()
+    export_params.pop('after', None)
+    export_params.pop('before', None)
+    return render(request, 'audit_log.html', {
+        'logs': page.items,
+        'filter_form': filter_form,
+        'export_query': export_params.urlencode(),
+        **_page_links(request, page),
+    })
 
 def export_audit_csv(request):
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = 'attachment; filename="audit_logs.csv"'
-
-    writer = csv.writer(response)
-    writer.writerow(['Timestamp', 'Patient', 'Field', 'Old Value', 'New Value', 'Risk Before', 'Risk After'])
-
-    logs = AuditLog.objects.select_related('patient').all().order_by('-timestamp')
-    for log in logs:
-        writer.writerow([
-            log.timestamp,
-            log.patient.full_name,
-            log.field_name,
-            log.old_value,
-            log.new_value,
-            log.risk_before,
-            log.risk_after
-        ])
+    filter_form = AuditLogFilterForm(request.GET)
+    if not filter_form.is_valid():
+        return HttpResponseBadRequest(filter_form.errors.as_text())
 
+    compress = request.GET.get('gzip') in ('1', 'true')
+    response = StreamingHttpResponse(
+        stream_audit_csv(filter_form.filter_kwargs(), compress=compress),
+        content_type='application/gzip' if compress else 'text/csv',
+    )
+    filename = 'audit_logs.csv.gz' if compress else 'audit_logs.csv'
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
     return response